@@ -0,0 +1,48 @@
+"""Async (ASGI) serving mode for the loan processing service.
+
+Serves the same routes as bank_server.py. The bank makes no outbound calls,
+so its views run as they are on a thread pool; only /events long-polls are
+native coroutines, so waiting subscribers don't each hold a thread.
+
+    uvicorn bank_asgi:app --port 5000
+"""
+import bank_server
+from bank_server import EVENT_STREAM_PORT, events, open_journal, request_latency
+
+from common.asgi import AsyncApp, LogWaiter, Request
+from common.event_log import poll_params
+from common.event_stream import EventStreamServer
+
+app = AsyncApp(bank_server.app, observe=request_latency.observe, capture=bank_server.traffic_capture)
+event_waiter = LogWaiter(events)
+
+
+@app.route('/events')
+async def poll_events(request: Request):
+    cursor, timeout, limit = poll_params(request.args)
+    new_events, cursor, truncated = await event_waiter.wait(cursor, timeout, limit)
+    return {'events': new_events, 'cursor': cursor, 'truncated': truncated}, 200
+
+
+def start():
+    open_journal()
+    if EVENT_STREAM_PORT:
+        EventStreamServer(events, port=EVENT_STREAM_PORT).start()
+
+
+def stop():
+    # Flush group-committed journal entries before the process exits
+    if bank_server.journal is not None:
+        bank_server.journal.close()
+    if bank_server.traffic_capture is not None:
+        bank_server.traffic_capture.close()
+
+
+app.on_startup.append(start)
+app.on_shutdown.append(stop)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, port=5000)
@@ -1,8 +1,22 @@
 from flask import Flask, request, jsonify
-from dataclasses import dataclass
-from typing import Dict, Optional
+from dataclasses import dataclass, astuple
+from typing import Dict, Optional, Set, Tuple
 from datetime import datetime
+import os
 import secrets
+import sys
+import threading
+import numpy as np
+from loan_journal import SNAPSHOT_COLUMNS, LoanJournal
+from loan_store import ADDRESS_WIDTH, LoanStore, LoanView
+from quote_engine import METHODS, flat_installments, quote, schedule
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.event_log import EventLog, poll_params
+from common.event_stream import EventStreamServer
+from common.metrics import PROMETHEUS_CONTENT_TYPE, Registry, instrument, status_cache_metrics
+from common.status_cache import StatusCache
+from common.traffic_capture import TrafficCapture
 
 app = Flask(__name__)
 
@@ -11,6 +25,7 @@ def generate_address() -> str:
     return '0x' + secrets.token_hex(20)
 
 # Data structure to mirror the Solidity contract's Loan struct
+# (used to build loans; stored loans live in the columnar LoanStore)
 @dataclass
 class Loan:
     is_approved: bool
@@ -19,41 +34,122 @@ class Loan:
     property_id: int
     term_in_months: int
     monthly_installment: float
+    installments_paid: int = 0
+    outstanding_balance: Optional[float] = None  # None until the loan is stored: every installment still owed
 
 # Global state variables (simulating blockchain state)
 admin_address = '0x8f42a25c9fd394a778df02e0f56d691e4f4ddf9e'
 interest_rate = 5  # 5% interest rate
-loans: Dict[str, Loan] = {}
+loans = LoanStore()  # buyer address -> LoanView
+status_cache = StatusCache()  # serialized /loan_status bodies, keyed by buyer and loan version
+
+# Recent loan events for subscribers; streamed over SSE on EVENT_STREAM_PORT, or long-polled at /events
+events = EventLog(int(os.getenv('EVENT_LOG_CAPACITY', '10000')))
+EVENT_STREAM_PORT = int(os.getenv('EVENT_STREAM_PORT', '5002'))
+
+# Durable journal of loan events, enabled by pointing LOAN_JOURNAL_DIR at a directory
+LOAN_JOURNAL_DIR = os.getenv('LOAN_JOURNAL_DIR')
+journal: Optional[LoanJournal] = None
+loan_lock = threading.RLock()  # held while a loan changes and its event is recorded
+
+def open_journal():
+    """Restore loans from the latest snapshot plus journal tail and start journaling"""
+    global journal
+    if not LOAN_JOURNAL_DIR:
+        return
+    journal = LoanJournal(
+        LOAN_JOURNAL_DIR,
+        snapshot_state,
+        fsync_mode=os.getenv('LOAN_JOURNAL_FSYNC', 'group'),
+        group_commit_ms=float(os.getenv('LOAN_JOURNAL_GROUP_COMMIT_MS', '5')),
+        snapshot_every=int(os.getenv('LOAN_SNAPSHOT_EVERY', '100000')),
+        snapshot_interval=float(os.getenv('LOAN_SNAPSHOT_INTERVAL', '300')),
+        lock=loan_lock
+    )
+    # Later entries for a buyer replace earlier ones, so the store is written once per loan
+    loans.update({buyer_address: Loan(*fields) for buyer_address, fields in journal.recover()})
+    posted_periods.update(journal.posted_periods)
+
+# Operational metrics, scraped from /metrics
+metrics = Registry()
+request_latency = instrument(app, metrics, 'bank')
+loan_events = metrics.counter('bank_loan_events_total', 'Loan lifecycle events published', ('event',))
+metrics.gauge('bank_loans', 'Loans by state', ('state',),
+              lambda: {(state,): count for state, count in loans.state_counts().items()})
+status_cache_metrics(metrics, 'bank', status_cache.report)
+
+# Request capture for replay_traffic.py, enabled by pointing TRAFFIC_CAPTURE_DIR at a directory
+TRAFFIC_CAPTURE_DIR = os.getenv('TRAFFIC_CAPTURE_DIR')
+traffic_capture: Optional[TrafficCapture] = None
+if TRAFFIC_CAPTURE_DIR:
+    traffic_capture = TrafficCapture(TRAFFIC_CAPTURE_DIR, 'bank',
+                                     max_bytes=int(float(os.getenv('TRAFFIC_CAPTURE_MAX_MB', '64')) * 1024 * 1024),
+                                     backups=int(os.getenv('TRAFFIC_CAPTURE_BACKUPS', '5')))
+    traffic_capture.install(app)
+    metrics.collected_counter('bank_captured_requests_total', 'Requests written to the traffic capture, or dropped',
+                              ('result',), lambda: {('written',): traffic_capture.captured,
+                                                    ('dropped',): traffic_capture.dropped})
+
+def publish_event(event: str, buyer_address: str, loan):
+    loan_events.inc(event)
+    events.publish(event, buyer=buyer_address, property_id=loan.property_id, amount=loan.amount,
+                   is_approved=loan.is_approved, is_repaid=loan.is_repaid)
+
+def record_event(event: str, buyer_address: str, loan: LoanView):
+    # Called with loan_lock held, from the change to the loan through to its journal entry
+    if journal is not None:
+        journal.record(event, buyer_address, loan.fields())
+    publish_event(event, buyer_address, loan)
 
 def calculate_monthly_installment(amount: float, term_in_months: int) -> float:
     """Calculate monthly installment with interest"""
     total_amount = amount + (amount * interest_rate / 100)
     return total_amount / term_in_months
 
-@app.route('/apply_loan', methods=['POST'])
-def apply_loan():
-    data = request.json
+MAX_BULK_APPLICATIONS = 10000
+
+def parse_application(data: dict, pending: Set[str]) -> Tuple[Optional[tuple], Optional[str]]:
+    """Validate a loan application, returning its fields or an error message"""
     buyer_address = data.get('buyer_address', generate_address())
     property_id = data.get('property_id')
     amount = data.get('amount')
     term_in_months = data.get('term_in_months')
 
     if not all([property_id, amount, term_in_months]):
-        return jsonify({'error': 'Missing required parameters'}), 400
+        return None, 'Missing required parameters'
+
+    if not isinstance(buyer_address, str) or len(buyer_address.encode('utf-8')) > ADDRESS_WIDTH:
+        return None, 'Invalid buyer address'
+
+    # Loans are stored in typed columns, so the numeric fields must really be numbers
+    if not (isinstance(property_id, int) and isinstance(term_in_months, int) and isinstance(amount, (int, float))):
+        return None, 'Invalid loan parameters'
+
+    if buyer_address in pending or (buyer_address in loans and loans[buyer_address].amount > 0):
+        return None, 'Loan already exists for this buyer'
 
-    if buyer_address in loans and loans[buyer_address].amount > 0:
-        return jsonify({'error': 'Loan already exists for this buyer'}), 400
+    return (buyer_address, property_id, amount, term_in_months), None
 
+@app.route('/apply_loan', methods=['POST'])
+def apply_loan():
+    data = request.json
+    application, error = parse_application(data, set())
+    if error:
+        return jsonify({'error': error}), 400
+
+    buyer_address, property_id, amount, term_in_months = application
     monthly_installment = calculate_monthly_installment(amount, term_in_months)
     
-    loans[buyer_address] = Loan(
-        is_approved=False,
-        is_repaid=False,
-        amount=amount,
-        property_id=property_id,
-        term_in_months=term_in_months,
-        monthly_installment=monthly_installment
-    )
+    with loan_lock:
+        loans[buyer_address] = Loan(
+            is_approved=False,
+            is_repaid=False,
+            amount=amount,
+            property_id=property_id,
+            term_in_months=term_in_months,
+            monthly_installment=monthly_installment
+        )
+        record_event('LoanApplied', buyer_address, loans[buyer_address])
 
     return jsonify({
         'status': 'success',
@@ -64,6 +160,134 @@ def apply_loan():
         'monthly_installment': monthly_installment
     })
 
+@app.route('/apply_loans', methods=['POST'])
+def apply_loans():
+    data = request.json
+    applications = data.get('applications') if isinstance(data, dict) else data
+
+    if not isinstance(applications, list) or not applications:
+        return jsonify({'error': 'Missing required parameters'}), 400
+
+    if len(applications) > MAX_BULK_APPLICATIONS:
+        return jsonify({'error': f'Batch exceeds {MAX_BULK_APPLICATIONS} applications'}), 400
+
+    # Validate the whole batch first so duplicates inside the batch are caught too
+    results = []
+    accepted = []
+    pending: Set[str] = set()
+    for application in applications:
+        if not isinstance(application, dict):
+            results.append({'error': 'Invalid application'})
+            continue
+        fields, error = parse_application(application, pending)
+        if error:
+            results.append({'error': error})
+            continue
+        pending.add(fields[0])
+        accepted.append((len(results), fields))
+        results.append(None)
+
+    installments = flat_installments([amount for _, (_, _, amount, _) in accepted],
+                                     [term_in_months for _, (_, _, _, term_in_months) in accepted],
+                                     interest_rate).tolist()
+
+    batch: Dict[str, Loan] = {}
+    for (index, (buyer_address, property_id, amount, term_in_months)), monthly_installment in zip(accepted, installments):
+        batch[buyer_address] = Loan(
+            is_approved=False,
+            is_repaid=False,
+            amount=amount,
+            property_id=property_id,
+            term_in_months=term_in_months,
+            monthly_installment=monthly_installment
+        )
+        results[index] = {
+            'status': 'success',
+            'event': 'LoanApplied',
+            'buyer': buyer_address,
+            'property_id': property_id,
+            'amount': amount,
+            'monthly_installment': monthly_installment
+        }
+
+    with loan_lock:
+        loans.update(batch)
+        if journal is not None:
+            journal.record_many('LoanApplied', [(buyer_address, astuple(loan)) for buyer_address, loan in batch.items()])
+    for buyer_address, loan in batch.items():
+        publish_event('LoanApplied', buyer_address, loan)
+
+    return jsonify({
+        'status': 'success',
+        'applied': len(accepted),
+        'failed': len(results) - len(accepted),
+        'results': results
+    })
+
+MAX_QUOTES = 100000
+MAX_SCHEDULE_MONTHS = 1000000
+
+def money(values) -> list:
+    return np.round(values, 2).tolist()
+
+def parse_quote_request(data: dict) -> Tuple[Optional[tuple], Optional[str]]:
+    """Validate a batch quote request, returning (amounts, terms, rates, method) or an error message"""
+    amounts = data.get('amounts')
+    terms = data.get('terms')
+    rates = data.get('rates', interest_rate)
+    method = data.get('method', 'flat')
+
+    if not isinstance(amounts, list) or not isinstance(terms, list) or not amounts:
+        return None, 'Missing required parameters'
+
+    if len(amounts) > MAX_QUOTES:
+        return None, f'Batch exceeds {MAX_QUOTES} quotes'
+
+    rate_list = rates if isinstance(rates, list) else [rates]
+    if (method not in METHODS or len(terms) != len(amounts)
+            or (isinstance(rates, list) and len(rates) != len(amounts))
+            or not all(isinstance(amount, (int, float)) and amount > 0 for amount in amounts)
+            or not all(isinstance(term, int) and term > 0 for term in terms)
+            or not all(isinstance(rate, (int, float)) and rate >= 0 for rate in rate_list)):
+        return None, 'Invalid quote parameters'
+
+    return (amounts, terms, rates, method), None
+
+@app.route('/quote_loans', methods=['POST'])
+def quote_loans():
+    # Prices many loans at once; results come back as parallel arrays rounded to cents
+    data = request.json
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Missing required parameters'}), 400
+
+    parsed, error = parse_quote_request(data)
+    if error:
+        return jsonify({'error': error}), 400
+
+    amounts, terms, rates, method = parsed
+    quotes = quote(amounts, terms, rates, method)
+    response = {
+        'status': 'success',
+        'method': method,
+        'count': len(amounts),
+        'monthly_installment': money(quotes.monthly_installment),
+        'total_paid': money(quotes.total_paid),
+        'total_interest': money(quotes.total_interest)
+    }
+
+    if data.get('schedule'):
+        if sum(terms) > MAX_SCHEDULE_MONTHS:
+            return jsonify({'error': f'Schedules exceed {MAX_SCHEDULE_MONTHS} months in total'}), 400
+        schedules = schedule(amounts, terms, rates, method)
+        response['schedule'] = {
+            'offsets': schedules.offsets.tolist(),
+            'interest': money(schedules.interest),
+            'principal': money(schedules.principal),
+            'balance': money(schedules.balance)
+        }
+
+    return jsonify(response)
+
 @app.route('/approve_loan', methods=['POST'])
 def approve_loan():
     data = request.json
@@ -77,10 +301,12 @@ def approve_loan():
         return jsonify({'error': 'Invalid buyer address'}), 400
 
     loan = loans[buyer_address]
-    if loan.is_approved:
-        return jsonify({'error': 'Loan already approved'}), 400
+    with loan_lock:
+        if loan.is_approved:
+            return jsonify({'error': 'Loan already approved'}), 400
 
-    loan.is_approved = True
+        loan.is_approved = True
+        record_event('LoanApproved', buyer_address, loan)
 
     return jsonify({
         'status': 'success',
@@ -102,8 +328,10 @@ def reject_loan():
         return jsonify({'error': 'Invalid buyer address'}), 400
 
     loan = loans[buyer_address]
-    loan.is_approved = False
-    loan.is_repaid = True
+    with loan_lock:
+        loan.is_approved = False
+        loan.is_repaid = True
+        record_event('LoanRejected', buyer_address, loan)
 
     return jsonify({
         'status': 'success',
@@ -125,10 +353,13 @@ def repay_loan():
         return jsonify({'error': 'Invalid buyer address'}), 400
 
     loan = loans[buyer_address]
-    if not loan.is_approved:
-        return jsonify({'error': 'Loan not approved'}), 400
+    with loan_lock:
+        if not loan.is_approved:
+            return jsonify({'error': 'Loan not approved'}), 400
 
-    loan.is_repaid = True
+        loan.is_repaid = True
+        loan.outstanding_balance = 0.0
+        record_event('LoanRepaid', buyer_address, loan)
 
     return jsonify({
         'status': 'success',
@@ -137,22 +368,132 @@ def repay_loan():
         'property_id': loan.property_id
     })
 
+posted_periods: Set[str] = set()  # persisted in journal snapshots, and restored with them
+posting_lock = threading.Lock()  # one posting run at a time
+posted_lock = threading.Lock()  # a run's postings and its period reach a snapshot together
+
+def snapshot_state():
+    with posted_lock:
+        return loans.copy_columns(SNAPSHOT_COLUMNS), sorted(posted_periods)
+
+@app.route('/post_installments', methods=['POST'])
+def post_installments():
+    # End-of-month run: every approved, unrepaid loan pays one installment unless listed as missed
+    data = request.json or {}
+    admin_key = request.headers.get('X-Admin-Key')
+    period = data.get('period', datetime.now().strftime('%Y-%m'))
+    missed = data.get('missed', [])
+
+    if not admin_key or admin_key != admin_address:
+        return jsonify({'error': 'Unauthorized access'}), 401
+
+    if not isinstance(period, str) or not isinstance(missed, list) or not all(isinstance(m, str) for m in missed):
+        return jsonify({'error': 'Invalid posting parameters'}), 400
+
+    with posting_lock:
+        if period in posted_periods:
+            return jsonify({'error': 'Installments already posted for this period'}), 400
+
+        start = datetime.now()
+        with posted_lock:
+            report = loans.post_installments(loans.rows(missed))
+            posted_periods.add(period)
+        loan_events.inc('InstallmentsPosted')
+        events.publish('InstallmentsPosted', period=period, **report)
+        if journal is not None:
+            # One snapshot records the whole run and its period instead of a journal entry per loan
+            journal.snapshot()
+
+    return jsonify({
+        'status': 'success',
+        'event': 'InstallmentsPosted',
+        'period': period,
+        **report,
+        'seconds': (datetime.now() - start).total_seconds()
+    })
+
+def loan_status_payload(is_approved: bool, is_repaid: bool, amount: float, property_id: int, term_in_months: int,
+                        monthly_installment: float, installments_paid: int, outstanding_balance: float) -> dict:
+    return {
+        'is_approved': is_approved and not is_repaid,
+        'loan_details': {
+            'amount': amount,
+            'property_id': property_id,
+            'term_in_months': term_in_months,
+            'monthly_installment': monthly_installment,
+            'installments_paid': installments_paid,
+            'outstanding_balance': outstanding_balance,
+            'is_repaid': is_repaid
+        }
+    }
+
 @app.route('/loan_status/<buyer_address>', methods=['GET'])
 def loan_status(buyer_address):
-    if buyer_address not in loans:
+    loan = loans.get(buyer_address)
+    if loan is None:
         return jsonify({'error': 'Loan not found'}), 404
 
-    loan = loans[buyer_address]
+    return status_cache.respond(buyer_address, loan.version, lambda: loan_status_payload(*loan.fields()))
+
+MAX_BULK_LOOKUPS = 1000
+
+@app.route('/loan_statuses', methods=['POST'])
+def loan_statuses():
+    # Bulk /loan_status: found loans keyed by buyer address, plus the addresses with no loan
+    data = request.json
+    buyers = data.get('buyers') if isinstance(data, dict) else None
+
+    if not isinstance(buyers, list) or not buyers:
+        return jsonify({'error': 'Missing required parameters'}), 400
+
+    if not all(isinstance(buyer, str) for buyer in buyers):
+        return jsonify({'error': 'Invalid buyer address'}), 400
+
+    buyers = list(dict.fromkeys(buyers))  # Drop repeats, keep order
+    if len(buyers) > MAX_BULK_LOOKUPS:
+        return jsonify({'error': f'Lookup exceeds {MAX_BULK_LOOKUPS} buyers'}), 400
+
+    rows = loans.find_rows(buyers)
+    found = rows >= 0
+    found_buyers = [buyer for buyer, hit in zip(buyers, found.tolist()) if hit]
     return jsonify({
-        'is_approved': loan.is_approved and not loan.is_repaid,
-        'loan_details': {
-            'amount': loan.amount,
-            'property_id': loan.property_id,
-            'term_in_months': loan.term_in_months,
-            'monthly_installment': loan.monthly_installment,
-            'is_repaid': loan.is_repaid
-        }
+        'loans': {buyer: loan_status_payload(*fields)
+                  for buyer, fields in zip(found_buyers, loans.fields_at(rows[found]))},
+        'missing': [buyer for buyer, hit in zip(buyers, found.tolist()) if not hit]
     })
 
+@app.route('/portfolio_summary', methods=['GET'])
+def portfolio_summary():
+    # Served from running totals that every loan transition updates, so it costs the same at any portfolio size
+    property_id = request.args.get('property_id', type=int)
+    if 'property_id' in request.args and property_id is None:
+        return jsonify({'error': 'Invalid property id'}), 400
+
+    summary = loans.portfolio_summary(property_id)
+    if property_id is not None and summary['property'] is None:
+        return jsonify({'error': 'Property not found'}), 404
+    return jsonify(summary)
+
+@app.route('/events', methods=['GET'])
+def poll_events():
+    # Long-poll: waits up to `timeout` seconds for events after `cursor`
+    cursor, timeout, limit = poll_params(request.args)
+
+    new_events, cursor, truncated = events.wait(cursor, timeout, limit)
+    return jsonify({'events': new_events, 'cursor': cursor, 'truncated': truncated})
+
+@app.route('/status_cache_stats', methods=['GET'])
+def status_cache_stats():
+    return jsonify(status_cache.report())
+
+@app.route('/metrics', methods=['GET'])
+def scrape_metrics():
+    return app.response_class(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
 if __name__ == '__main__':
+    # With debug=True the reloader's parent process only watches files; its child serves requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        open_journal()
+        if EVENT_STREAM_PORT:
+            EventStreamServer(events, port=EVENT_STREAM_PORT).start()
     app.run(debug=True)
\ No newline at end of file
@@ -148,5 +148,71 @@ test_endpoint "Apply loan with missing parameters" "curl -s -X POST http://local
 test_endpoint "Check non-existent loan status" \
 "curl -s -X GET http://localhost:5000/loan_status/0x9876543210abcdef9876543210abcdef98765432" 404
 
+print_header "TESTING BULK LOAN APPLICATIONS"
+
+# Test 12: Apply for a batch of loans, including a duplicate buyer
+test_endpoint "Apply for loans in bulk" "curl -s -X POST http://localhost:5000/apply_loans \
+-H 'Content-Type: application/json' \
+-d '{\"applications\": [{\"buyer_address\": \"0xaaaa567890abcdef1234567890abcdef12345678\",\"property_id\": 130,\"amount\": 150000,\"term_in_months\": 36},{\"buyer_address\": \"0xaaaa567890abcdef1234567890abcdef12345678\",\"property_id\": 131,\"amount\": 90000,\"term_in_months\": 12},{\"buyer_address\": \"$BUYER_ADDRESS\",\"property_id\": 132,\"amount\": 50000,\"term_in_months\": 12}]}'" 200
+
+# Test 13: Bulk apply without applications (should fail)
+test_endpoint "Apply for loans in bulk without applications" "curl -s -X POST http://localhost:5000/apply_loans \
+-H 'Content-Type: application/json' \
+-d '{\"applications\": []}'" 400
+
+print_header "TESTING BATCH QUOTES"
+
+# Test 14: Quote a batch of loans with amortization schedules
+test_endpoint "Quote loans in bulk" "curl -s -X POST http://localhost:5000/quote_loans \
+-H 'Content-Type: application/json' \
+-d '{\"amounts\": [150000, 90000],\"terms\": [36, 12],\"rates\": [6.5, 4],\"method\": \"annuity\",\"schedule\": true}'" 200
+
+# Test 15: Quote with mismatched amounts and terms (should fail)
+test_endpoint "Quote loans with mismatched parameters" "curl -s -X POST http://localhost:5000/quote_loans \
+-H 'Content-Type: application/json' \
+-d '{\"amounts\": [150000, 90000],\"terms\": [36]}'" 400
+
+print_header "TESTING INSTALLMENT POSTING"
+
+# Test 16: Post a month of installments without admin key (should fail)
+test_endpoint "Post installments without admin key" "curl -s -X POST http://localhost:5000/post_installments \
+-H 'Content-Type: application/json' \
+-d '{\"period\": \"test-$(date +%s)\"}'" 401
+
+# Test 17: Post a month of installments for the approved portfolio
+test_endpoint "Post installments with admin key" "curl -s -X POST http://localhost:5000/post_installments \
+-H 'Content-Type: application/json' \
+-H 'X-Admin-Key: $ADMIN_ADDRESS' \
+-d '{\"period\": \"test-$(date +%s)\"}'" 200
+
+print_header "TESTING CONDITIONAL STATUS POLLING"
+
+# Test 18: Poll loan status with the ETag from the previous poll (should be 304 Not Modified)
+ETAG=$(curl -s -o /dev/null -D - http://localhost:5000/loan_status/$BUYER_ADDRESS | tr -d '\r' | awk 'tolower($1) == "etag:" {print $2}')
+test_endpoint "Poll unchanged loan status" "curl -s http://localhost:5000/loan_status/$BUYER_ADDRESS \
+-H 'If-None-Match: $ETAG'" 304
+
+print_header "TESTING EVENT LOG"
+
+# Test 19: Read loan lifecycle events from the start of the log without waiting
+test_endpoint "Poll loan events" "curl -s 'http://localhost:5000/events?cursor=0&timeout=0&limit=5'" 200
+
+print_header "TESTING BULK STATUS LOOKUP"
+
+# Test 20: Look up several loans in one request; unknown buyers are listed as missing
+test_endpoint "Look up loans in bulk" "curl -s -X POST http://localhost:5000/loan_statuses \
+-H 'Content-Type: application/json' \
+-d '{\"buyers\": [\"$BUYER_ADDRESS\", \"0x0000000000000000000000000000000000000001\"]}'" 200
+
+print_header "TESTING METRICS"
+
+# Test 21: Scrape request, loan state and cache metrics in Prometheus text format
+test_endpoint "Scrape metrics" "curl -s http://localhost:5000/metrics" 200
+
+print_header "TESTING PORTFOLIO SUMMARY"
+
+# Test 22: Read the running portfolio totals, overall and by term bucket
+test_endpoint "Get portfolio summary" "curl -s http://localhost:5000/portfolio_summary" 200
+
 print_header "TEST SUMMARY"
 echo "Completed all loan processing tests!"
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""Memory and throughput benchmark: dict of Loan dataclasses vs the columnar LoanStore.
+
+Each (implementation, size) case runs in its own subprocess so resident memory
+is measured from a clean interpreter.
+
+    python bench_loan_store.py                      # 1M and 10M loans
+    python bench_loan_store.py --sizes 100000 1000000 --json results.json
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+from loan_store import FLAG_APPROVED
+
+CHUNK = 100000
+SAMPLE = 200000
+
+
+def rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # Peak RSS is the best we can do off Linux (KiB on Linux, bytes on macOS)
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def address(i: int) -> str:
+    return '0x%040x' % i
+
+
+def run_case(impl: str, size: int) -> dict:
+    from bank_server import Loan
+    from loan_store import LoanStore
+
+    base = rss_bytes()
+    start = time.perf_counter()
+    if impl == 'dict':
+        loans = {}
+        for i in range(size):
+            loans[address(i)] = Loan(False, False, 100000.0 + i, i, 12 + i % 348, (100000.0 + i) * 1.05 / 12)
+    else:
+        loans = LoanStore(capacity=size)
+        for chunk_start in range(0, size, CHUNK):
+            loans.update([(address(i), Loan(False, False, 100000.0 + i, i, 12 + i % 348, (100000.0 + i) * 1.05 / 12))
+                          for i in range(chunk_start, min(chunk_start + CHUNK, size))])
+    build_seconds = time.perf_counter() - start
+    memory = rss_bytes() - base
+
+    rng = random.Random(42)
+    keys = [address(rng.randrange(size)) for _ in range(SAMPLE)]
+
+    start = time.perf_counter()
+    total = 0.0
+    for key in keys:
+        loan = loans[key]
+        if not loan.is_approved:
+            total += loan.amount
+    lookup_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for key in keys:
+        loans[key].is_approved = True
+    update_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if impl == 'dict':
+        exposure = sum(loan.amount for loan in loans.values() if loan.is_approved)
+    else:
+        n = loans.size
+        exposure = float(loans.amount[:n][(loans.flags[:n] & FLAG_APPROVED) != 0].sum())
+    scan_seconds = time.perf_counter() - start
+
+    return {
+        'impl': impl,
+        'loans': size,
+        'memory_bytes': memory,
+        'bytes_per_loan': memory / size,
+        'build_per_sec': size / build_seconds,
+        'lookup_per_sec': SAMPLE / lookup_seconds,
+        'update_per_sec': SAMPLE / update_seconds,
+        'exposure_scan_seconds': scan_seconds,
+        'exposure': exposure,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000000, 10000000])
+    parser.add_argument('--impls', nargs='+', default=['dict', 'columnar'], choices=['dict', 'columnar'])
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--case', nargs=2, metavar=('IMPL', 'SIZE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case[0], int(args.case[1]))))
+        return
+
+    results = []
+    print(f"{'impl':<10} {'loans':>10} {'MiB':>9} {'B/loan':>8} {'build/s':>11} {'lookup/s':>11} {'update/s':>11} {'scan s':>8}")
+    for size in args.sizes:
+        for impl in args.impls:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', impl, str(size)],
+                                    capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            if output.returncode != 0:
+                print(f'{impl:<10} {size:>10} failed: {output.stderr.strip().splitlines()[-1:]}')
+                continue
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{impl:<10} {size:>10} {result['memory_bytes'] / 2**20:>9.1f} {result['bytes_per_loan']:>8.1f} "
+                  f"{result['build_per_sec']:>11,.0f} {result['lookup_per_sec']:>11,.0f} "
+                  f"{result['update_per_sec']:>11,.0f} {result['exposure_scan_seconds']:>8.3f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
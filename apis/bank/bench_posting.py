@@ -0,0 +1,123 @@
+"""Benchmark for the end-of-month installment posting run.
+
+Builds an approved portfolio in a LoanStore, times vectorized posting runs,
+and compares one month against posting the same loans one LoanView at a time
+(measured on a sample and scaled up). A final check posts every remaining
+month and verifies that the whole portfolio ends up repaid.
+
+    python bench_posting.py                         # 1M and 5M loans
+    python bench_posting.py --sizes 100000 --months 3 --json results.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from bank_server import Loan, calculate_monthly_installment
+from loan_store import FLAG_REPAID, LoanStore
+
+CHUNK = 100000
+LOOP_SAMPLE = 200000
+
+
+def address(i: int) -> str:
+    return '0x%040x' % i
+
+
+def build(size: int) -> LoanStore:
+    loans = LoanStore(capacity=size)
+    for chunk_start in range(0, size, CHUNK):
+        batch = []
+        for i in range(chunk_start, min(chunk_start + CHUNK, size)):
+            amount, term = 100000.0 + i % 900000, 12 + i % 349
+            batch.append((address(i), Loan(True, False, amount, i, term, calculate_monthly_installment(amount, term))))
+        loans.update(batch)
+    return loans
+
+
+def loop_post(loans: LoanStore, buyers) -> None:
+    # What a per-loan job does: read, update and write back one loan at a time
+    for buyer in buyers:
+        loan = loans[buyer]
+        if not loan.is_approved or loan.is_repaid or loan.outstanding_balance <= 0:
+            continue
+        payment = min(loan.monthly_installment, loan.outstanding_balance)
+        loan.outstanding_balance = loan.outstanding_balance - payment
+        loan.installments_paid += 1
+        if loan.outstanding_balance < 0.005 or loan.installments_paid >= loan.term_in_months:
+            loan.outstanding_balance = 0.0
+            loan.is_repaid = True
+
+
+def run_case(size: int, months: int) -> dict:
+    start = time.perf_counter()
+    loans = build(size)
+    build_seconds = time.perf_counter() - start
+
+    none_missed = np.empty(0, dtype=np.int64)
+    run_seconds = []
+    for _ in range(months):
+        start = time.perf_counter()
+        report = loans.post_installments(none_missed)
+        run_seconds.append(time.perf_counter() - start)
+
+    sample = min(size, LOOP_SAMPLE)
+    loop_loans = build(sample)
+    start = time.perf_counter()
+    loop_post(loop_loans, [address(i) for i in range(sample)])
+    loop_seconds = (time.perf_counter() - start) * size / sample
+
+    # Both implementations must agree on the sample after one month
+    check = build(sample)
+    check.post_installments(none_missed)
+    assert np.array_equal(check.balance[:sample], loop_loans.balance[:sample])
+    assert np.array_equal(check.installments_paid[:sample], loop_loans.installments_paid[:sample])
+
+    # Post the rest of the longest term: everything must be repaid
+    remaining_months = int(loans.term_in_months[:size].max()) - months
+    start = time.perf_counter()
+    for _ in range(remaining_months):
+        loans.post_installments(none_missed)
+    full_term_seconds = time.perf_counter() - start
+    repaid = int(((loans.flags[:size] & FLAG_REPAID) != 0).sum())
+
+    return {
+        'loans': size,
+        'build_seconds': build_seconds,
+        'run_seconds_median': float(np.median(run_seconds)),
+        'loans_per_sec': size / float(np.median(run_seconds)),
+        'loop_seconds_estimate': loop_seconds,
+        'speedup': loop_seconds / float(np.median(run_seconds)),
+        'posted_per_run': report['posted'],
+        'full_term_months': remaining_months + months,
+        'full_term_seconds': full_term_seconds,
+        'repaid_after_full_term': repaid,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000000, 5000000])
+    parser.add_argument('--months', type=int, default=5, help='timed posting runs per size')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'loans':>10} {'run s':>8} {'loans/s':>13} {'loop s (est)':>13} {'speedup':>8} {'repaid':>10}")
+    for size in args.sizes:
+        result = run_case(size, args.months)
+        results.append(result)
+        print(f"{size:>10} {result['run_seconds_median']:>8.3f} {result['loans_per_sec']:>13,.0f} "
+              f"{result['loop_seconds_estimate']:>13.1f} {result['speedup']:>7.0f}x "
+              f"{result['repaid_after_full_term']:>10}")
+        if result['repaid_after_full_term'] != size:
+            raise SystemExit(f'{size - result["repaid_after_full_term"]} loans still open after their full term')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
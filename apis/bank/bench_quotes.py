@@ -0,0 +1,130 @@
+"""Throughput benchmark: vectorized quote engine vs a per-loan Python loop.
+
+Prices a random portfolio with both pricing methods, checks that the
+vectorized results match the loop, and reports loans (or schedule months)
+per second.
+
+    python bench_quotes.py                          # 100k loans
+    python bench_quotes.py --loans 1000000 --schedule-loans 100000 --json results.json
+"""
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+
+from bank_server import calculate_monthly_installment
+from quote_engine import METHODS, quote, schedule
+
+
+def loop_installment(amount: float, term: int, rate: float, method: str) -> float:
+    if method == 'flat':
+        return (amount + amount * rate / 100) / term
+    r = rate / 1200
+    if r == 0:
+        return amount / term
+    return amount * r / (1 - (1 + r) ** -term)
+
+
+def loop_schedule(amount: float, term: int, rate: float, method: str):
+    payment = loop_installment(amount, term, rate, method)
+    rows = []
+    balance = amount
+    for _ in range(term):
+        if method == 'flat':
+            interest = amount * rate / 100 / term
+            principal = amount / term
+        else:
+            interest = balance * rate / 1200
+            principal = payment - interest
+        balance -= principal
+        rows.append((interest, principal, balance))
+    return rows
+
+
+def portfolio(size: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    amounts = rng.uniform(50000, 2000000, size).round(2)
+    terms = rng.choice([60, 120, 180, 240, 360], size)
+    rates = rng.uniform(2, 9, size).round(3)
+    return amounts, terms, rates
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def bench_quotes(size: int) -> list:
+    amounts, terms, rates = portfolio(size)
+    py_amounts, py_terms, py_rates = amounts.tolist(), terms.tolist(), rates.tolist()
+    results = []
+    for method in METHODS:
+        expected, loop_seconds = timed(lambda: [
+            loop_installment(a, n, r, method) for a, n, r in zip(py_amounts, py_terms, py_rates)])
+        quotes, vector_seconds = timed(lambda: quote(amounts, terms, rates, method))
+        results.append({
+            'case': f'quote/{method}',
+            'loans': size,
+            'loop_per_sec': size / loop_seconds,
+            'vectorized_per_sec': size / vector_seconds,
+            'speedup': loop_seconds / vector_seconds,
+            'max_abs_error': float(np.max(np.abs(quotes.monthly_installment - expected))),
+        })
+    return results
+
+
+def bench_schedules(size: int) -> list:
+    amounts, terms, rates = portfolio(size)
+    py_amounts, py_terms, py_rates = amounts.tolist(), terms.tolist(), rates.tolist()
+    months = int(terms.sum())
+    results = []
+    for method in METHODS:
+        expected, loop_seconds = timed(lambda: [
+            loop_schedule(a, n, r, method) for a, n, r in zip(py_amounts, py_terms, py_rates)])
+        schedules, vector_seconds = timed(lambda: schedule(amounts, terms, rates, method))
+        flat = np.array([row for rows in expected for row in rows])
+        errors = np.abs(np.column_stack([schedules.interest, schedules.principal, schedules.balance]) - flat)
+        results.append({
+            'case': f'schedule/{method}',
+            'loans': size,
+            'months': months,
+            'loop_per_sec': months / loop_seconds,
+            'vectorized_per_sec': months / vector_seconds,
+            'speedup': loop_seconds / vector_seconds,
+            'max_abs_error': float(errors.max()),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--loans', type=int, default=100000, help='loans to quote')
+    parser.add_argument('--schedule-loans', type=int, default=20000, help='loans to build full schedules for')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    # The flat method must reproduce the server's scalar formula bit for bit
+    amounts, terms, _ = portfolio(1000)
+    flat = quote(amounts, terms, 5, 'flat').monthly_installment.tolist()
+    assert flat == [calculate_monthly_installment(a, n) for a, n in zip(amounts.tolist(), terms.tolist())]
+
+    results = bench_quotes(args.loans) + bench_schedules(args.schedule_loans)
+    print(f"{'case':<18} {'loans':>9} {'loop/s':>13} {'vectorized/s':>14} {'speedup':>8} {'max error':>10}")
+    for r in results:
+        unit = ' months' if 'months' in r else ''
+        print(f"{r['case']:<18} {r['loans']:>9} {r['loop_per_sec']:>13,.0f} {r['vectorized_per_sec']:>14,.0f} "
+              f"{r['speedup']:>7.1f}x {r['max_abs_error']:>10.2e}{unit}")
+
+    if any(not math.isfinite(r['max_abs_error']) or r['max_abs_error'] > 1e-4 for r in results):
+        raise SystemExit('vectorized results differ from the per-loan loop')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Open-addressing hash tables of row numbers held in NumPy arrays (linear probing)"""
+import numpy as np
+
+
+def build_table(hashes: np.ndarray, table_size: int, dtype=np.int64) -> np.ndarray:
+    """Open-addressing table of row numbers for the given key hashes"""
+    slots = np.full(table_size, -1, dtype=dtype)
+    insert(slots, hashes, np.arange(len(hashes), dtype=dtype))
+    return slots
+
+
+def insert(slots: np.ndarray, hashes: np.ndarray, rows: np.ndarray):
+    """Add rows with the given hashes to a table that has room for them, probing all rows in vectorized rounds"""
+    mask = len(slots) - 1
+    positions = hashes & mask
+    while len(rows):
+        free = slots[positions] < 0
+        # Among rows probing the same free slot, the first one takes it
+        _, first = np.unique(positions[free], return_index=True)
+        winners = np.flatnonzero(free)[first]
+        slots[positions[winners]] = rows[winners]
+        keep = np.ones(len(rows), dtype=bool)
+        keep[winners] = False
+        rows = rows[keep]
+        positions = (positions[keep] + 1) & mask
+
+
+def lookup(slots: np.ndarray, stored_keys: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """Row of each key in a table of integer keys hashed as themselves, or -1 where absent"""
+    mask = len(slots) - 1
+    found = np.full(len(keys), -1, dtype=np.int64)
+    pending = np.arange(len(keys))
+    positions = keys & mask
+    while len(pending):
+        rows = slots[positions]
+        empty = rows < 0
+        hit = ~empty & (stored_keys[np.maximum(rows, 0)] == keys[pending])
+        found[pending[hit]] = rows[hit]
+        keep = ~(empty | hit)
+        pending = pending[keep]
+        positions = (positions[keep] + 1) & mask
+    return found
+
+
+def table_size(capacity: int) -> int:
+    """Power-of-two slot count keeping an index at most half full"""
+    size = 16
+    while size < capacity * 2:
+        size *= 2
+    return size
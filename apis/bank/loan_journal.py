@@ -0,0 +1,294 @@
+import glob
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# A loan record as stored in the journal and snapshots:
+# (is_approved, is_repaid, amount, property_id, term_in_months, monthly_installment,
+#  installments_paid, outstanding_balance)
+# Journal entries written before installment posting existed carry only the first six fields.
+LoanFields = Tuple[bool, bool, float, int, int, float, int, float]
+
+# Snapshots hold one packed row per loan, written and read as a whole NumPy structured array,
+# followed by the installment periods posted so far as a JSON list
+SNAPSHOT_MAGIC = b'LOANSNP3'
+SNAPSHOT_HEADER = struct.Struct('<QQH')  # last journal seq, record count, address width in bytes
+PERIODS_LENGTH = struct.Struct('<I')
+# LoanStore columns in a snapshot row; flags has bit 1 for approved and bit 2 for repaid
+SNAPSHOT_COLUMNS = ('address', 'flags', 'amount', 'property_id', 'term_in_months', 'monthly_installment',
+                    'installments_paid', 'balance')
+# Version 2 snapshots have a length-prefixed address and a struct per loan
+SNAPSHOT_MAGIC_V2 = b'LOANSNP2'
+SNAPSHOT_HEADER_V2 = struct.Struct('<QQ')
+SNAPSHOT_RECORD_V2 = struct.Struct('<Bdqqdid')  # flags, amount, property_id, term, installment, paid, balance
+# Version 1 snapshots predate installment posting
+SNAPSHOT_MAGIC_V1 = b'LOANSNP1'
+SNAPSHOT_RECORD_V1 = struct.Struct('<Bdqqd')
+ADDRESS_LENGTH = struct.Struct('<H')
+CHECKSUM = struct.Struct('<I')
+
+FSYNC_MODES = ('always', 'group', 'none')
+
+
+def snapshot_dtype(address_width: int) -> np.dtype:
+    return np.dtype([('address', f'S{address_width}'), ('flags', '<u1'), ('amount', '<f8'), ('property_id', '<i8'),
+                     ('term_in_months', '<i8'), ('monthly_installment', '<f8'), ('installments_paid', '<i4'),
+                     ('balance', '<f8')])
+
+
+def encode_snapshot(seq: int, columns: Dict[str, np.ndarray], periods: List[str]) -> bytes:
+    """Snapshot of the SNAPSHOT_COLUMNS arrays, packed row by row in one vectorized pass"""
+    addresses = columns['address']
+    rows = np.empty(len(addresses), dtype=snapshot_dtype(addresses.dtype.itemsize))
+    for name in SNAPSHOT_COLUMNS:
+        rows[name] = columns[name]
+    encoded_periods = json.dumps(periods).encode('utf-8')
+    body = b''.join([SNAPSHOT_HEADER.pack(seq, len(rows), addresses.dtype.itemsize), rows.tobytes(),
+                     PERIODS_LENGTH.pack(len(encoded_periods)), encoded_periods])
+    return SNAPSHOT_MAGIC + body + CHECKSUM.pack(zlib.crc32(body))
+
+
+def _decode_rows(body: bytes) -> Tuple[int, List[Tuple[str, LoanFields]], List[str]]:
+    seq, count, address_width = SNAPSHOT_HEADER.unpack_from(body, 0)
+    dtype = snapshot_dtype(address_width)
+    rows = np.frombuffer(body, dtype=dtype, count=count, offset=SNAPSHOT_HEADER.size)
+    flags = rows['flags']
+    fields = zip(((flags & 1) != 0).tolist(), ((flags & 2) != 0).tolist(),
+                 *(rows[name].tolist() for name in SNAPSHOT_COLUMNS[2:]))
+    addresses = [address.decode('utf-8') for address in rows['address'].tolist()]
+
+    offset = SNAPSHOT_HEADER.size + count * dtype.itemsize
+    periods = []
+    if offset < len(body):  # Snapshots taken before periods were recorded end with the rows
+        (length,) = PERIODS_LENGTH.unpack_from(body, offset)
+        offset += PERIODS_LENGTH.size
+        periods = json.loads(body[offset:offset + length])
+    return seq, list(zip(addresses, fields)), periods
+
+
+def _decode_records(body: bytes, record_format: struct.Struct) -> Tuple[int, List[Tuple[str, LoanFields]], List[str]]:
+    seq, count = SNAPSHOT_HEADER_V2.unpack_from(body, 0)
+    offset = SNAPSHOT_HEADER_V2.size
+    records = []
+    for _ in range(count):
+        (length,) = ADDRESS_LENGTH.unpack_from(body, offset)
+        offset += ADDRESS_LENGTH.size
+        buyer = body[offset:offset + length].decode('utf-8')
+        offset += length
+        flags, *values = record_format.unpack_from(body, offset)
+        offset += record_format.size
+        records.append((buyer, (bool(flags & 1), bool(flags & 2), *values)))
+    return seq, records, []
+
+
+def decode_snapshot(data: bytes) -> Tuple[int, List[Tuple[str, LoanFields]], List[str]]:
+    """(last journal seq, loans, posted installment periods) of a snapshot of any version"""
+    magic = data[:len(SNAPSHOT_MAGIC)]
+    if magic not in (SNAPSHOT_MAGIC, SNAPSHOT_MAGIC_V2, SNAPSHOT_MAGIC_V1):
+        raise ValueError('Not a loan snapshot')
+    body = data[len(SNAPSHOT_MAGIC):-CHECKSUM.size]
+    (checksum,) = CHECKSUM.unpack(data[-CHECKSUM.size:])
+    if zlib.crc32(body) != checksum:
+        raise ValueError('Loan snapshot checksum mismatch')
+
+    if magic == SNAPSHOT_MAGIC:
+        return _decode_rows(body)
+    return _decode_records(body, SNAPSHOT_RECORD_V2 if magic == SNAPSHOT_MAGIC_V2 else SNAPSHOT_RECORD_V1)
+
+
+class LoanJournal:
+    """Append-only journal of loan events with periodic binary snapshots.
+
+    Every event carries the full resulting loan state, so replaying an event
+    that is already reflected in a snapshot is harmless. The journal is split
+    into segments named after their first sequence number; taking a snapshot
+    starts a new segment and deletes the ones the snapshot covers.
+    Installment posting runs are not journaled but snapshotted, together
+    with the periods posted so far.
+    """
+
+    def __init__(self, directory: str, snapshot_source: Callable[[], Tuple[Dict[str, np.ndarray], List[str]]],
+                 fsync_mode: str = 'group', group_commit_ms: float = 5,
+                 snapshot_every: int = 100000, snapshot_interval: float = 300,
+                 lock: Optional[threading.RLock] = None):
+        if fsync_mode not in FSYNC_MODES:
+            raise ValueError(f'fsync_mode must be one of {FSYNC_MODES}')
+        self.directory = directory
+        self.snapshot_source = snapshot_source  # returns the SNAPSHOT_COLUMNS and the posted periods
+        self.posted_periods: List[str] = []  # as of the snapshot restored by recover()
+        self.fsync_mode = fsync_mode
+        self.group_commit_interval = group_commit_ms / 1000
+        self.snapshot_every = snapshot_every
+        self.snapshot_interval = snapshot_interval
+
+        # Callers hold lock while changing a loan and recording it, so entries are appended in the order the
+        # changes were made; snapshots take it too, so they see either both or neither
+        self._cond = threading.Condition(lock or threading.RLock())
+        self._snapshot_lock = threading.Lock()  # one snapshot at a time, held from its seq to its cleanup
+        self._failed: Optional[BaseException] = None  # set when the flusher thread stops on an error
+        self._seq = 0
+        self._durable_seq = 0
+        self._since_snapshot = 0
+        self._last_snapshot = time.monotonic()
+        self._file = None
+        self._closed = False
+        self._flusher: Optional[threading.Thread] = None
+        os.makedirs(directory, exist_ok=True)
+
+    # Recovery
+
+    def _segments(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, 'journal-*.log')))
+
+    def _snapshots(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, 'snapshot-*.bin')))
+
+    def recover(self) -> Iterator[Tuple[str, LoanFields]]:
+        """Yield the latest snapshot's loans followed by the journal tail, then open for appends"""
+        snapshot_seq = 0
+        for path in reversed(self._snapshots()):
+            try:
+                with open(path, 'rb') as f:
+                    snapshot_seq, records, self.posted_periods = decode_snapshot(f.read())
+            except (OSError, ValueError, struct.error):
+                continue  # Fall back to an older snapshot
+            yield from records
+            break
+
+        self._seq = snapshot_seq
+        for path in self._segments():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # Torn write at the end of a segment
+                    if entry['seq'] <= snapshot_seq:
+                        continue
+                    self._seq = entry['seq']
+                    yield entry['buyer'], tuple(entry['loan'])
+
+        self._durable_seq = self._seq
+        self._open_segment()
+        self._flusher = threading.Thread(target=self._flush_loop, name='loan-journal', daemon=True)
+        self._flusher.start()
+
+    def _open_segment(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        path = os.path.join(self.directory, f'journal-{self._seq + 1:020d}.log')
+        self._file = open(path, 'a', encoding='utf-8')
+
+    # Appends
+
+    def record(self, event: str, buyer: str, loan: LoanFields):
+        self.record_many(event, [(buyer, loan)])
+
+    def record_many(self, event: str, entries: Iterable[Tuple[str, LoanFields]]):
+        with self._cond:
+            self._check_failed()
+            for buyer, loan in entries:
+                self._seq += 1
+                self._file.write(json.dumps({'seq': self._seq, 'event': event, 'buyer': buyer, 'loan': list(loan)},
+                                            separators=(',', ':')) + '\n')
+                self._since_snapshot += 1
+            seq = self._seq
+
+            if self.fsync_mode == 'always':
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._durable_seq = seq
+            elif self.fsync_mode == 'group':
+                # Group commit: wait for the flusher's next fsync, which covers every waiting writer
+                while self._durable_seq < seq and not self._closed and self._failed is None:
+                    self._cond.wait()
+                self._check_failed()
+
+    def _check_failed(self):
+        # Called with _cond held
+        if self._failed is not None:
+            raise RuntimeError('Loan journal stopped after an error') from self._failed
+
+    def _flush_loop(self):
+        try:
+            while not self._closed:
+                time.sleep(self.group_commit_interval)
+                self.flush()
+                if (self._since_snapshot >= self.snapshot_every or
+                        (self._since_snapshot and time.monotonic() - self._last_snapshot >= self.snapshot_interval)):
+                    self.snapshot()
+        except Exception as e:
+            # Writers waiting on a group commit would otherwise wait forever
+            print(f"Loan journal failed: {e}")
+            with self._cond:
+                self._failed = e
+                self._cond.notify_all()
+
+    def flush(self):
+        with self._cond:
+            if self._file is None or self._durable_seq >= self._seq:
+                return
+            self._file.flush()
+            target = self._seq
+            fd = self._file.fileno()
+            if self.fsync_mode == 'none':
+                self._durable_seq = target
+                return
+
+        # fsync outside the lock so writers can keep appending to the next group
+        os.fsync(fd)
+        with self._cond:
+            self._durable_seq = max(self._durable_seq, target)
+            self._cond.notify_all()
+
+    # Snapshots
+
+    def snapshot(self):
+        with self._snapshot_lock:
+            self._snapshot()
+
+    def _snapshot(self):
+        with self._cond:
+            # Every event up to seq has already been applied to the state being captured
+            seq = self._seq
+            # Copies of the columns are quick to take; packing them happens after writers are let go
+            columns, periods = self.snapshot_source()
+            self._open_segment()
+            self._durable_seq = seq
+            self._since_snapshot = 0
+            self._last_snapshot = time.monotonic()
+            self._cond.notify_all()
+
+        path = os.path.join(self.directory, f'snapshot-{seq:020d}.bin')
+        with open(path + '.tmp', 'wb') as f:
+            f.write(encode_snapshot(seq, columns, periods))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+        # Drop the snapshots and segments this snapshot supersedes: everything up to its seq
+        first_uncovered = f'journal-{seq + 1:020d}.log'
+        superseded = [old for old in self._snapshots() if os.path.basename(old) < os.path.basename(path)]
+        superseded += [segment for segment in self._segments() if os.path.basename(segment) < first_uncovered]
+        for old in superseded:
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
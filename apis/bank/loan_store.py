@@ -0,0 +1,389 @@
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from hash_index import build_table, table_size
+from portfolio import Portfolio, check_totals, summarize_loans, term_buckets
+
+# Bits of the per-loan flags column
+FLAG_APPROVED = 1
+FLAG_REPAID = 2
+
+INITIAL_CAPACITY = 1024
+
+# Per-loan columns, grown together
+COLUMNS = ('address', 'address_hash', 'amount', 'monthly_installment', 'term_in_months',
+           'property_id', 'flags', 'installments_paid', 'balance', 'version', 'term_bucket', 'next_in_property')
+
+# Addresses are '0x' + 40 hex characters; they are stored as fixed-width bytes
+ADDRESS_WIDTH = 42
+
+
+class LoanView:
+    """Row of a LoanStore exposing the same attributes as the Loan dataclass"""
+
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store: 'LoanStore', row: int):
+        self._store = store
+        self._row = row
+
+    def _get_flag(self, bit: int) -> bool:
+        return bool(self._store.flags[self._row] & bit)
+
+    def _set_flag(self, bit: int, value: bool):
+        store = self._store
+        row = self._row
+        with store._lock:
+            flags = store.flags.item(row)
+            new_flags = flags | bit if value else flags & ~bit & 0xFF
+            store.flags[row] = new_flags
+            store.portfolio.move(store.term_bucket.item(row), flags & (FLAG_APPROVED | FLAG_REPAID),
+                                 new_flags & (FLAG_APPROVED | FLAG_REPAID), store.amount.item(row),
+                                 store.balance.item(row))
+            store.version[row] += 1
+
+    @property
+    def version(self) -> int:
+        """Bumped after every change to this loan"""
+        return int(self._store.version[self._row])
+
+    @property
+    def is_approved(self) -> bool:
+        return self._get_flag(FLAG_APPROVED)
+
+    @is_approved.setter
+    def is_approved(self, value: bool):
+        self._set_flag(FLAG_APPROVED, value)
+
+    @property
+    def is_repaid(self) -> bool:
+        return self._get_flag(FLAG_REPAID)
+
+    @is_repaid.setter
+    def is_repaid(self, value: bool):
+        self._set_flag(FLAG_REPAID, value)
+
+    @property
+    def amount(self) -> float:
+        return float(self._store.amount[self._row])
+
+    @property
+    def property_id(self) -> int:
+        return int(self._store.property_id[self._row])
+
+    @property
+    def term_in_months(self) -> int:
+        return int(self._store.term_in_months[self._row])
+
+    @property
+    def monthly_installment(self) -> float:
+        return float(self._store.monthly_installment[self._row])
+
+    @property
+    def installments_paid(self) -> int:
+        return int(self._store.installments_paid[self._row])
+
+    @installments_paid.setter
+    def installments_paid(self, value: int):
+        store = self._store
+        row = self._row
+        with store._lock:
+            store.installments_paid[row] = value
+            store.version[row] += 1
+
+    @property
+    def outstanding_balance(self) -> float:
+        return float(self._store.balance[self._row])
+
+    @outstanding_balance.setter
+    def outstanding_balance(self, value: float):
+        store = self._store
+        row = self._row
+        with store._lock:
+            if store.flags.item(row) & (FLAG_APPROVED | FLAG_REPAID) == FLAG_APPROVED:
+                store.portfolio.change_balance(store.term_bucket.item(row), value - store.balance.item(row))
+            store.balance[row] = value
+            store.version[row] += 1
+
+    def fields(self) -> Tuple[bool, bool, float, int, int, float, int, float]:
+        return (self.is_approved, self.is_repaid, self.amount, self.property_id,
+                self.term_in_months, self.monthly_installment, self.installments_paid, self.outstanding_balance)
+
+    def __repr__(self):
+        return ('Loan(is_approved=%r, is_repaid=%r, amount=%r, property_id=%r, term_in_months=%r, '
+                'monthly_installment=%r, installments_paid=%r, outstanding_balance=%r)' % self.fields())
+
+
+class LoanStore:
+    """Columnar buyer address -> loan mapping backed by typed NumPy arrays.
+
+    Addresses live in a fixed-width byte column and are found through an
+    open-addressing hash table of row numbers, so no Python object is kept
+    per loan. Supports the subset of the dict API the bank uses (``in``,
+    ``[]``, ``update``, ``items``, ``len``); values are LoanView rows rather
+    than Loan instances, so attribute writes go straight into the columns.
+    Every write also moves the loan's contribution in ``portfolio``, the
+    running totals by state and term bucket, which also chains each
+    property's loans together (see portfolio.py).
+    """
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        capacity = max(capacity, 1)
+        self.address = np.zeros(capacity, dtype=f'S{ADDRESS_WIDTH}')
+        self.address_hash = np.zeros(capacity, dtype=np.int64)
+        self.amount = np.zeros(capacity, dtype=np.float64)
+        self.monthly_installment = np.zeros(capacity, dtype=np.float64)
+        self.term_in_months = np.zeros(capacity, dtype=np.int64)
+        self.property_id = np.zeros(capacity, dtype=np.int64)
+        self.flags = np.zeros(capacity, dtype=np.uint8)
+        self.installments_paid = np.zeros(capacity, dtype=np.int32)
+        self.balance = np.zeros(capacity, dtype=np.float64)  # still owed, installments included
+        self.version = np.zeros(capacity, dtype=np.uint32)  # bumped after every write to the row
+        self.term_bucket = np.zeros(capacity, dtype=np.uint8)  # derived; where the loan counts in the portfolio
+        self.next_in_property = np.zeros(capacity, dtype=np.int32)  # next row with the same property, or -1
+        self.slots = np.full(table_size(capacity), -1, dtype=np.int64)
+        self.size = 0  # populated rows; column slices [:size] cover every loan
+        self.portfolio = Portfolio()
+        self._lock = threading.RLock()
+
+    # Address index
+
+    def _find(self, key: bytes, key_hash: int) -> int:
+        slots = self.slots
+        mask = len(slots) - 1
+        slot = key_hash & mask
+        while True:
+            row = int(slots[slot])
+            if row < 0 or (self.address_hash[row] == key_hash and self.address[row] == key):
+                return row
+            slot = (slot + 1) & mask
+
+    def _insert_slot(self, row: int, key_hash: int):
+        mask = len(self.slots) - 1
+        slot = key_hash & mask
+        while self.slots[slot] >= 0:
+            slot = (slot + 1) & mask
+        self.slots[slot] = row
+
+    def _rebuild_index(self, size: int):
+        self.slots = build_table(self.address_hash[:self.size], size)
+
+    def _row(self, buyer_address: str) -> int:
+        key = _encode(buyer_address)
+        if key is None:
+            return -1
+        return self._find(key, hash(key))
+
+    # Mapping API
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, buyer_address: str) -> bool:
+        return self._row(buyer_address) >= 0
+
+    def __getitem__(self, buyer_address: str) -> LoanView:
+        row = self._row(buyer_address)
+        if row < 0:
+            raise KeyError(buyer_address)
+        return LoanView(self, row)
+
+    def get(self, buyer_address: str, default=None):
+        row = self._row(buyer_address)
+        return default if row < 0 else LoanView(self, row)
+
+    def __setitem__(self, buyer_address: str, loan):
+        self.update({buyer_address: loan})
+
+    def keys(self) -> List[str]:
+        return [key.decode('utf-8') for key in self.address[:self.size].tolist()]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def values(self) -> Iterator[LoanView]:
+        return (LoanView(self, row) for row in range(self.size))
+
+    def items(self) -> Iterator[Tuple[str, LoanView]]:
+        return ((buyer_address, LoanView(self, row)) for row, buyer_address in enumerate(self.keys()))
+
+    def _reserve(self, needed: int):
+        capacity = len(self.amount)
+        if needed > capacity:
+            while capacity < needed:
+                capacity *= 2
+            for name in COLUMNS:
+                column = getattr(self, name)
+                grown = np.zeros(capacity, dtype=column.dtype)
+                grown[:len(column)] = column
+                setattr(self, name, grown)
+        if needed * 2 > len(self.slots):
+            self._rebuild_index(table_size(needed))
+
+    # Portfolio aggregates
+
+    def _count_rows(self, rows: np.ndarray, sign: int):
+        """Add (1) or take away (-1) these loans' contributions to the portfolio; called with the lock held"""
+        states = (self.flags[rows] & (FLAG_APPROVED | FLAG_REPAID)).astype(np.int64)
+        self.portfolio.add_many(self.term_bucket[rows], states, self.amount[rows], self.balance[rows], sign)
+
+    def portfolio_summary(self, property_id: Optional[int] = None) -> dict:
+        """Running totals overall and per term bucket, plus one property's loans (None if it has none).
+
+        Costs the same at any portfolio size: the totals are kept up to date,
+        and a property's summary reads only the loans chained under it.
+        """
+        with self._lock:
+            summary = self.portfolio.summary()
+            if property_id is not None:
+                rows = self.portfolio.property_rows(property_id, self.next_in_property)
+                summary['property'] = (summarize_loans(self.flags[rows], self.amount[rows], self.balance[rows])
+                                       if rows else None)
+        return summary
+
+    def check_portfolio(self) -> List[str]:
+        """Recompute the portfolio aggregates from every loan and list where the running ones differ"""
+        with self._lock:
+            n = self.size
+            return check_totals(self.portfolio, self.flags[:n], self.amount[:n], self.balance[:n],
+                                self.term_in_months[:n], self.property_id[:n], self.next_in_property)
+
+    def update(self, loans):
+        """Insert or overwrite loans given as a mapping or (address, Loan) pairs"""
+        entries = list(loans.items()) if hasattr(loans, 'items') else list(loans)
+        if not entries:
+            return
+        keys = []
+        for buyer_address, _ in entries:
+            key = _encode(buyer_address)
+            if key is None:
+                raise ValueError(f'Buyer address longer than {ADDRESS_WIDTH} bytes: {buyer_address!r}')
+            keys.append(key)
+
+        with self._lock:
+            self._reserve(self.size + len(entries))
+            rows = np.empty(len(entries), dtype=np.int64)
+            existing = self.size
+            for i, key in enumerate(keys):
+                key_hash = hash(key)
+                row = self._find(key, key_hash)
+                if row < 0:
+                    row = self.size
+                    # Fill the row before publishing it in the index
+                    self.address[row] = key
+                    self.address_hash[row] = key_hash
+                    self._insert_slot(row, key_hash)
+                    self.size += 1
+                rows[i] = row
+            # Overwritten loans stop counting as they were before their columns change
+            replaced = np.unique(rows[rows < existing])
+            self._count_rows(replaced, -1)
+            old_property_ids = self.property_id[replaced]
+
+            loan_values = [loan for _, loan in entries]
+            self.amount[rows] = [loan.amount for loan in loan_values]
+            self.monthly_installment[rows] = [loan.monthly_installment for loan in loan_values]
+            self.term_in_months[rows] = [loan.term_in_months for loan in loan_values]
+            self.property_id[rows] = [loan.property_id for loan in loan_values]
+            self.flags[rows] = [(FLAG_APPROVED if loan.is_approved else 0) | (FLAG_REPAID if loan.is_repaid else 0)
+                                for loan in loan_values]
+            self.installments_paid[rows] = [loan.installments_paid for loan in loan_values]
+            # A new loan owes every installment; None means nothing has been posted against it yet
+            self.balance[rows] = [loan.monthly_installment * loan.term_in_months if loan.outstanding_balance is None
+                                  else loan.outstanding_balance for loan in loan_values]
+            self.version[rows] += 1
+
+            self.term_bucket[rows] = term_buckets(self.term_in_months[rows])
+            rows = np.unique(rows)  # An address repeated in the batch counts once
+            self._count_rows(rows, 1)
+            # Sorted, so the replaced rows come first; those keeping their property stay in its chain
+            property_ids = self.property_id[rows]
+            moved = np.ones(len(rows), dtype=bool)
+            moved[:len(replaced)] = old_property_ids != property_ids[:len(replaced)]
+            for row, old_property_id in zip(replaced[moved[:len(replaced)]].tolist(),
+                                            old_property_ids[moved[:len(replaced)]].tolist()):
+                self.portfolio.unlink(old_property_id, row, self.next_in_property)
+            self.portfolio.link(property_ids[moved], rows[moved], self.next_in_property)
+
+    def post_installments(self, missed_rows: np.ndarray) -> dict:
+        """Collect one installment from every approved, unrepaid loan except ``missed_rows``.
+
+        Balances and paid counts are updated in place for the whole portfolio
+        at once; loans whose balance reaches zero (or whose last installment was
+        paid) are marked repaid.
+        """
+        with self._lock:
+            n = self.size
+            flags = self.flags[:n]
+            balance = self.balance[:n]
+            active = ((flags & FLAG_APPROVED) != 0) & ((flags & FLAG_REPAID) == 0) & (balance > 0)
+            missed = np.zeros(n, dtype=bool)
+            missed[missed_rows] = True
+            rows = np.flatnonzero(active & ~missed)
+
+            owed = balance[rows]
+            payments = np.minimum(self.monthly_installment[rows], owed)
+            balance[rows] -= payments
+            self.installments_paid[rows] += 1
+            # Sub-cent remainders are rounding left over from the installment division
+            finished = rows[(balance[rows] < 0.005) | (self.installments_paid[rows] >= self.term_in_months[rows])]
+            balance[finished] = 0.0
+            flags[finished] |= FLAG_REPAID
+            self.version[rows] += 1
+            # Every posted loan was approved and open, so only outstanding and the paid-off loans' state move
+            self.portfolio.post(self.term_bucket[rows], balance[rows] - owed,
+                                self.term_bucket[finished], self.amount[finished])
+
+            return {
+                'eligible': int(active.sum()),
+                'posted': len(rows),
+                'missed': int((active & missed).sum()),
+                'paid_off': len(finished),
+                'amount_posted': float(payments.sum()),
+                'outstanding_balance': float(balance[(flags & (FLAG_APPROVED | FLAG_REPAID)) == FLAG_APPROVED].sum()),
+            }
+
+    def find_rows(self, buyer_addresses: Iterable[str]) -> np.ndarray:
+        """Row number of each address, -1 where it is unknown"""
+        return np.array([self._row(buyer_address) for buyer_address in buyer_addresses], dtype=np.int64)
+
+    def rows(self, buyer_addresses: Iterable[str]) -> np.ndarray:
+        """Row numbers of the given addresses, skipping unknown ones"""
+        rows = self.find_rows(buyer_addresses)
+        return rows[rows >= 0]
+
+    def fields_at(self, rows) -> List[Tuple[bool, bool, float, int, int, float, int, float]]:
+        """Consistent copy of the loans in ``rows``, gathered column by column"""
+        with self._lock:
+            flags = self.flags[rows]
+            columns = (self.amount[rows].tolist(), self.property_id[rows].tolist(),
+                       self.term_in_months[rows].tolist(), self.monthly_installment[rows].tolist(),
+                       self.installments_paid[rows].tolist(), self.balance[rows].tolist())
+        approved = ((flags & FLAG_APPROVED) != 0).tolist()
+        repaid = ((flags & FLAG_REPAID) != 0).tolist()
+        return list(zip(approved, repaid, *columns))
+
+    def copy_columns(self, names: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Consistent copy of the named columns over every loan, e.g. for a snapshot"""
+        with self._lock:
+            n = self.size
+            return {name: getattr(self, name)[:n].copy() for name in names}
+
+    def state_counts(self) -> dict:
+        """Number of loans pending, approved (and not yet repaid), repaid and rejected"""
+        with self._lock:
+            return self.portfolio.state_counts()
+
+    def nbytes(self) -> int:
+        """Bytes held by the columns, the address index and the portfolio's property index"""
+        portfolio = self.portfolio
+        return (sum(getattr(self, name).nbytes for name in COLUMNS + ('slots',))
+                + portfolio.property_ids.nbytes + portfolio.heads.nbytes + portfolio.slots.nbytes)
+
+
+def _encode(buyer_address: str):
+    key = buyer_address.encode('utf-8')
+    return key if len(key) <= ADDRESS_WIDTH else None
+
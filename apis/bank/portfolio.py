@@ -0,0 +1,241 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from hash_index import build_table, insert, lookup, table_size
+
+# Loan state as flags & (FLAG_APPROVED | FLAG_REPAID); a repaid flag without approval is a rejection
+STATES = ('pending', 'approved', 'rejected', 'repaid')
+APPROVED = 1
+REPAID = 3
+
+# Upper bounds of the term buckets in months; longer terms fall in the last bucket
+TERM_BUCKETS = (12, 60, 180, 360)
+TERM_BUCKET_LABELS = ('1-12', '13-60', '61-180', '181-360', '361+')
+
+INITIAL_PROPERTIES = 1024
+
+
+def term_buckets(terms: np.ndarray) -> np.ndarray:
+    return np.searchsorted(TERM_BUCKETS, terms, side='left').astype(np.uint8)
+
+
+def summarize(counts: List[int], exposure: float, outstanding: float) -> dict:
+    return {
+        'loans': sum(counts),
+        'counts': dict(zip(STATES, counts)),
+        # Running sums gather float rounding from every transition; cents are exact enough
+        'approved_exposure': round(exposure, 2),
+        'outstanding': round(outstanding, 2),
+    }
+
+
+def summarize_loans(flags: np.ndarray, amounts: np.ndarray, balances: np.ndarray) -> dict:
+    """The same summary computed from scratch over some loans' columns"""
+    states = flags & 3
+    approved = states == APPROVED
+    return summarize(np.bincount(states, minlength=len(STATES)).tolist(),
+                     float(amounts[approved].sum()), float(balances[approved].sum()))
+
+
+class Portfolio:
+    """Running loan totals by state and term bucket, plus an index of each property's loans.
+
+    The store adds a loan's contribution whenever it writes the loan and
+    takes the old one away first, so a transition costs O(1) and the
+    summary reads a fixed number of cells at any portfolio size. There are
+    only a handful of buckets, so the totals are plain lists; whole-portfolio
+    runs update them with one bincount per column. Exposure and outstanding
+    cover approved loans that are not yet repaid.
+
+    A property's loans are chained through the store's ``next_in_property``
+    column from a head row found by an open-addressing table of property
+    ids, so a property summary only reads that property's loans.
+    """
+
+    def __init__(self):
+        buckets = len(TERM_BUCKET_LABELS)
+        self.count = [0] * (buckets * len(STATES))  # bucket * 4 + state
+        self.exposure = [0.0] * buckets
+        self.outstanding = [0.0] * buckets
+
+        self.property_ids = np.zeros(INITIAL_PROPERTIES, dtype=np.int64)  # property number -> id
+        self.heads = np.zeros(INITIAL_PROPERTIES, dtype=np.int32)  # property number -> first row of its chain
+        self.properties = 0
+        self.slots = np.full(table_size(INITIAL_PROPERTIES), -1, dtype=np.int32)
+
+    # Term bucket totals
+
+    def add(self, bucket: int, state: int, amount: float, balance: float, sign: int):
+        self.count[bucket * len(STATES) + state] += sign
+        if state == APPROVED:
+            self.exposure[bucket] += sign * amount
+            self.outstanding[bucket] += sign * balance
+
+    def move(self, bucket: int, old_state: int, new_state: int, amount: float, balance: float):
+        """One loan changing state; the same as taking it away and adding it back, in one call"""
+        base = bucket * len(STATES)
+        self.count[base + old_state] -= 1
+        self.count[base + new_state] += 1
+        if old_state == APPROVED:
+            self.exposure[bucket] -= amount
+            self.outstanding[bucket] -= balance
+        if new_state == APPROVED:
+            self.exposure[bucket] += amount
+            self.outstanding[bucket] += balance
+
+    def change_balance(self, bucket: int, change: float):
+        """An approved loan's balance changing"""
+        self.outstanding[bucket] += change
+
+    def add_many(self, buckets: np.ndarray, states: np.ndarray, amounts: np.ndarray, balances: np.ndarray,
+                 sign: int):
+        buckets = buckets.astype(np.int64)
+        counts = np.bincount(buckets * len(STATES) + states, minlength=len(self.count)).tolist()
+        self.count = [total + sign * n for total, n in zip(self.count, counts)]
+        approved = states == APPROVED
+        self._add_sums(buckets[approved], sign * amounts[approved], sign * balances[approved])
+
+    def post(self, buckets: np.ndarray, balance_changes: np.ndarray, paid_off_buckets: np.ndarray,
+             paid_off_amounts: np.ndarray):
+        """An installment run over approved loans: balances change, and paid-off loans move to repaid"""
+        self._add_sums(buckets.astype(np.int64), np.zeros(len(buckets)), balance_changes)
+        paid_off = np.bincount(paid_off_buckets, minlength=len(self.exposure)).tolist()
+        for bucket, n in enumerate(paid_off):
+            self.count[bucket * len(STATES) + APPROVED] -= n
+            self.count[bucket * len(STATES) + REPAID] += n
+        self._add_sums(paid_off_buckets.astype(np.int64), -paid_off_amounts, np.zeros(len(paid_off_buckets)))
+
+    def _add_sums(self, buckets: np.ndarray, exposures: np.ndarray, balances: np.ndarray):
+        size = len(self.exposure)
+        exposure = np.bincount(buckets, weights=exposures, minlength=size).tolist()
+        outstanding = np.bincount(buckets, weights=balances, minlength=size).tolist()
+        self.exposure = [total + delta for total, delta in zip(self.exposure, exposure)]
+        self.outstanding = [total + delta for total, delta in zip(self.outstanding, outstanding)]
+
+    def bucket(self, bucket: int) -> dict:
+        return summarize(self.count[bucket * len(STATES):(bucket + 1) * len(STATES)],
+                         self.exposure[bucket], self.outstanding[bucket])
+
+    def summary(self) -> dict:
+        width = len(STATES)
+        counts = [sum(self.count[state::width]) for state in range(width)]
+        return {
+            **summarize(counts, sum(self.exposure), sum(self.outstanding)),
+            'by_term': [{'term': label, **self.bucket(bucket)} for bucket, label in enumerate(TERM_BUCKET_LABELS)],
+        }
+
+    def state_counts(self) -> Dict[str, int]:
+        width = len(STATES)
+        return {state: sum(self.count[index::width]) for index, state in enumerate(STATES)}
+
+    # Property index
+
+    def _find(self, property_id: int) -> int:
+        """Slot holding the property's number, or the empty slot where it belongs"""
+        slots = self.slots
+        mask = len(slots) - 1
+        slot = property_id & mask  # Ids are already spread out; sequential ones take neighbouring slots
+        while True:
+            number = slots.item(slot)
+            if number < 0 or self.property_ids.item(number) == property_id:
+                return slot
+            slot = (slot + 1) & mask
+
+    def property_number(self, property_id: int) -> Optional[int]:
+        number = self.slots.item(self._find(property_id))
+        return number if number >= 0 else None
+
+    def link(self, property_ids: np.ndarray, rows: np.ndarray, next_in_property: np.ndarray):
+        """Put each row at the head of its property's chain, registering properties seen for the first time"""
+        unique_ids, which = np.unique(property_ids, return_inverse=True)
+        numbers = lookup(self.slots, self.property_ids, unique_ids)
+        new = numbers < 0
+        if new.any():
+            numbers[new] = self._add_properties(unique_ids[new])
+        numbers = numbers[which]
+        # Within a property, each row points at the one before it and the first at the old head
+        order = np.argsort(numbers, kind='stable')
+        rows, numbers = rows[order], numbers[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = numbers[1:] != numbers[:-1]
+        last = np.ones(len(rows), dtype=bool)
+        last[:-1] = first[1:]
+        previous = np.empty_like(rows)
+        previous[1:] = rows[:-1]
+        previous[first] = self.heads[numbers[first]]
+        next_in_property[rows] = previous
+        self.heads[numbers[last]] = rows[last]
+
+    def unlink(self, property_id: int, row: int, next_in_property: np.ndarray):
+        number = self.property_number(property_id)
+        previous, current = -1, self.heads.item(number)
+        while current != row:
+            previous, current = current, next_in_property.item(current)
+        if previous < 0:
+            self.heads[number] = next_in_property[row]
+        else:
+            next_in_property[previous] = next_in_property[row]
+
+    def _add_properties(self, property_ids: np.ndarray) -> np.ndarray:
+        start = self.properties
+        self.properties += len(property_ids)
+        if self.properties > len(self.property_ids):
+            capacity = max(self.properties, 2 * len(self.property_ids))
+            for name in ('property_ids', 'heads'):
+                column = getattr(self, name)
+                grown = np.zeros(capacity, dtype=column.dtype)
+                grown[:start] = column[:start]
+                setattr(self, name, grown)
+        numbers = np.arange(start, self.properties, dtype=np.int32)
+        self.property_ids[numbers] = property_ids
+        self.heads[numbers] = -1
+        if self.properties * 2 > len(self.slots):
+            self.slots = build_table(self.property_ids[:self.properties], table_size(self.properties), np.int32)
+        else:
+            insert(self.slots, property_ids, numbers)
+        return numbers
+
+    def property_rows(self, property_id: int, next_in_property: np.ndarray) -> Optional[List[int]]:
+        number = self.property_number(property_id)
+        if number is None:
+            return None
+        rows, row = [], self.heads.item(number)
+        while row >= 0:
+            rows.append(row)
+            row = next_in_property.item(row)
+        return rows
+
+
+def check_totals(portfolio: Portfolio, flags: np.ndarray, amounts: np.ndarray, balances: np.ndarray,
+                 terms: np.ndarray, property_ids: np.ndarray, next_in_property: np.ndarray) -> List[str]:
+    """Recompute the aggregates from the loan columns and describe everything the running ones get wrong"""
+    problems = []
+    buckets = term_buckets(terms)
+    for bucket, label in enumerate(TERM_BUCKET_LABELS):
+        in_bucket = buckets == bucket
+        running = portfolio.bucket(bucket)
+        expected = summarize_loans(flags[in_bucket], amounts[in_bucket], balances[in_bucket])
+        if (running['counts'] != expected['counts']
+                or abs(running['approved_exposure'] - expected['approved_exposure']) > 0.01
+                or abs(running['outstanding'] - expected['outstanding']) > 0.01):
+            problems.append(f'term {label}: running {running}, recomputed {expected}')
+
+    # Every loan must be in exactly one chain: its own property's
+    chained = np.zeros(len(property_ids), dtype=np.int64)
+    visited = np.zeros(len(property_ids), dtype=bool)
+    for number in range(portfolio.properties):
+        property_id = int(portfolio.property_ids[number])
+        row = int(portfolio.heads[number])
+        while row >= 0:
+            if row >= len(visited) or visited[row]:
+                problems.append(f'property {property_id}: chain revisits or overruns at row {row}')
+                break
+            chained[row] = property_id
+            visited[row] = True
+            row = int(next_in_property[row])
+    for row in np.flatnonzero(~visited).tolist():
+        problems.append(f'row {row}: property {int(property_ids[row])} but in no chain')
+    for row in np.flatnonzero(visited & (chained != property_ids)).tolist():
+        problems.append(f'row {row}: property {int(property_ids[row])} but chained under {int(chained[row])}')
+    return problems
@@ -0,0 +1,105 @@
+"""Vectorized loan quotes and amortization schedules.
+
+Every function takes parallel arrays of amounts, terms (months) and rates
+(percent) and prices all loans at once. Two pricing methods are supported:
+
+- ``flat``: the bank's own model (see ``calculate_monthly_installment``):
+  interest is ``rate`` percent of the amount, spread evenly over the term.
+- ``annuity``: a standard fixed-payment mortgage at an annual ``rate``
+  percent, compounded monthly.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+METHODS = ('flat', 'annuity')
+
+
+@dataclass
+class Quotes:
+    monthly_installment: np.ndarray
+    total_paid: np.ndarray
+    total_interest: np.ndarray
+
+
+@dataclass
+class Schedules:
+    """Month-by-month schedules for many loans, stored back to back.
+
+    Loan ``i`` occupies rows ``offsets[i]:offsets[i + 1]`` of the flat arrays;
+    ``balance`` is the principal still owed after that month's payment.
+    """
+    offsets: np.ndarray
+    month: np.ndarray
+    interest: np.ndarray
+    principal: np.ndarray
+    balance: np.ndarray
+
+    def loan(self, i: int) -> dict:
+        rows = slice(self.offsets[i], self.offsets[i + 1])
+        return {'month': self.month[rows], 'interest': self.interest[rows],
+                'principal': self.principal[rows], 'balance': self.balance[rows]}
+
+
+def _arrays(amounts, terms, rates):
+    amounts = np.asarray(amounts, dtype=np.float64)
+    terms = np.asarray(terms, dtype=np.int64)
+    rates = np.broadcast_to(np.asarray(rates, dtype=np.float64), amounts.shape)
+    return amounts, terms, rates
+
+
+def flat_installments(amounts, terms, rates) -> np.ndarray:
+    amounts, terms, rates = _arrays(amounts, terms, rates)
+    # Same operations, in the same order, as calculate_monthly_installment so results match exactly
+    return (amounts + amounts * rates / 100) / terms
+
+
+def annuity_installments(amounts, terms, rates) -> np.ndarray:
+    amounts, terms, rates = _arrays(amounts, terms, rates)
+    r = rates / 1200
+    interest_free = r == 0
+    safe_r = np.where(interest_free, 1.0, r)
+    payment = amounts * safe_r / -np.expm1(-terms * np.log1p(safe_r))
+    return np.where(interest_free, amounts / terms, payment)
+
+
+def quote(amounts, terms, rates, method: str = 'flat') -> Quotes:
+    if method not in METHODS:
+        raise ValueError(f'Unknown pricing method: {method}')
+    amounts, terms, rates = _arrays(amounts, terms, rates)
+    installments = flat_installments(amounts, terms, rates) if method == 'flat' \
+        else annuity_installments(amounts, terms, rates)
+    total_paid = installments * terms
+    return Quotes(installments, total_paid, total_paid - amounts)
+
+
+def schedule(amounts, terms, rates, method: str = 'flat') -> Schedules:
+    """Full amortization schedules; memory grows with the sum of all terms"""
+    if method not in METHODS:
+        raise ValueError(f'Unknown pricing method: {method}')
+    amounts, terms, rates = _arrays(amounts, terms, rates)
+
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(terms, out=offsets[1:])
+    owner = np.repeat(np.arange(len(terms)), terms)
+    month = np.arange(offsets[-1], dtype=np.int64) - offsets[owner] + 1
+    amount = amounts[owner]
+
+    if method == 'flat':
+        principal = (amount / terms[owner])
+        interest = amount * rates[owner] / 100 / terms[owner]
+        balance = amount - month * principal
+    else:
+        # Balance before month k in closed form: A(1+r)^(k-1) - P((1+r)^(k-1) - 1) / r
+        r = rates[owner] / 1200
+        payment = annuity_installments(amounts, terms, rates)[owner]
+        interest_free = r == 0
+        growth = np.exp((month - 1) * np.log1p(r))
+        accrued = np.where(interest_free, month - 1, np.expm1((month - 1) * np.log1p(r)) / np.where(interest_free, 1.0, r))
+        opening = amount * growth - payment * accrued
+        interest = opening * r
+        principal = payment - interest
+        balance = opening - principal
+
+    balance[offsets[1:] - 1] = 0.0  # Paid off exactly; hides floating-point residue
+    return Schedules(offsets, month, interest, principal, balance)
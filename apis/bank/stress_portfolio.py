@@ -0,0 +1,117 @@
+"""Consistency stress test for the bank's running portfolio totals.
+
+Drives the Flask app in-process from many threads: applications (single and
+bulk), approvals, rejections, repayments and installment runs all race
+each other. Afterwards the running totals behind /portfolio_summary must
+match a recount of every loan, every loan must be chained under its own
+property, and each property's summary must agree with the loans it holds.
+
+    python stress_portfolio.py --threads 16 --loans 5000
+"""
+import argparse
+import random
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from bank_server import admin_address, app, loans
+from portfolio import summarize_loans
+
+_clients = threading.local()
+
+
+def client():
+    if not hasattr(_clients, 'client'):
+        _clients.client = app.test_client()
+    return _clients.client
+
+
+def buyer(i: int) -> str:
+    return f'0x{i:040x}'
+
+
+def apply(i: int, property_id: int) -> int:
+    return client().post('/apply_loan', json={
+        'buyer_address': buyer(i), 'property_id': property_id, 'amount': 1000 + i % 9000,
+        'term_in_months': 6 + i % 400
+    }).status_code
+
+
+def apply_many(indexes: list, properties: int) -> int:
+    return client().post('/apply_loans', json={'applications': [{
+        'buyer_address': buyer(i), 'property_id': 1 + i % properties, 'amount': 1000 + i % 9000,
+        'term_in_months': 6 + i % 400
+    } for i in indexes]}).status_code
+
+
+def admin(action: str, i: int) -> int:
+    return client().post(f'/{action}', headers={'X-Admin-Key': admin_address},
+                         json={'buyer_address': buyer(i)}).status_code
+
+
+def post(period: str, missed: list) -> int:
+    return client().post('/post_installments', headers={'X-Admin-Key': admin_address},
+                         json={'period': period, 'missed': [buyer(i) for i in missed]}).status_code
+
+
+def check(name: str, ok: bool, detail: str = '') -> bool:
+    print(f"{'PASS' if ok else 'FAIL'}  {name}{'  ' + detail if detail else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--loans', type=int, default=5000)
+    parser.add_argument('--properties', type=int, default=500, help='loans share this many property ids')
+    parser.add_argument('--postings', type=int, default=12, help='installment runs racing the transitions')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    # Half the loans arrive one at a time and half in bulk batches of 100
+    single = list(range(args.loans // 2))
+    bulk = list(range(args.loans // 2, args.loans))
+    batches = [bulk[start:start + 100] for start in range(0, len(bulk), 100)]
+
+    tasks = [lambda i=i: apply(i, 1 + i % args.properties) for i in single]
+    tasks += [lambda batch=batch: apply_many(batch, args.properties) for batch in batches]
+    rng.shuffle(tasks)
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        statuses = list(pool.map(lambda task: task(), tasks))
+    ok = check('applications accepted', statuses.count(200) == len(tasks), f'{statuses.count(200)}/{len(tasks)}')
+
+    transitions = [lambda i=i: admin('approve_loan', i) for i in rng.sample(range(args.loans), args.loans * 2 // 3)]
+    transitions += [lambda i=i: admin('reject_loan', i) for i in rng.sample(range(args.loans), args.loans // 10)]
+    transitions += [lambda i=i: admin('repay_loan', i) for i in rng.sample(range(args.loans), args.loans // 5)]
+    transitions += [lambda month=month: post(f'stress-{month}', rng.sample(range(args.loans), 20))
+                    for month in range(args.postings)]
+    rng.shuffle(transitions)
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(lambda task: task(), transitions))
+
+    problems = loans.check_portfolio()
+    ok &= check('running totals match a recount', not problems, '; '.join(problems[:3]))
+
+    summary = client().get('/portfolio_summary').get_json()
+    ok &= check('summary covers every loan', summary['loans'] == len(loans), f"{summary['loans']} of {len(loans)}")
+
+    n = loans.size
+    mismatched = []
+    for property_id in range(1, args.properties + 1):
+        response = client().get(f'/portfolio_summary?property_id={property_id}').get_json()
+        held = loans.property_id[:n] == property_id
+        expected = summarize_loans(loans.flags[:n][held], loans.amount[:n][held], loans.balance[:n][held])
+        got = response['property']
+        # Summed in a different order, so the cents may round apart
+        if (got['counts'] != expected['counts']
+                or abs(got['approved_exposure'] - expected['approved_exposure']) > 0.01
+                or abs(got['outstanding'] - expected['outstanding']) > 0.01):
+            mismatched.append(property_id)
+    ok &= check('property summaries match their loans', not mismatched, f'properties {mismatched[:5]}')
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Benchmark: bulk status lookups vs one request per key.
+
+Seeds loans and escrows, then renders "dashboard pages" of N keys (about 10%
+of them unknown) both ways: one GET /loan_status or /escrow_status per key
+over a keep-alive session, and a single POST /loan_statuses or
+/escrow_statuses. Both must return the same records and misses.
+
+    python bench_bulk_status.py --start-servers --pages 50 200 1000
+    python bench_bulk_status.py --per-key-concurrency 8 --json results.json
+"""
+import argparse
+import json
+import random
+import secrets
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench_lifecycle import ADMIN_KEY, ESCROW_AGENT, start_server, wait_until_up
+
+MISS_RATE = 0.1
+
+
+def seed(bank_url: str, escrow_url: str, count: int):
+    session = requests.Session()
+    buyers = ['0x' + secrets.token_hex(20) for _ in range(count)]
+    first_property = 2 * random.randrange(10**8, 10**9)
+    property_ids = [first_property + 2 * i for i in range(count)]
+    for start in range(0, count, 1000):
+        response = session.post(f'{bank_url}/apply_loans', json=[
+            {'buyer_address': buyer, 'property_id': property_id, 'amount': 250000, 'term_in_months': 360}
+            for buyer, property_id in zip(buyers[start:start + 1000], property_ids[start:start + 1000])])
+        response.raise_for_status()
+    for buyer, property_id in zip(buyers, property_ids):
+        session.post(f'{escrow_url}/create_escrow', headers={'X-Agent-Key': ESCROW_AGENT}, json={
+            'buyer': buyer, 'seller': '0x' + secrets.token_hex(20), 'property_id': property_id, 'amount': 250000
+        }).raise_for_status()
+    session.post(f'{bank_url}/approve_loan', headers={'X-Admin-Key': ADMIN_KEY}, json={'buyer_address': buyers[0]})
+    return buyers, property_ids
+
+
+def page_of(keys: list, size: int, make_missing) -> list:
+    page = random.sample(keys, min(size, len(keys)))
+    for i in random.sample(range(len(page)), int(len(page) * MISS_RATE)):
+        page[i] = make_missing()
+    return page
+
+
+def per_key(session_for, url_for, keys: list, concurrency: int):
+    def fetch(key):
+        response = session_for().get(url_for(key))
+        return key, (response.json() if response.status_code == 200 else None)
+
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(fetch, keys))
+    else:
+        results = [fetch(key) for key in keys]
+    found = {str(key): record for key, record in results if record is not None}
+    missing = [key for key, record in results if record is None]
+    return found, missing
+
+
+def timed(fn, repeat: int):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        seconds.append(time.perf_counter() - start)
+    return result, statistics.median(seconds)
+
+
+def run(bank_url: str, escrow_url: str, pages: list, seed_count: int, repeat: int, concurrency: int) -> list:
+    buyers, property_ids = seed(bank_url, escrow_url, seed_count)
+    sessions = threading.local()
+
+    def session_for():
+        # One keep-alive session per thread, as a browser would reuse connections
+        if not hasattr(sessions, 'session'):
+            sessions.session = requests.Session()
+        return sessions.session
+
+    cases = [
+        ('loans', buyers, lambda: '0x' + secrets.token_hex(20), lambda key: f'{bank_url}/loan_status/{key}',
+         f'{bank_url}/loan_statuses', 'buyers', 'loans'),
+        ('escrows', property_ids, lambda: 2 * random.randrange(10**9, 2 * 10**9) + 1,
+         lambda key: f'{escrow_url}/escrow_status/{key}', f'{escrow_url}/escrow_statuses', 'property_ids', 'escrows'),
+    ]
+    results = []
+    for name, keys, make_missing, url_for, bulk_url, field, records_field in cases:
+        for size in pages:
+            page = page_of(keys, size, make_missing)
+            (expected, expected_missing), per_key_seconds = timed(
+                lambda: per_key(session_for, url_for, page, concurrency), repeat)
+            bulk, bulk_seconds = timed(lambda: session_for().post(bulk_url, json={field: page}).json(), repeat)
+            if bulk[records_field] != expected or bulk['missing'] != expected_missing:
+                raise SystemExit(f'{name}: bulk lookup disagrees with per-key lookups for a page of {size}')
+            results.append({
+                'records': name,
+                'page_size': size,
+                'missing': len(expected_missing),
+                'per_key_ms': 1000 * per_key_seconds,
+                'bulk_ms': 1000 * bulk_seconds,
+                'speedup': per_key_seconds / bulk_seconds,
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bank-url', default='http://localhost:5000')
+    parser.add_argument('--escrow-url', default='http://localhost:5001')
+    parser.add_argument('--start-servers', action='store_true', help='run both servers as subprocesses')
+    parser.add_argument('--pages', type=int, nargs='+', default=[50, 200, 1000], help='keys per dashboard page')
+    parser.add_argument('--seed', type=int, default=2000, help='loans and escrows to create first')
+    parser.add_argument('--repeat', type=int, default=5, help='timed repetitions per page (median is reported)')
+    parser.add_argument('--per-key-concurrency', type=int, default=1, help='parallel per-key requests')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    servers = []
+    try:
+        if args.start_servers:
+            servers.append(start_server('bank', 'bank_server', 5000))
+            servers.append(start_server('escrow', 'escrow_server', 5001))
+        wait_until_up(args.bank_url)
+        wait_until_up(args.escrow_url)
+        results = run(args.bank_url, args.escrow_url, args.pages, args.seed, args.repeat, args.per_key_concurrency)
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    print(f"{'records':<8} {'page':>6} {'missing':>8} {'per-key ms':>11} {'bulk ms':>9} {'speedup':>8}")
+    for r in results:
+        print(f"{r['records']:<8} {r['page_size']:>6} {r['missing']:>8} {r['per_key_ms']:>11.1f} "
+              f"{r['bulk_ms']:>9.1f} {r['speedup']:>7.1f}x")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Fan-out benchmark for the server-sent event stream.
+
+Runs an EventStreamServer in a child process, where a separate thread
+publishes events the way request handlers do, and opens many SSE
+subscribers against it from this process. Checks that every subscriber
+receives every event in order, and reports delivery latency (publish to
+receipt) and the server's thread count, which stays flat however many
+subscribers are connected.
+
+    python bench_event_stream.py --subscribers 5000 --events 200 --rate 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from common.event_log import EventLog
+from common.event_stream import EventStreamServer
+
+
+async def subscribe(port: int, expected: int, latencies: list, connected: asyncio.Event, counter: list,
+                    total: int) -> int:
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(b'GET /events?cursor=0 HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    await writer.drain()
+    while (await reader.readline()) not in (b'\r\n', b''):
+        pass  # Response headers
+    counter[0] += 1
+    if counter[0] == total:
+        connected.set()
+
+    received = 0
+    last_cursor = None
+    while received < expected:
+        try:
+            message = await reader.readuntil(b'\n\n')
+        except asyncio.IncompleteReadError:
+            break
+        data = message.rfind(b'data: ')
+        if data < 0:
+            continue  # retry / keepalive
+        event = json.loads(message[data + 6:])
+        if last_cursor is not None and event['cursor'] != last_cursor + 1:
+            raise AssertionError(f"expected cursor {last_cursor + 1}, got {event['cursor']}")
+        last_cursor = event['cursor']
+        latencies.append(time.time() - event['time'])
+        received += 1
+    writer.close()
+    return received
+
+
+def publish(log: EventLog, events: int, rate: float):
+    interval = 1 / rate if rate > 0 else 0
+    for i in range(events):
+        log.publish('DepositFunds', property_id=2 * i, buyer=f'buyer-{i}', amount=1000)
+        if interval:
+            time.sleep(interval)
+
+
+def serve(events: int, rate: float):
+    # Child process: report the port, publish when told to, then report thread count and CPU seconds
+    log = EventLog(capacity=max(10000, events))
+    server = EventStreamServer(log).start()
+    print(server.port, flush=True)
+    sys.stdin.readline()
+    publisher = threading.Thread(target=publish, args=(log, events, rate))
+    publisher.start()
+    threads = threading.active_count()
+    publisher.join()
+    print(threads, time.process_time(), flush=True)
+    sys.stdin.readline()
+
+
+async def run(subscribers: int, events: int, rate: float) -> dict:
+    child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', '--events', str(events),
+                              '--rate', str(rate)], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    port = int(child.stdout.readline())
+
+    latencies = []
+    connected = asyncio.Event()
+    counter = [0]
+    tasks = [asyncio.create_task(subscribe(port, events, latencies, connected, counter, subscribers))
+             for _ in range(subscribers)]
+    await asyncio.wait_for(connected.wait(), 60)
+
+    start = time.perf_counter()
+    child.stdin.write('go\n')
+    child.stdin.flush()
+    received = await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    threads, server_cpu = child.stdout.readline().split()
+    child.stdin.close()
+    child.wait()
+
+    latencies.sort()
+    return {
+        'subscribers': subscribers,
+        'events': events,
+        'delivered': sum(received),
+        'expected': subscribers * events,
+        'seconds': elapsed,
+        'deliveries_per_sec': sum(received) / elapsed,
+        'p50_ms': 1000 * latencies[len(latencies) // 2],
+        'p99_ms': 1000 * latencies[int(len(latencies) * 0.99)],
+        'server_threads': int(threads),
+        'server_cpu_seconds': float(server_cpu),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscribers', type=int, default=2000)
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--rate', type=float, default=500, help='events published per second (0 = as fast as possible)')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.events, args.rate)
+        return
+
+    result = asyncio.run(run(args.subscribers, args.events, args.rate))
+    print(f"{result['subscribers']} subscribers, {result['events']} events: "
+          f"{result['delivered']}/{result['expected']} delivered in {result['seconds']:.2f}s "
+          f"({result['deliveries_per_sec']:,.0f}/s), latency p50 {result['p50_ms']:.1f} ms, "
+          f"p99 {result['p99_ms']:.1f} ms; server used {result['server_threads']} threads and "
+          f"{result['server_cpu_seconds']:.2f} CPU s")
+    sys.exit(0 if result['delivered'] == result['expected'] else 1)
+
+
+if __name__ == '__main__':
+    main()
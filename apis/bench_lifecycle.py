@@ -0,0 +1,248 @@
+"""Load generator and latency benchmark for the bank and escrow APIs.
+
+Drives complete purchases at a fixed concurrency, each one
+apply_loan -> approve_loan -> create_escrow -> deposit_funds -> release_funds
+with a fresh buyer and property, and reports throughput and p50/p95/p99
+latency per endpoint.
+
+    python bench_lifecycle.py --start-servers --lifecycles 2000 --concurrency 16
+    python bench_lifecycle.py --json results.json --compare baseline.json
+
+--start-servers runs both servers as subprocesses on their usual ports
+(bank 5000, escrow 5001); without it the servers must already be running.
+--json writes the results, with the commit they were measured at, and
+--compare prints the change against an earlier results file.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+APIS_DIR = os.path.dirname(os.path.abspath(__file__))
+ADMIN_KEY = '0x8f42a25c9fd394a778df02e0f56d691e4f4ddf9e'
+ESCROW_AGENT = '0x5a1b2c3d4e5f6a7b8c9d0e1f2a3b4c5d6e7f8a9b'
+ENDPOINTS = ['apply_loan', 'approve_loan', 'create_escrow', 'deposit_funds', 'release_funds']
+PERCENTILES = [50, 95, 99]
+
+
+class Recorder:
+    """Latencies and failures per endpoint, shared by all worker threads"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {name: [] for name in ENDPOINTS}
+        self.errors: Dict[str, int] = {name: 0 for name in ENDPOINTS}
+        self.lifecycles = 0
+        self.failed_lifecycles = 0
+        self._lock = threading.Lock()
+
+    def add(self, endpoint: str, seconds: float, ok: bool):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def finish(self, ok: bool):
+        with self._lock:
+            self.lifecycles += 1
+            if not ok:
+                self.failed_lifecycles += 1
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    # Nearest-rank percentile of an already sorted list
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+class Lifecycle:
+    """One buyer's purchase, replayed against the servers with a per-thread keep-alive session"""
+
+    _sessions = threading.local()
+
+    def __init__(self, bank_url: str, escrow_url: str, recorder: Optional[Recorder]):
+        self.bank_url = bank_url
+        self.escrow_url = escrow_url
+        self.recorder = recorder
+
+    def _session(self) -> requests.Session:
+        if not hasattr(self._sessions, 'session'):
+            self._sessions.session = requests.Session()
+        return self._sessions.session
+
+    def _post(self, endpoint: str, url: str, headers: dict, payload: dict) -> bool:
+        start = time.perf_counter()
+        try:
+            ok = self._session().post(url, headers=headers, json=payload, timeout=10).status_code == 200
+        except requests.RequestException:
+            ok = False
+        if self.recorder is not None:
+            self.recorder.add(endpoint, time.perf_counter() - start, ok)
+        return ok
+
+    def run(self, property_id: int) -> bool:
+        buyer = '0x' + secrets.token_hex(20)
+        seller = '0x' + secrets.token_hex(20)
+        amount = random.randint(100000, 900000)
+        ok = (
+            self._post('apply_loan', f'{self.bank_url}/apply_loan', {}, {
+                'buyer_address': buyer, 'property_id': property_id, 'amount': amount, 'term_in_months': 360})
+            and self._post('approve_loan', f'{self.bank_url}/approve_loan', {'X-Admin-Key': ADMIN_KEY},
+                           {'buyer_address': buyer})
+            and self._post('create_escrow', f'{self.escrow_url}/create_escrow', {'X-Agent-Key': ESCROW_AGENT}, {
+                'buyer': buyer, 'seller': seller, 'property_id': property_id, 'amount': amount})
+            and self._post('deposit_funds', f'{self.escrow_url}/deposit_funds', {'X-Buyer-Address': buyer},
+                           {'property_id': property_id, 'amount': amount})
+            and self._post('release_funds', f'{self.escrow_url}/release_funds', {'X-Agent-Key': ESCROW_AGENT},
+                           {'property_id': property_id})
+        )
+        if self.recorder is not None:
+            self.recorder.finish(bool(ok))
+        return bool(ok)
+
+
+def start_server(directory: str, module: str, port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, '-m', 'flask', '--app', module, 'run', '--port', str(port)],
+        cwd=os.path.join(APIS_DIR, directory), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_up(url: str, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError(f'{url} did not come up within {timeout:.0f}s')
+
+
+def run_benchmark(bank_url: str, escrow_url: str, lifecycles: int, concurrency: int, warmup: int) -> dict:
+    # Even property ids pass the escrow ownership mock; start high so repeated runs never collide
+    next_property = 2 * random.randrange(10**8, 10**9)
+    property_ids = [next_property + 2 * i for i in range(warmup + lifecycles)]
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        warm = Lifecycle(bank_url, escrow_url, None)
+        list(pool.map(warm.run, property_ids[:warmup]))
+
+        recorder = Recorder()
+        timed = Lifecycle(bank_url, escrow_url, recorder)
+        start = time.perf_counter()
+        list(pool.map(timed.run, property_ids[warmup:]))
+        elapsed = time.perf_counter() - start
+
+    endpoints = {}
+    for name in ENDPOINTS:
+        ordered = sorted(recorder.latencies[name])
+        count = len(ordered)
+        endpoints[name] = {
+            'requests': count,
+            'errors': recorder.errors[name],
+            'throughput_per_sec': count / elapsed if elapsed else 0.0,
+            'mean_ms': 1000 * sum(ordered) / count if count else 0.0,
+            'max_ms': 1000 * ordered[-1] if count else 0.0,
+            **{f'p{p}_ms': 1000 * percentile(ordered, p) for p in PERCENTILES},
+        }
+    return {
+        'lifecycles': recorder.lifecycles,
+        'failed_lifecycles': recorder.failed_lifecycles,
+        'seconds': elapsed,
+        'lifecycles_per_sec': recorder.lifecycles / elapsed if elapsed else 0.0,
+        'endpoints': endpoints,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APIS_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict):
+    print(f"{'endpoint':<15} {'requests':>9} {'errors':>7} {'req/s':>9} {'mean ms':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, s in results['endpoints'].items():
+        print(f"{name:<15} {s['requests']:>9} {s['errors']:>7} {s['throughput_per_sec']:>9.1f} {s['mean_ms']:>8.2f} "
+              f"{s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f} {s['max_ms']:>8.2f}")
+    print(f"{results['lifecycles']} lifecycles ({results['failed_lifecycles']} failed) in {results['seconds']:.2f}s, "
+          f"{results['lifecycles_per_sec']:.1f} lifecycles/s")
+
+
+def print_comparison(results: dict, baseline: dict):
+    print(f"\nChange against {baseline.get('commit') or 'baseline'} "
+          f"(concurrency {baseline['config']['concurrency']}):")
+    print(f"{'endpoint':<15} {'req/s':>9} {'p50':>8} {'p95':>8} {'p99':>8}")
+
+    def change(new: float, old: float) -> str:
+        return f'{100 * (new - old) / old:+.1f}%' if old else 'n/a'
+
+    for name, s in results['endpoints'].items():
+        old = baseline['endpoints'].get(name)
+        if old is None:
+            continue
+        print(f"{name:<15} {change(s['throughput_per_sec'], old['throughput_per_sec']):>9} "
+              + ' '.join(f"{change(s[f'p{p}_ms'], old[f'p{p}_ms']):>8}" for p in PERCENTILES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bank-url', default='http://localhost:5000')
+    parser.add_argument('--escrow-url', default='http://localhost:5001')
+    parser.add_argument('--start-servers', action='store_true', help='run both servers as subprocesses')
+    parser.add_argument('--lifecycles', type=int, default=1000, help='timed purchases to run')
+    parser.add_argument('--concurrency', type=int, default=8, help='purchases in flight')
+    parser.add_argument('--warmup', type=int, default=50, help='untimed purchases run first')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='results file from an earlier run to compare against')
+    args = parser.parse_args()
+
+    servers = []
+    try:
+        if args.start_servers:
+            servers.append(start_server('bank', 'bank_server', 5000))
+            servers.append(start_server('escrow', 'escrow_server', 5001))
+        wait_until_up(args.bank_url)
+        wait_until_up(args.escrow_url)
+
+        results = run_benchmark(args.bank_url, args.escrow_url, args.lifecycles, args.concurrency, args.warmup)
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'config': {'lifecycles': args.lifecycles, 'concurrency': args.concurrency, 'warmup': args.warmup},
+        **results,
+    }
+    print_results(results)
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    sys.exit(1 if results['failed_lifecycles'] else 0)
+
+
+if __name__ == '__main__':
+    main()
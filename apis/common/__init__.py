@@ -0,0 +1 @@
+"""Helpers shared by the bank and escrow servers"""
@@ -0,0 +1,225 @@
+"""ASGI serving mode for the Flask services.
+
+Routes that wait on I/O (outbound calls, long-polls) are registered as
+native coroutines, so thousands of them can be in flight on one event loop
+without a thread each. Every other request is handed to the Flask app itself
+on a thread pool, so both serving modes run the same view functions.
+"""
+import asyncio
+import inspect
+import io
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from flask import Flask
+from werkzeug.datastructures import Headers, MultiDict
+
+from .event_log import EventLog
+from .traffic_capture import CAPTURE_HEADERS, TrafficCapture
+
+Handler = Callable[['Request'], Awaitable[Tuple[dict, int]]]
+
+
+class Request:
+    """The parts of an HTTP request the native routes need, with Flask-like accessors"""
+
+    __slots__ = ('method', 'path', 'args', 'headers', 'body')
+
+    def __init__(self, scope: dict, body: bytes):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = MultiDict(parse_qsl(scope['query_string'].decode('latin-1')))
+        self.headers = Headers([(name.decode('latin-1'), value.decode('latin-1')) for name, value in scope['headers']])
+        self.body = body
+
+    @property
+    def json(self) -> Optional[dict]:
+        try:
+            return json.loads(self.body) if self.body else None
+        except ValueError:
+            return None
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+class AsyncApp:
+    """ASGI application: native async routes first, then the Flask app on a thread pool.
+
+    ``observe(seconds, route, method, status)`` is called for native routes,
+    so they land in the same latency histogram as the Flask routes. Native
+    routes are also recorded by ``capture``, a TrafficCapture; the Flask
+    routes are captured by the Flask app's own hooks.
+    """
+
+    def __init__(self, app: Flask, workers: int = 32,
+                 observe: Optional[Callable[[float, str, str, str], None]] = None,
+                 capture: Optional[TrafficCapture] = None):
+        self.app = app
+        self.observe = observe
+        self.capture = capture
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='wsgi')
+        self.routes: Dict[Tuple[str, str], Handler] = {}
+        self.on_startup: List[Callable] = []
+        self.on_shutdown: List[Callable] = []
+
+    def route(self, path: str, methods=('GET',)):
+        def register(handler: Handler) -> Handler:
+            for method in methods:
+                self.routes[(method, path)] = handler
+            return handler
+        return register
+
+    async def __call__(self, scope: dict, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        handler = self.routes.get((scope['method'], scope['path']))
+        if handler is None:
+            await self._call_flask(scope, receive, send)
+            return
+
+        started, start = time.time(), time.perf_counter()
+        request = Request(scope, await _read_body(receive))
+        payload, status = await handler(request)
+        body = self.app.json.dumps(payload, separators=(',', ':')).encode() + b'\n'  # As jsonify encodes it
+        await send({'type': 'http.response.start', 'status': status, 'headers': [
+            (b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body})
+        seconds = time.perf_counter() - start
+        if self.observe is not None:
+            self.observe(seconds, scope['path'], scope['method'], str(status))
+        if self.capture is not None and scope['path'] not in self.capture.exclude:
+            self.capture.record(started, seconds, scope['path'], scope['method'], scope['path'],
+                                scope['query_string'], tuple(map(request.headers.get, CAPTURE_HEADERS)),
+                                request.body, status, body)
+
+    # Flask routes, run on the thread pool
+
+    def _environ(self, scope: dict, body: bytes) -> dict:
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+            'PATH_INFO': scope['path'].encode().decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_LENGTH':
+                continue
+            key = name if name == 'CONTENT_TYPE' else 'HTTP_' + name
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+    def _run_flask(self, environ: dict) -> Tuple[int, list, bytes]:
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+            return lambda data: None
+
+        result = self.app(environ, start_response)
+        try:
+            body = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        status, headers = started
+        return int(status.split(' ', 1)[0]), [
+            (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers], body
+
+    async def _call_flask(self, scope: dict, receive, send):
+        environ = self._environ(scope, await _read_body(receive))
+        status, headers, body = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self._run_flask, environ)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    # Lifespan
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            hooks = self.on_startup if message['type'] == 'lifespan.startup' else self.on_shutdown
+            for hook in hooks:
+                result = hook()
+                if inspect.isawaitable(result):
+                    await result
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+class LogWaiter:
+    """Awaitable long-polls of an EventLog; one wake-up per loop iteration however many are waiting"""
+
+    def __init__(self, log: EventLog):
+        self.log = log
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._wake_pending = False
+        self._lock = threading.Lock()
+        log.add_listener(self._on_publish)
+
+    def _on_publish(self):
+        with self._lock:
+            if self._loop is None or self._wake_pending:
+                return
+            self._wake_pending = True
+        self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        with self._lock:
+            self._wake_pending = False
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def wait(self, after: int, timeout: float, limit: int):
+        """Like EventLog.wait, without holding a thread"""
+        if self._loop is None:
+            self._changed = asyncio.Event()
+            with self._lock:
+                self._loop = asyncio.get_running_loop()
+        deadline = self._loop.time() + timeout
+        after = self.log.start_cursor(after)
+        while True:
+            changed = self._changed  # Taken before checking, so a publish after the check has already set it
+            remaining = deadline - self._loop.time()
+            if self.log.last_cursor != after or remaining <= 0:
+                return self.log.read(after, limit)
+            try:
+                await asyncio.wait_for(changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
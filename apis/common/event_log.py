@@ -0,0 +1,90 @@
+import secrets
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+# Bounds on GET /events long-polls
+MAX_POLL_TIMEOUT = 30
+MAX_POLL_LIMIT = 1000
+
+# Cursors are generation * GENERATION_SPAN + event number, and stay below 2**53 so JavaScript reads them exactly
+GENERATION_SPAN = 2 ** 32
+GENERATIONS = 2 ** 20
+
+
+def poll_params(args) -> Tuple[int, float, int]:
+    """Cursor, timeout and limit of a GET /events long-poll from its (werkzeug) query args"""
+    cursor = args.get('cursor', 0, type=int)
+    timeout = min(args.get('timeout', 25, type=float), MAX_POLL_TIMEOUT)
+    limit = max(1, min(args.get('limit', MAX_POLL_LIMIT, type=int), MAX_POLL_LIMIT))
+    return cursor, timeout, limit
+
+
+class EventLog:
+    """Bounded in-memory log of lifecycle events with monotonically increasing cursors.
+
+    Events are numbered consecutively and kept in a ring buffer of
+    ``capacity`` slots. Readers pass the cursor of the last event they saw (0 to start
+    from the oldest) and get everything after it; a reader that fell so far
+    behind that events were overwritten is told so through the ``truncated``
+    flag, so it can resync from the status endpoints. Each log draws a random
+    generation that goes into the high bits of its cursors, so a cursor from
+    another process (such as one from before a restart) is recognized and
+    reported as truncated too.
+    """
+
+    def __init__(self, capacity: int = 10000, generation: Optional[int] = None):
+        self.capacity = capacity
+        self.generation = secrets.randbelow(GENERATIONS - 1) + 1 if generation is None else generation
+        self._events: List[Optional[dict]] = [None] * capacity
+        self._first = self.generation * GENERATION_SPAN  # the cursor before the first event
+        self._last = self._first  # cursor of the newest event
+        self._cond = threading.Condition()
+        self._listeners: List[Callable[[], None]] = []
+
+    @property
+    def last_cursor(self) -> int:
+        return self._last
+
+    def start_cursor(self, after: int) -> int:
+        """``after``, with 0 (read from the oldest event) replaced by the cursor before this log's first event"""
+        return self._first if after == 0 else after
+
+    def add_listener(self, listener: Callable[[], None]):
+        """Call ``listener`` (with no arguments) after every publish; it must not block"""
+        self._listeners.append(listener)
+
+    def publish(self, event: str, **data) -> int:
+        with self._cond:
+            cursor = self._last + 1
+            self._events[cursor % self.capacity] = {'cursor': cursor, 'event': event, 'time': time.time(), **data}
+            self._last = cursor
+            self._cond.notify_all()
+        for listener in self._listeners:
+            listener()
+        return cursor
+
+    def read(self, after: int, limit: int = 1000) -> Tuple[List[dict], int, bool]:
+        """Events after cursor ``after`` (oldest first), the cursor to resume from, and whether events were lost"""
+        limit = max(1, limit)
+        with self._cond:
+            last = self._last
+            after = self.start_cursor(after)
+            if not self._first <= after <= last:
+                # A cursor from another generation: start over from the oldest event still held
+                after, truncated = self._first, True
+            else:
+                truncated = False
+            oldest = max(self._first + 1, last - self.capacity + 1)
+            truncated = truncated or after + 1 < oldest
+            start = max(after + 1, oldest)
+            end = min(last, start + limit - 1)
+            events = [self._events[cursor % self.capacity] for cursor in range(start, end + 1)]
+        return events, (end if events else after), truncated
+
+    def wait(self, after: int, timeout: float, limit: int = 1000) -> Tuple[List[dict], int, bool]:
+        """Like read, but blocks up to ``timeout`` seconds for an event after ``after``"""
+        after = self.start_cursor(after)
+        with self._cond:
+            self._cond.wait_for(lambda: self._last != after, timeout)
+        return self.read(after, limit)
@@ -0,0 +1,169 @@
+"""Server-sent event stream of an EventLog, served from a single asyncio thread.
+
+    GET /events?cursor=<n>&events=DepositFunds,ReleaseFunds
+
+Each subscriber is a coroutine rather than a thread, so thousands of open
+streams cost a few KB each. Every event goes out as an SSE message whose
+``id`` is its cursor, so a reconnecting EventSource resumes through the
+Last-Event-ID header. If events were dropped before a subscriber could read
+them, it gets a ``reset`` message and should resync from the status
+endpoints. Idle streams get a comment line every ``heartbeat`` seconds to
+keep proxies from closing them.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Set
+from urllib.parse import parse_qs, urlsplit
+
+from .event_log import EventLog
+
+RESPONSE_HEADERS = (
+    b'HTTP/1.1 200 OK\r\n'
+    b'Content-Type: text/event-stream\r\n'
+    b'Cache-Control: no-cache\r\n'
+    b'Connection: keep-alive\r\n'
+    b'Access-Control-Allow-Origin: *\r\n'
+    b'\r\n'
+)
+
+
+class EventStreamServer:
+    def __init__(self, log: EventLog, host: str = '127.0.0.1', port: int = 0, heartbeat: float = 15.0):
+        self.log = log
+        self.host = host
+        self.port = port
+        self.heartbeat = heartbeat
+        self.subscribers = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._wake_pending = False
+        self._wake_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._error: Optional[OSError] = None
+        self._messages: 'OrderedDict[int, bytes]' = OrderedDict()  # encoded once, sent to every subscriber
+        log.add_listener(self._on_publish)
+
+    # Publishing thread -> event loop
+
+    def _on_publish(self):
+        # Many publishes between two loop iterations wake the subscribers only once
+        with self._wake_lock:
+            if self._loop is None or self._wake_pending:
+                return
+            self._wake_pending = True
+        self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        with self._wake_lock:
+            self._wake_pending = False
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    # Subscribers
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        request_line = (await reader.readline()).decode('latin-1').split()
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1')
+            if line in ('\r\n', '\n', ''):
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return request_line, headers
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        subscribed = False
+        try:
+            request_line, headers = await self._read_request(reader)
+            url = urlsplit(request_line[1]) if len(request_line) >= 2 else None
+            if url is None or request_line[0] != 'GET' or url.path != '/events':
+                writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                await writer.drain()
+                return
+
+            query = parse_qs(url.query)
+            cursor_text = headers.get('last-event-id') or query.get('cursor', [''])[0]
+            cursor = int(cursor_text) if cursor_text.isdigit() else self.log.last_cursor
+            wanted = set(query['events'][0].split(',')) if 'events' in query else None
+
+            self.subscribers += 1
+            subscribed = True
+            writer.write(RESPONSE_HEADERS)
+            writer.write(b'retry: 1000\n\n')
+            await writer.drain()
+            await self._stream(writer, cursor, wanted)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if subscribed:
+                self.subscribers -= 1
+            writer.close()
+
+    def _message(self, event: dict) -> bytes:
+        # Only touched from the event loop thread
+        message = self._messages.get(event['cursor'])
+        if message is None:
+            message = b'id: %d\nevent: %s\ndata: %s\n\n' % (
+                event['cursor'], event['event'].encode(), json.dumps(event).encode())
+            self._messages[event['cursor']] = message
+            if len(self._messages) > self.log.capacity:
+                self._messages.popitem(last=False)
+        return message
+
+    async def _stream(self, writer: asyncio.StreamWriter, cursor: int, wanted: Optional[Set[str]]):
+        last_write = time.monotonic()
+        while True:
+            # Taken before reading, so an event published after the read has already set it
+            changed = self._changed
+            events, cursor, truncated = self.log.read(cursor)
+            if truncated:
+                writer.write(b'event: reset\ndata: {}\n\n')
+            if events:
+                writer.write(b''.join(self._message(e) for e in events if wanted is None or e['event'] in wanted))
+                await writer.drain()
+                last_write = time.monotonic()
+                if cursor < self.log.last_cursor:
+                    continue  # Read was capped; more are waiting
+            await changed.wait()
+            if cursor == self.log.last_cursor and time.monotonic() - last_write >= self.heartbeat:
+                writer.write(b': keepalive\n\n')
+                await writer.drain()
+                last_write = time.monotonic()
+
+    # Lifecycle
+
+    async def _serve(self):
+        self._changed = asyncio.Event()
+        try:
+            server = await asyncio.start_server(self._handle, self.host, self.port, backlog=4096)
+        except OSError as e:
+            # Port taken or unavailable: report it to start() rather than leave it waiting
+            self._error = e
+            self._ready.set()
+            return
+        self.port = server.sockets[0].getsockname()[1]
+        with self._wake_lock:
+            self._loop = asyncio.get_running_loop()
+        self._ready.set()
+        heartbeat = asyncio.create_task(self._heartbeat())
+        async with server:
+            await server.serve_forever()
+        heartbeat.cancel()
+
+    async def _heartbeat(self):
+        # One timer for all subscribers instead of a timeout per wait
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            self._wake()
+
+    def start(self) -> 'EventStreamServer':
+        """Serve from a daemon thread; returns once the port is bound"""
+        threading.Thread(target=lambda: asyncio.run(self._serve()), name='event-stream', daemon=True).start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        return self
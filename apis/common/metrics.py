@@ -0,0 +1,173 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Counters and histograms are updated on the request path, so each one is a
+dict of label values -> numbers behind a single lock. Gauges and other
+values that already live elsewhere (store sizes, cache statistics) are
+collected by callbacks only when ``/metrics`` is scraped.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from flask import Flask, g, request
+
+# Upper bounds in seconds, from sub-millisecond cache hits to multi-second timeouts
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + '}'
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        lines += [f'{self.name}{_label_text(self.labelnames, labels)} {_number(value)}' for labels, value in values]
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram; observing costs one bisect and one locked update"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Labels, list] = {}  # labels -> [count per bucket (last is +Inf), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bucket] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        names = self.labelnames + ('le',)
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{_label_text(names, labels + (le,))} {cumulative}')
+            lines.append(f'{self.name}_sum{_label_text(self.labelnames, labels)} {_number(total)}')
+            lines.append(f'{self.name}_count{_label_text(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class Collected:
+    """Gauge or counter whose values are read from ``collect()`` at scrape time"""
+
+    def __init__(self, name: str, help: str, type: str, labelnames: Sequence[str],
+                 collect: Callable[[], Dict[Labels, float]]):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        lines += [f'{self.name}{_label_text(self.labelnames, labels)} {_number(value)}'
+                  for labels, value in sorted(self.collect().items())]
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str], collect: Callable[[], Dict[Labels, float]]):
+        return self._add(Collected(name, help, 'gauge', labelnames, collect))
+
+    def collected_counter(self, name: str, help: str, labelnames: Sequence[str],
+                          collect: Callable[[], Dict[Labels, float]]):
+        return self._add(Collected(name, help, 'counter', labelnames, collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+
+def instrument(app: Flask, registry: Registry, prefix: str):
+    """Record every request's latency by route template, method and status code.
+
+    Requests that match no route are counted under ``route="unmatched"`` so
+    scanned URLs cannot grow the label set.
+    """
+    requests = registry.histogram(f'{prefix}_http_request_duration_seconds',
+                                  'Time spent handling HTTP requests', ('route', 'method', 'status'))
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            requests.observe(time.perf_counter() - start, route, request.method, str(response.status_code))
+        return response
+
+    return requests
+
+
+def status_cache_metrics(registry: Registry, prefix: str, report: Callable[[], dict]):
+    """Expose a StatusCache report as a lookup counter and an entries gauge"""
+    def lookups():
+        stats = report()
+        return {('hit',): stats['hits'], ('miss',): stats['misses'], ('not_modified',): stats['not_modified']}
+
+    registry.collected_counter(f'{prefix}_status_cache_lookups_total', 'Status polls by cache outcome', ('result',),
+                               lookups)
+    registry.gauge(f'{prefix}_status_cache_entries', 'Serialized status bodies held', (),
+                   lambda: {(): report()['entries']})
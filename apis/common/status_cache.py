@@ -0,0 +1,77 @@
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Tuple
+
+from flask import Response, current_app, request
+
+
+class StatusCache:
+    """Serialized status responses per record, tagged with the record's version.
+
+    The caller passes the record's current version, a counter bumped on
+    every mutation. A poll whose If-None-Match carries that version's ETag
+    gets a 304 without the record being serialized. Otherwise the body
+    cached for that version is reused, and only a changed record is
+    serialized again. ETags include a per-process token, so tags issued
+    before a restart never match.
+    """
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self.generation = secrets.token_hex(4)
+        self._entries: 'OrderedDict[Hashable, Tuple[int, bytes]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'not_modified': 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def etag(self, version: int) -> str:
+        return f'{self.generation}-{version}'
+
+    def respond(self, key: Hashable, version: int, build: Callable[[], dict]) -> Response:
+        etag = self.etag(version)
+        if request.if_none_match.contains(etag):
+            self._count('not_modified')
+            response = current_app.response_class(status=304)
+        else:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == version:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    body = entry[1]
+                else:
+                    body = None
+                    self.stats['misses'] += 1
+            if body is None:
+                body = current_app.json.response(build()).get_data()
+                self._put(key, version, body)
+            response = current_app.response_class(body, mimetype='application/json')
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'  # Revalidate each time; 304s are cheap
+        return response
+
+    def _put(self, key: Hashable, version: int, body: bytes):
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None and current[0] > version:
+                return  # A newer version was cached while this one was being built
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def report(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            entries = len(self._entries)
+        polls = stats['hits'] + stats['misses'] + stats['not_modified']
+        return {
+            **stats,
+            'entries': entries,
+            'hit_ratio': (stats['hits'] + stats['not_modified']) / polls if polls else 0.0
+        }
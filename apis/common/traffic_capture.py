@@ -0,0 +1,172 @@
+"""Request capture for offline replay (see replay_traffic.py).
+
+Each captured request is one compact JSON line: when it arrived, the
+route, method, path, a few headers, the body, and what the server answered
+(status, body length and CRC-32, time taken). Handling a request only
+appends a tuple to a deque, which takes no lock; a writer thread wakes
+every ``flush_interval`` seconds, encodes what has accumulated and appends
+it to a size-rotated file. If the writer falls behind, entries are dropped
+and counted rather than slowing requests down.
+"""
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Iterable, Iterator, Optional, Sequence
+
+from flask import Flask, request
+
+# The headers the services read; everything else is left out of the capture
+CAPTURE_HEADERS = ('Content-Type', 'If-None-Match', 'X-Admin-Key', 'X-Agent-Key', 'X-Buyer-Address')
+# The same headers as WSGI environ keys, read directly rather than through request.headers
+ENVIRON_KEYS = tuple(name.upper().replace('-', '_') if name == 'Content-Type' else
+                     'HTTP_' + name.upper().replace('-', '_') for name in CAPTURE_HEADERS)
+# Recorded as a fingerprint instead of the value; the replay tool supplies the value when it matches
+REDACTED_HEADERS = ('X-Admin-Key', 'X-Agent-Key')
+
+
+def redact(value: str) -> str:
+    return 'redacted:' + hashlib.sha256(value.encode('utf-8')).hexdigest()[:12]
+
+
+class TrafficCapture:
+    """Rotating capture of the requests a service handles.
+
+    Entries go to ``{directory}/{service}-capture.jsonl``. When that file
+    passes ``max_bytes`` it is renamed to ``.1`` (shifting older files up to
+    ``.{backups}``, and deleting the oldest) and a new one is started.
+    Request bodies longer than ``max_body`` bytes are cut short and marked
+    as truncated.
+    """
+
+    def __init__(self, directory: str, service: str, max_bytes: int = 64 * 1024 * 1024, backups: int = 5,
+                 max_body: int = 64 * 1024, exclude: Iterable[str] = ('/metrics',), max_pending: int = 100000,
+                 flush_interval: float = 0.05):
+        self.path = os.path.join(directory, f'{service}-capture.jsonl')
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.max_body = max_body
+        self.exclude = frozenset(exclude)
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.captured = 0
+        self.dropped = 0
+        self._pending: deque = deque()
+        self._closed = False
+        self._file = None
+        os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._write_loop, name=f'{service}-capture', daemon=True)
+        self._writer.start()
+
+    def install(self, app: Flask):
+        """Capture every request the Flask app handles"""
+        # Each access through the request proxy costs a context lookup, so both hooks resolve it once
+        @app.before_request
+        def start_capture():
+            request.environ['capture.start'] = (time.time(), time.perf_counter())
+
+        @app.after_request
+        def capture_request(response):
+            current = request._get_current_object()
+            environ = current.environ
+            start = environ.pop('capture.start', None)
+            if start is not None and current.path not in self.exclude:
+                route = current.url_rule.rule if current.url_rule is not None else 'unmatched'
+                body = current.get_data() if environ.get('CONTENT_LENGTH') else b''
+                # Error pages are wrapped iterators too, so only pass-through (file) bodies are left unread
+                response_body = b'' if response.direct_passthrough else response.get_data()
+                self.record(start[0], time.perf_counter() - start[1], route, current.method, current.path,
+                            current.query_string, tuple(map(environ.get, ENVIRON_KEYS)), body,
+                            response.status_code, response_body)
+            return response
+
+    def record(self, started: float, seconds: float, route: str, method: str, path: str, query_string: bytes,
+               header_values: Sequence[Optional[str]], body: bytes, status: int, response_body: bytes):
+        """Queue one request; ``header_values`` are the CAPTURE_HEADERS' values, None where absent"""
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1  # Approximate under contention; only reported
+            return
+        self._pending.append((started, seconds, route, method, path, query_string, header_values,
+                              body[:self.max_body], len(body) > self.max_body, status, len(response_body),
+                              zlib.crc32(response_body)))
+
+    # Writer thread
+
+    def _encode(self, entry: tuple) -> str:
+        (started, seconds, route, method, path, query_string, header_values, body, truncated, status,
+         response_length, response_crc) = entry
+        headers = {name: (redact(value) if name in REDACTED_HEADERS else value)
+                   for name, value in zip(CAPTURE_HEADERS, header_values) if value is not None}
+        record = {'ts': round(started, 6), 'route': route, 'method': method,
+                  'path': path + ('?' + query_string.decode('latin-1') if query_string else ''),
+                  'headers': headers, 'status': status, 'ms': round(seconds * 1000, 3),
+                  'response_length': response_length, 'response_crc': response_crc}
+        try:
+            record['body'] = body.decode('utf-8')
+        except UnicodeDecodeError:
+            record['body_b64'] = base64.b64encode(body).decode('ascii')
+        if truncated:
+            record['truncated'] = True
+        return json.dumps(record, separators=(',', ':')) + '\n'
+
+    def _write_loop(self):
+        while not self._closed:
+            time.sleep(self.flush_interval)
+            self._write_pending()
+        self._write_pending()  # Entries queued before close()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write_pending(self):
+        while self._pending:
+            entries = []
+            while self._pending and len(entries) < 1000:
+                entries.append(self._pending.popleft())
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(''.join(map(self._encode, entries)))
+            self._file.flush()
+            self.captured += len(entries)
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for index in range(self.backups, 0, -1):
+            source = self.path if index == 1 else f'{self.path}.{index - 1}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.path}.{index}')
+        if not self.backups:
+            os.remove(self.path)
+
+    def close(self):
+        """Write out everything queued so far and stop the writer"""
+        self._closed = True
+        self._writer.join()
+
+
+def capture_files(path: str) -> list:
+    """A capture file followed by any rotated predecessors, oldest first"""
+    rotated = []
+    index = 1
+    while os.path.exists(f'{path}.{index}'):
+        rotated.append(f'{path}.{index}')
+        index += 1
+    return list(reversed(rotated)) + ([path] if os.path.exists(path) else [])
+
+
+def read_capture(paths: Iterable[str]) -> Iterator[dict]:
+    """Captured entries in the order they were written; a torn last line is skipped"""
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
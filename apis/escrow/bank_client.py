@@ -0,0 +1,254 @@
+import http.client
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Client settings, overridable from the environment
+BANK_CONNECT_TIMEOUT = float(os.getenv('BANK_CONNECT_TIMEOUT', '0.5'))
+BANK_READ_TIMEOUT = float(os.getenv('BANK_READ_TIMEOUT', '2.0'))
+BANK_POOL_SIZE = int(os.getenv('BANK_POOL_SIZE', '32'))
+BANK_ASYNC_POOL_SIZE = int(os.getenv('BANK_ASYNC_POOL_SIZE', '1000'))  # connections held by the async serving mode
+LOAN_APPROVAL_CACHE_TTL = float(os.getenv('LOAN_APPROVAL_CACHE_TTL', '2.0'))
+LOAN_APPROVAL_CACHE_SIZE = int(os.getenv('LOAN_APPROVAL_CACHE_SIZE', '10000'))
+BANK_EVENTS_TIMEOUT = float(os.getenv('BANK_EVENTS_TIMEOUT', '45'))  # the bank's stream sends a heartbeat every 15s
+
+# Bank events after which a buyer's cached approval may be wrong
+LOAN_EVENTS = ('LoanApplied', 'LoanApproved', 'LoanRejected', 'LoanRepaid')
+
+
+class ApprovalCache:
+    """Short-lived LRU cache of the buyers whose loan the bank has approved.
+
+    Entries are only served while ``live`` is set, which a LoanEventFollower
+    does while it receives the bank's loan events and drops each buyer's entry
+    as their loan changes. Not-approved answers are never cached, so a new
+    approval counts on the next release.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[bool, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0  # bumped by every invalidation
+        self.live = False
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, buyer: str) -> Optional[bool]:
+        with self._lock:
+            entry = self._entries.get(buyer)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[buyer]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(buyer)
+            self.hits += 1
+            return entry[0]
+
+    def epoch(self) -> int:
+        """Taken before asking the bank, and handed back to put with its answer"""
+        return self._epoch
+
+    def put(self, buyer: str, approved: bool, epoch: int):
+        # An invalidation since epoch may have been for this buyer, so the answer could already be stale
+        if not approved or self.ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            if not self.live or epoch != self._epoch:
+                return
+            self._entries[buyer] = (approved, time.monotonic() + self.ttl)
+            self._entries.move_to_end(buyer)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, buyer: Optional[str] = None):
+        with self._lock:
+            self._epoch += 1
+            if buyer is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(buyer, None)
+
+    def set_live(self, live: bool):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self.live = live
+
+
+class LoanEventFollower:
+    """Follows the bank's server-sent loan events, dropping a buyer's cached approval when their loan changes.
+
+    The cache is live only while the stream is connected. Connecting,
+    disconnecting and a ``reset`` (events dropped before they were sent) all
+    clear it, and a lost stream is reconnected after ``retry`` seconds.
+    """
+
+    def __init__(self, url: str, cache: ApprovalCache, timeout: float = BANK_EVENTS_TIMEOUT, retry: float = 1.0):
+        self.url = urlsplit(url)
+        self.cache = cache
+        self.timeout = timeout
+        self.retry = retry
+        self.connects = 0
+        self._stopped = threading.Event()
+
+    def start(self) -> 'LoanEventFollower':
+        threading.Thread(target=self._run, name='bank-events', daemon=True).start()
+        return self
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self._follow()
+            except (OSError, http.client.HTTPException, ValueError):
+                pass  # Bank down, stream cut or a garbled message: start over
+            self.cache.set_live(False)
+            self._stopped.wait(self.retry)
+
+    def _follow(self):
+        connection = http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=self.timeout)
+        try:
+            connection.request('GET', f"{self.url.path or '/'}?events={','.join(LOAN_EVENTS)}")
+            response = connection.getresponse()
+            if response.status != 200:
+                return
+            # The stream starts at the bank's latest event, so anything cached before now is suspect
+            self.connects += 1
+            self.cache.set_live(True)
+            event = None
+            for line in response:
+                line = line.decode('utf-8').rstrip('\r\n')
+                if line.startswith('event:'):
+                    event = line[len('event:'):].strip()
+                elif line.startswith('data:') and event is not None:
+                    buyer = None if event == 'reset' else json.loads(line[len('data:'):]).get('buyer')
+                    self.cache.invalidate(buyer)
+                elif not line:
+                    event = None
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+
+
+def approval_from_response(status_code: int, body: Callable[[], dict]) -> Optional[bool]:
+    """Loan approval from a /loan_status response, or None when the bank could not answer"""
+    if status_code == 200:
+        return bool(body()['is_approved'])
+    if status_code == 404:
+        return False
+    return None
+
+
+class BankClient:
+    """Pooled HTTP client for the loan processing service"""
+
+    def __init__(self, base_url: str,
+                 connect_timeout: float = BANK_CONNECT_TIMEOUT,
+                 read_timeout: float = BANK_READ_TIMEOUT,
+                 pool_size: int = BANK_POOL_SIZE,
+                 cache_ttl: float = LOAN_APPROVAL_CACHE_TTL,
+                 cache_size: int = LOAN_APPROVAL_CACHE_SIZE,
+                 observe: Optional[Callable[[float, str], None]] = None):
+        self.base_url = base_url.rstrip('/')
+        self.observe = observe  # called with (seconds, HTTP status or 'error') after each bank call
+        self.timeout = (connect_timeout, read_timeout)
+        self.cache = ApprovalCache(cache_ttl, cache_size)
+
+        # Keep-alive connections are reused across requests and worker threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def is_loan_approved(self, buyer: str) -> bool:
+        approved = self.cache.get(buyer)
+        if approved is not None:
+            return approved
+
+        epoch = self.cache.epoch()
+        start = time.perf_counter()
+        try:
+            response = self.session.get(f"{self.base_url}/loan_status/{buyer}", timeout=self.timeout)
+        except requests.RequestException:
+            # Transport failures are not cached so the next release retries the bank
+            if self.observe is not None:
+                self.observe(time.perf_counter() - start, 'error')
+            return False
+        if self.observe is not None:
+            self.observe(time.perf_counter() - start, str(response.status_code))
+
+        approved = approval_from_response(response.status_code, response.json)
+        if approved is None:
+            return False
+
+        self.cache.put(buyer, approved, epoch)
+        return approved
+
+    def invalidate(self, buyer: Optional[str] = None):
+        self.cache.invalidate(buyer)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncBankClient:
+    """Non-blocking BankClient for the async serving mode.
+
+    Shares the synchronous client's approval cache, so invalidations through
+    either serving path apply to both. Needs httpx.
+    """
+
+    def __init__(self, base_url: str, cache: ApprovalCache,
+                 connect_timeout: float = BANK_CONNECT_TIMEOUT,
+                 read_timeout: float = BANK_READ_TIMEOUT,
+                 pool_size: int = BANK_ASYNC_POOL_SIZE,
+                 observe: Optional[Callable[[float, str], None]] = None,
+                 transport=None):
+        import httpx  # Only the async serving mode depends on httpx
+
+        self._transport_errors = (httpx.HTTPError,)
+        self.cache = cache
+        self.observe = observe
+        # Waiting for a free connection is bounded by the caller's deadline rather than a pool timeout
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip('/'),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout, pool=None),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            transport=transport)
+
+    async def is_loan_approved(self, buyer: str) -> bool:
+        approved = self.cache.get(buyer)
+        if approved is not None:
+            return approved
+
+        epoch = self.cache.epoch()
+        start = time.perf_counter()
+        try:
+            response = await self.client.get(f"/loan_status/{buyer}")
+        except self._transport_errors:
+            if self.observe is not None:
+                self.observe(time.perf_counter() - start, 'error')
+            return False
+        if self.observe is not None:
+            self.observe(time.perf_counter() - start, str(response.status_code))
+
+        approved = approval_from_response(response.status_code, response.json)
+        if approved is None:
+            return False
+
+        self.cache.put(buyer, approved, epoch)
+        return approved
+
+    async def close(self):
+        await self.client.aclose()
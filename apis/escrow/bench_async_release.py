@@ -0,0 +1,133 @@
+"""Benchmark: in-flight releases in the threaded (Flask) and async (ASGI) serving modes.
+
+Fires many concurrent /release_funds requests at the escrow service in
+process while every loan approval check takes --bank-latency seconds. The
+threaded mode can only have as many releases waiting on the bank as it has
+threads; the async mode awaits all of them at once on one event loop. No
+bank server is needed: the sync mode's check sleeps, and the async mode's
+bank client gets a mock transport that answers after the same delay.
+
+    python bench_async_release.py --releases 2000 --bank-latency 0.05 --threads 32
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+import escrow_asgi
+import escrow_server
+from bank_client import AsyncBankClient
+from escrow_server import ESCROW_AGENT, LOAN_PROCESSING_URL, engine, store
+
+
+class InFlight:
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self.current -= 1
+
+
+def seed(count: int) -> list:
+    store.clear()
+    engine.versions.clear()
+    escrow_server.bank_client.invalidate()
+    property_ids = [2 * (i + 1) for i in range(count)]  # even ids pass the ownership mock
+    for property_id in property_ids:
+        buyer = f'buyer-{property_id}'  # one buyer each, so no approval is served from the cache
+        engine.create(buyer, f'seller-{property_id}', property_id, 1000)
+        engine.deposit(property_id, buyer, 1000)
+    return property_ids
+
+
+def run_threaded(property_ids: list, latency: float, threads: int) -> dict:
+    in_flight = InFlight()
+
+    def slow_approval(buyer: str) -> bool:
+        with in_flight:
+            time.sleep(latency)
+        return True
+
+    escrow_server.check_loan_approval = slow_approval
+    local = threading.local()
+
+    def release(property_id: int) -> int:
+        if not hasattr(local, 'client'):
+            local.client = escrow_server.app.test_client()
+        return local.client.post('/release_funds', headers={'X-Agent-Key': ESCROW_AGENT},
+                                 json={'property_id': property_id}).status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        statuses = list(pool.map(release, property_ids))
+    return {'seconds': time.perf_counter() - start, 'statuses': statuses, 'peak_in_flight': in_flight.peak}
+
+
+async def run_async(property_ids: list, latency: float) -> dict:
+    in_flight = InFlight()
+
+    async def slow_bank(request: httpx.Request) -> httpx.Response:
+        with in_flight:
+            await asyncio.sleep(latency)
+        return httpx.Response(200, json={'is_approved': True})
+
+    escrow_asgi.async_bank_client = AsyncBankClient(LOAN_PROCESSING_URL, escrow_server.bank_client.cache,
+                                                    transport=httpx.MockTransport(slow_bank))
+    headers = [(b'x-agent-key', ESCROW_AGENT.encode()), (b'content-type', b'application/json')]
+
+    async def release(property_id: int) -> int:
+        # Called the way an ASGI server would, without an HTTP client's overhead on this side
+        body = json.dumps({'property_id': property_id}).encode()
+        scope = {'type': 'http', 'method': 'POST', 'path': '/release_funds', 'query_string': b'', 'headers': headers}
+        status = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        await escrow_asgi.app(scope, receive, send)
+        return status[0]
+
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*(release(property_id) for property_id in property_ids))
+    seconds = time.perf_counter() - start
+    await escrow_asgi.async_bank_client.close()
+    return {'seconds': seconds, 'statuses': statuses, 'peak_in_flight': in_flight.peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--releases', type=int, default=2000)
+    parser.add_argument('--bank-latency', type=float, default=0.05, help='seconds per loan approval check')
+    parser.add_argument('--threads', type=int, default=32, help='worker threads for the threaded mode')
+    args = parser.parse_args()
+
+    results = {
+        'threaded': run_threaded(seed(args.releases), args.bank_latency, args.threads),
+        'async': asyncio.run(run_async(seed(args.releases), args.bank_latency)),
+    }
+
+    print(f"{'mode':<9} {'releases':>9} {'ok':>6} {'seconds':>8} {'releases/s':>11} {'peak bank calls':>16}")
+    for mode, result in results.items():
+        ok = result['statuses'].count(200)
+        print(f"{mode:<9} {args.releases:>9} {ok:>6} {result['seconds']:>8.2f} "
+              f"{args.releases / result['seconds']:>11.0f} {result['peak_in_flight']:>16}")
+
+
+if __name__ == '__main__':
+    main()
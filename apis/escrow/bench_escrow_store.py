@@ -0,0 +1,100 @@
+"""Benchmark: the in-memory and SQLite escrow stores.
+
+Runs the same workload through EscrowEngine on each backend: create N
+escrows (about ten per seller), deposit into nine in ten, release half of
+those, then time point reads, "open escrows for this seller" and the first
+page of escrows awaiting deposit. Both backends must return the same
+query results. The memory store answers queries by scanning every escrow;
+SQLite answers them from its buyer/seller/state indexes.
+
+    python bench_escrow_store.py --escrows 100000 --queries 200
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from escrow_engine import EscrowEngine
+from escrow_store import MemoryEscrowStore, SQLiteEscrowStore
+
+
+def percentiles(samples: list) -> tuple:
+    samples = sorted(samples)
+    return statistics.median(samples) * 1000, samples[int(len(samples) * 0.99)] * 1000
+
+
+def run(store, escrows: int, queries: int, rng: random.Random) -> dict:
+    engine = EscrowEngine(store)
+    property_ids = list(range(1, escrows + 1))
+    sellers = [f'seller-{i}' for i in range(max(1, escrows // 10))]
+
+    funded = [property_id for property_id in property_ids if property_id % 10]
+    start = time.perf_counter()
+    for property_id in property_ids:
+        engine.create(f'buyer-{property_id}', sellers[property_id % len(sellers)], property_id, 1000)
+    for property_id in funded:
+        engine.deposit(property_id, f'buyer-{property_id}', 1000)
+    for property_id in funded[::2]:
+        engine.release(property_id, lambda escrow: None)
+    writes = escrows + len(funded) + len(funded[::2])
+    write_seconds = time.perf_counter() - start
+
+    result = {'writes/s': writes / write_seconds}
+    probes = [rng.choice(property_ids) for _ in range(queries)]
+    seller_probes = [rng.choice(sellers) for _ in range(queries)]
+
+    samples = []
+    for property_id in probes:
+        start = time.perf_counter()
+        store.get(property_id)
+        samples.append(time.perf_counter() - start)
+    result['get'] = percentiles(samples)
+
+    samples, answers = [], []
+    for seller in seller_probes:
+        start = time.perf_counter()
+        answers.append([escrow.property_id for escrow in engine.find(seller=seller, state='open')])
+        samples.append(time.perf_counter() - start)
+    result['open for seller'] = percentiles(samples)
+
+    samples = []
+    for _ in range(queries):
+        start = time.perf_counter()
+        page = engine.find(state='awaiting_deposit', limit=100)
+        samples.append(time.perf_counter() - start)
+    answers.append([escrow.property_id for escrow in page])
+    result['awaiting deposit'] = percentiles(samples)
+    result['answers'] = answers
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escrows', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        sqlite_store = SQLiteEscrowStore(os.path.join(directory, 'escrows.db'))
+        results = {
+            'memory': run(MemoryEscrowStore({}, {}), args.escrows, args.queries, random.Random(args.seed)),
+            'sqlite': run(sqlite_store, args.escrows, args.queries, random.Random(args.seed)),
+        }
+        sqlite_store.close()
+
+    if results['memory']['answers'] != results['sqlite']['answers']:
+        raise SystemExit('Backends returned different query results')
+
+    print(f"{args.escrows} escrows, {args.queries} queries each; latencies are p50/p99 ms")
+    print(f"{'store':<7} {'writes/s':>9} {'get':>15} {'open for seller':>17} {'awaiting deposit':>17}")
+    for name, result in results.items():
+        cells = [f'{p50:.3f}/{p99:.3f}' for p50, p99 in
+                 (result['get'], result['open for seller'], result['awaiting deposit'])]
+        print(f"{name:<7} {result['writes/s']:>9.0f} {cells[0]:>15} {cells[1]:>17} {cells[2]:>17}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Async (ASGI) serving mode for the escrow service.
+
+Serves the same routes as escrow_server.py. Releases await their bank call
+instead of holding a thread, so one process can keep thousands in flight,
+and /events long-polls park on the event loop. Every other route runs the
+Flask view itself on a thread pool.
+
+    uvicorn escrow_asgi:app --port 5001
+"""
+from typing import Dict
+
+import escrow_server
+from bank_client import AsyncBankClient
+from escrow_engine import Escrow, EscrowError
+from escrow_server import (EVENT_STREAM_PORT, LOAN_PROCESSING_URL, bank_client, bank_events, bank_latency, engine, events,
+                           finalize_release, record_release_timings, release_checks, release_request, release_response,
+                           release_verifier, request_latency)
+
+from common.asgi import AsyncApp, LogWaiter, Request
+from common.event_log import poll_params
+from common.event_stream import EventStreamServer
+
+app = AsyncApp(escrow_server.app, observe=request_latency.observe, capture=escrow_server.traffic_capture)
+async_bank_client = AsyncBankClient(LOAN_PROCESSING_URL, bank_client.cache, observe=bank_latency.observe)
+event_waiter = LogWaiter(events)
+
+
+async def verify_release(escrow: Escrow, timings: Dict[str, dict]):
+    await release_verifier.verify_async(release_checks(escrow, async_bank_client.is_loan_approved), timings)
+    finalize_release(escrow, timings)
+
+
+@app.route('/release_funds', methods=('POST',))
+async def release_funds(request: Request):
+    property_id, error = release_request(request.json, request.headers.get('X-Agent-Key'))
+    if error:
+        return error
+
+    timings: Dict[str, dict] = {}  # per-check outcome and milliseconds
+    try:
+        outcome = await engine.release_async(property_id, lambda escrow: verify_release(escrow, timings))
+    except EscrowError as e:
+        outcome = e
+    finally:
+        record_release_timings(timings)
+
+    return release_response(outcome, timings)
+
+
+@app.route('/events')
+async def poll_events(request: Request):
+    cursor, timeout, limit = poll_params(request.args)
+    new_events, cursor, truncated = await event_waiter.wait(cursor, timeout, limit)
+    return {'events': new_events, 'cursor': cursor, 'truncated': truncated}, 200
+
+
+def start_event_stream():
+    if bank_events is not None:
+        bank_events.start()
+    if EVENT_STREAM_PORT:
+        EventStreamServer(events, port=EVENT_STREAM_PORT).start()
+
+
+app.on_startup.append(start_event_stream)
+app.on_shutdown.append(async_bank_client.close)
+app.on_shutdown.append(release_verifier.close)
+if escrow_server.traffic_capture is not None:
+    app.on_shutdown.append(escrow_server.traffic_capture.close)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, port=5001)
@@ -0,0 +1,187 @@
+import threading
+from dataclasses import dataclass, replace
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+DEFAULT_STRIPES = 256
+
+
+@dataclass
+class Escrow:
+    buyer: str
+    seller: str
+    property_id: int
+    amount: float
+    funds_deposited: bool
+    completed: bool
+
+
+class EscrowError(Exception):
+    """Rejected escrow transition, carrying the HTTP status to answer with"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class StripedLock:
+    """Fixed pool of locks; a key always maps to the same lock"""
+
+    def __init__(self, stripes: int = DEFAULT_STRIPES):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def __call__(self, key: Hashable) -> threading.Lock:
+        return self._locks[hash(key) % len(self._locks)]
+
+
+class EscrowEngine:
+    """Escrow state transitions over an escrow store (see escrow_store.py).
+
+    Transitions on one property are serialized by that property's lock
+    stripe while other properties proceed in parallel. Balances are
+    updated under a separate per-address stripe, since one buyer can have
+    escrows on several properties. Each property also has a version counter,
+    bumped by every transition, that lets callers cache derived views.
+    ``on_event(name, escrow)`` is called after each transition while the
+    property's lock is still held, so one property's events arrive in order.
+    A transition's writes (escrow and balance) go to the store in one
+    transaction. Releases run their checks without holding the lock: the
+    property is marked as settling instead, and a release or refund that
+    arrives meanwhile is rejected with 409 rather than queued.
+    """
+
+    def __init__(self, store, stripes: int = DEFAULT_STRIPES,
+                 on_event: Optional[Callable[[str, Escrow], None]] = None):
+        self.store = store
+        self.on_event = on_event
+        self.property_lock = StripedLock(stripes)
+        self.balance_lock = StripedLock(stripes)
+        self.versions: Dict[int, int] = {}
+        self.settling: Set[int] = set()  # properties whose release is awaiting its checks
+
+    def _transitioned(self, event: str, escrow: Escrow):
+        # Called with the property's lock held
+        self.versions[escrow.property_id] = self.versions.get(escrow.property_id, 0) + 1
+        if self.on_event is not None:
+            self.on_event(event, replace(escrow))
+
+    def adjust_balance(self, address: str, delta: float) -> float:
+        with self.balance_lock(address):
+            return self.store.add_balance(address, delta)
+
+    def get(self, property_id: int) -> Optional[Escrow]:
+        """Consistent copy of an escrow, or None"""
+        return self.get_versioned(property_id)[0]
+
+    def get_versioned(self, property_id: int) -> Tuple[Optional[Escrow], int]:
+        """Consistent copy of an escrow (or None) together with its version"""
+        with self.property_lock(property_id):
+            escrow = self.store.get(property_id)
+            version = self.versions.get(property_id, 0)
+            return (replace(escrow) if escrow is not None else None), version
+
+    def state_counts(self) -> Dict[str, int]:
+        """Number of escrows awaiting a deposit, funded, and completed (released or refunded)"""
+        return self.store.state_counts()
+
+    def find(self, buyer: Optional[str] = None, seller: Optional[str] = None, state: Optional[str] = None,
+             after: int = 0, limit: int = 100) -> List[Escrow]:
+        """Escrows matching every given filter, in property id order after ``after``"""
+        return self.store.find(buyer, seller, state, after, limit)
+
+    def create(self, buyer: str, seller: str, property_id: int, amount: float) -> Escrow:
+        with self.property_lock(property_id):
+            existing = self.store.get(property_id)
+            if existing is not None and existing.funds_deposited:
+                raise EscrowError('Escrow already exists for this property')
+            escrow = Escrow(
+                buyer=buyer,
+                seller=seller,
+                property_id=property_id,
+                amount=amount,
+                funds_deposited=False,
+                completed=False
+            )
+            self.store.put(escrow)
+            self._transitioned('EscrowCreated', escrow)
+            return replace(escrow)
+
+    def deposit(self, property_id: int, buyer: str, amount: float) -> Escrow:
+        with self.property_lock(property_id):
+            escrow = self.store.get(property_id)
+            if escrow is None:
+                raise EscrowError('Escrow not found', 404)
+            if buyer != escrow.buyer:
+                raise EscrowError('Only buyer can deposit funds', 401)
+            if escrow.funds_deposited:
+                raise EscrowError('Funds already deposited')
+            if amount != escrow.amount:
+                raise EscrowError('Incorrect deposit amount')
+
+            with self.store.transaction():
+                self.adjust_balance(buyer, amount)
+                escrow.funds_deposited = True
+                self.store.put(escrow)
+            self._transitioned('DepositFunds', escrow)
+            return replace(escrow)
+
+    def _settleable(self, property_id: int) -> Escrow:
+        # Called with the property's lock held
+        escrow = self.store.get(property_id)
+        if escrow is None:
+            raise EscrowError('Escrow not found', 404)
+        if not escrow.funds_deposited:
+            raise EscrowError('Funds not yet deposited')
+        if escrow.completed:
+            raise EscrowError('Transaction already completed')
+        if property_id in self.settling:
+            raise EscrowError('Release already in progress', 409)
+        return escrow
+
+    def _complete(self, escrow: Escrow, event: str) -> Escrow:
+        # Called with the property's lock held
+        with self.store.transaction():
+            self.adjust_balance(escrow.buyer, -escrow.amount)
+            escrow.completed = True
+            self.store.put(escrow)
+        self._transitioned(event, escrow)
+        return replace(escrow)
+
+    def _start_settling(self, property_id: int) -> Escrow:
+        with self.property_lock(property_id):
+            escrow = replace(self._settleable(property_id))
+            self.settling.add(property_id)
+            return escrow
+
+    def _stop_settling(self, property_id: int):
+        with self.property_lock(property_id):
+            self.settling.discard(property_id)
+
+    def _finish_settling(self, property_id: int, event: str) -> Escrow:
+        with self.property_lock(property_id):
+            self.settling.discard(property_id)
+            return self._complete(self.store.get(property_id), event)
+
+    def release(self, property_id: int, verify: Callable[[Escrow], None]) -> Escrow:
+        """Release funds to the seller once ``verify`` accepts (it raises EscrowError to reject)"""
+        escrow = self._start_settling(property_id)
+        try:
+            verify(escrow)
+        except BaseException:
+            self._stop_settling(property_id)
+            raise
+        return self._finish_settling(property_id, 'ReleaseFunds')
+
+    async def release_async(self, property_id: int, verify: Callable[[Escrow], Awaitable[None]]) -> Escrow:
+        """Like release, but awaits ``verify`` so the event loop is free during remote calls"""
+        escrow = self._start_settling(property_id)
+        try:
+            await verify(escrow)
+        except BaseException:
+            self._stop_settling(property_id)
+            raise
+        return self._finish_settling(property_id, 'ReleaseFunds')
+
+    def refund(self, property_id: int) -> Escrow:
+        with self.property_lock(property_id):
+            return self._complete(self._settleable(property_id), 'RefundFunds')
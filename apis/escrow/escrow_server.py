@@ -1,7 +1,19 @@
 from flask import Flask, request, jsonify
-from dataclasses import dataclass
-from typing import Dict
-import requests
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+import os
+import sys
+import time
+from bank_client import BankClient, LoanEventFollower
+from escrow_engine import Escrow, EscrowEngine, EscrowError
+from escrow_store import STATES, MemoryEscrowStore, SQLiteEscrowStore
+from release_checks import Check, ReleaseVerifier
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.event_log import EventLog, poll_params
+from common.event_stream import EventStreamServer
+from common.metrics import PROMETHEUS_CONTENT_TYPE, Registry, instrument, status_cache_metrics
+from common.status_cache import StatusCache
+from common.traffic_capture import TrafficCapture
 
 app = Flask(__name__)
 
@@ -10,20 +22,63 @@ ESCROW_AGENT = "0x5a1b2c3d4e5f6a7b8c9d0e1f2a3b4c5d6e7f8a9b"
 REAL_ESTATE_TOKEN = "0x2a3b4c5d6e7f8a9b0c1d2e3f4a5b6c7d8e9f0a1"
 PROPERTY_TRANSFER = "0x3b4c5d6e7f8a9b0c1d2e3f4a5b6c7d8e9f0a1b2"
 LOAN_PROCESSING_URL = "http://localhost:5000"  # URL of the loan processing service
-
-@dataclass
-class Escrow:
-    buyer: str
-    seller: str
-    property_id: int
-    amount: float
-    funds_deposited: bool
-    completed: bool
+BANK_EVENTS_URL = os.getenv('BANK_EVENTS_URL', 'http://localhost:5002/events')  # its loan event stream; '' for none
+
+# Operational metrics, scraped from /metrics
+metrics = Registry()
+request_latency = instrument(app, metrics, 'escrow')
+bank_latency = metrics.histogram('escrow_bank_request_duration_seconds',
+                                 'Loan status calls to the bank service, by HTTP status', ('status',))
+release_check_latency = metrics.histogram('escrow_release_check_duration_seconds',
+                                          'Release verification checks, by check and result', ('check', 'result'))
+
+bank_client = BankClient(LOAN_PROCESSING_URL, observe=bank_latency.observe)
+metrics.collected_counter('escrow_loan_approval_cache_lookups_total', 'Loan approval lookups by cache outcome',
+                          ('result',), lambda: {('hit',): bank_client.cache.hits, ('miss',): bank_client.cache.misses})
+# Cached approvals are only used while this follower hears about every loan change on the bank
+bank_events = LoanEventFollower(BANK_EVENTS_URL, bank_client.cache) if BANK_EVENTS_URL else None
+metrics.gauge('escrow_bank_events_connected', 'Whether the bank loan event stream is connected', (),
+              lambda: {(): int(bank_client.cache.live)})
 
 # Simulated blockchain state
 escrows: Dict[int, Escrow] = {}  # propertyId -> Escrow
 balances: Dict[str, float] = {}  # address -> balance
 
+# Escrow storage: the dicts above by default, or a SQLite database (WAL) with buyer, seller and state indexes
+ESCROW_DB = os.getenv('ESCROW_DB')
+store = SQLiteEscrowStore(ESCROW_DB) if ESCROW_DB else MemoryEscrowStore(escrows, balances)
+
+# Recent escrow events for subscribers; streamed over SSE on EVENT_STREAM_PORT, or long-polled at /events
+events = EventLog(int(os.getenv('EVENT_LOG_CAPACITY', '10000')))
+EVENT_STREAM_PORT = int(os.getenv('EVENT_STREAM_PORT', '5003'))
+
+def publish_event(event: str, escrow: Escrow):
+    escrow_events.inc(event)
+    events.publish(event, property_id=escrow.property_id, buyer=escrow.buyer, seller=escrow.seller,
+                   amount=escrow.amount, funds_deposited=escrow.funds_deposited, completed=escrow.completed)
+
+# Serializes transitions per property so the server can run multi-threaded
+engine = EscrowEngine(store, on_event=publish_event)
+status_cache = StatusCache()  # serialized /escrow_status bodies, keyed by property and escrow version
+release_verifier = ReleaseVerifier()  # runs the independent release checks in parallel under one deadline
+
+escrow_events = metrics.counter('escrow_events_total', 'Escrow lifecycle events published', ('event',))
+metrics.gauge('escrow_escrows', 'Escrows by state', ('state',),
+              lambda: {(state,): count for state, count in engine.state_counts().items()})
+status_cache_metrics(metrics, 'escrow', status_cache.report)
+
+# Request capture for replay_traffic.py, enabled by pointing TRAFFIC_CAPTURE_DIR at a directory
+TRAFFIC_CAPTURE_DIR = os.getenv('TRAFFIC_CAPTURE_DIR')
+traffic_capture: Optional[TrafficCapture] = None
+if TRAFFIC_CAPTURE_DIR:
+    traffic_capture = TrafficCapture(TRAFFIC_CAPTURE_DIR, 'escrow',
+                                     max_bytes=int(float(os.getenv('TRAFFIC_CAPTURE_MAX_MB', '64')) * 1024 * 1024),
+                                     backups=int(os.getenv('TRAFFIC_CAPTURE_BACKUPS', '5')))
+    traffic_capture.install(app)
+    metrics.collected_counter('escrow_captured_requests_total', 'Requests written to the traffic capture, or dropped',
+                              ('result',), lambda: {('written',): traffic_capture.captured,
+                                                    ('dropped',): traffic_capture.dropped})
+
 # Mock interfaces
 def verify_ownership(owner: str, property_id: int) -> bool:
     # Mock implementation - in real world, this would call the RealEstateToken contract
@@ -31,19 +86,40 @@ def verify_ownership(owner: str, property_id: int) -> bool:
     return property_id % 2 == 0
 
 def check_loan_approval(buyer: str) -> bool:
-    # Call the loan processing service
-    try:
-        response = requests.get(f"{LOAN_PROCESSING_URL}/loan_status/{buyer}")
-        if response.status_code == 200:
-            return response.json()['is_approved']
-        return False
-    except:
-        return False
+    # Call the loan processing service (pooled, timeout-bounded; approvals briefly cached while bank_events is live)
+    return bank_client.is_loan_approved(buyer)
+
+def check_title_clearance(property_id: int) -> bool:
+    # Mock implementation - in real world, this would query the title registry for liens
+    return True
 
 def finalize_transfer(buyer: str, seller: str, property_id: int) -> bool:
     # Mock implementation - in real world, this would call the PropertyTransfer contract
     return True
 
+def release_checks(escrow: Escrow, check_loan: Optional[Callable] = None) -> List[Check]:
+    # Ownership, loan approval and title clearance are independent, so they run concurrently.
+    # The async serving mode passes a non-blocking loan check.
+    check_loan = check_loan or check_loan_approval
+    return [
+        ('ownership', lambda: verify_ownership(escrow.seller, escrow.property_id), 'Seller does not own the property'),
+        ('loan_approval', lambda: check_loan(escrow.buyer), 'Loan not approved'),
+        ('title_clearance', lambda: check_title_clearance(escrow.property_id), 'Property title is not clear'),
+    ]
+
+def verify_release(escrow: Escrow, timings: Dict[str, dict]):
+    release_verifier.verify(release_checks(escrow), timings)
+    finalize_release(escrow, timings)
+
+def finalize_release(escrow: Escrow, timings: Dict[str, dict]):
+    # The transfer depends on every check passing
+    start = time.perf_counter()
+    transferred = finalize_transfer(escrow.buyer, escrow.seller, escrow.property_id)
+    timings['transfer'] = {'result': 'passed' if transferred else 'rejected',
+                           'ms': round(1000 * (time.perf_counter() - start), 2)}
+    if not transferred:
+        raise EscrowError('Property transfer failed', 500)
+
 @app.route('/create_escrow', methods=['POST'])
 def create_escrow():
     data = request.json
@@ -60,17 +136,11 @@ def create_escrow():
     if not all([buyer, seller, property_id, amount]):
         return jsonify({'error': 'Missing required parameters'}), 400
 
-    if property_id in escrows and escrows[property_id].funds_deposited:
-        return jsonify({'error': 'Escrow already exists for this property'}), 400
-
-    escrows[property_id] = Escrow(
-        buyer=buyer,
-        seller=seller,
-        property_id=property_id,
-        amount=amount,
-        funds_deposited=False,
-        completed=False
-    )
+    try:
+        engine.create(buyer, seller, property_id, amount)
+    except EscrowError as e:
+        return jsonify({'error': e.message}), e.status
+    bank_client.invalidate(buyer)
 
     return jsonify({
         'status': 'success',
@@ -90,22 +160,10 @@ def deposit_funds():
     amount = data.get('amount')
     buyer = request.headers.get('X-Buyer-Address')
 
-    if property_id not in escrows:
-        return jsonify({'error': 'Escrow not found'}), 404
-
-    escrow = escrows[property_id]
-    
-    if buyer != escrow.buyer:
-        return jsonify({'error': 'Only buyer can deposit funds'}), 401
-
-    if escrow.funds_deposited:
-        return jsonify({'error': 'Funds already deposited'}), 400
-
-    if amount != escrow.amount:
-        return jsonify({'error': 'Incorrect deposit amount'}), 400
-
-    balances[buyer] = balances.get(buyer, 0) + amount
-    escrow.funds_deposited = True
+    try:
+        engine.deposit(property_id, buyer, amount)
+    except EscrowError as e:
+        return jsonify({'error': e.message}), e.status
 
     return jsonify({
         'status': 'success',
@@ -117,47 +175,53 @@ def deposit_funds():
 
 @app.route('/release_funds', methods=['POST'])
 def release_funds():
-    data = request.json
-    agent_key = request.headers.get('X-Agent-Key')
-    property_id = data.get('property_id')
-
-    if not agent_key or agent_key != ESCROW_AGENT:
-        return jsonify({'error': 'Unauthorized access'}), 401
-
-    if property_id not in escrows:
-        return jsonify({'error': 'Escrow not found'}), 404
-
-    escrow = escrows[property_id]
+    property_id, error = release_request(request.get_json(silent=True), request.headers.get('X-Agent-Key'))
+    if error:
+        return jsonify(error[0]), error[1]
 
-    if not escrow.funds_deposited:
-        return jsonify({'error': 'Funds not yet deposited'}), 400
-
-    if escrow.completed:
-        return jsonify({'error': 'Transaction already completed'}), 400
-
-    # Verify ownership and loan approval
-    if not verify_ownership(escrow.seller, property_id):
-        return jsonify({'error': 'Seller does not own the property'}), 400
+    timings: Dict[str, dict] = {}  # per-check outcome and milliseconds
+    try:
+        outcome = engine.release(property_id, lambda escrow: verify_release(escrow, timings))
+    except EscrowError as e:
+        outcome = e
+    finally:
+        record_release_timings(timings)
 
-    if not check_loan_approval(escrow.buyer):
-        return jsonify({'error': 'Loan not approved'}), 400
+    body, status = release_response(outcome, timings)
+    return jsonify(body), status
 
-    # Finalize transfer
-    if not finalize_transfer(escrow.buyer, escrow.seller, property_id):
-        return jsonify({'error': 'Property transfer failed'}), 500
+# The release request and response, shared with the async serving mode in escrow_asgi.py
 
-    # Transfer funds
-    balances[escrow.buyer] -= escrow.amount
-    escrow.completed = True
+def release_request(data: Any, agent_key: Optional[str]) -> Tuple[Any, Optional[Tuple[dict, int]]]:
+    """The property to release, or the error response"""
+    if not agent_key or agent_key != ESCROW_AGENT:
+        return None, ({'error': 'Unauthorized access'}, 401)
+    if not isinstance(data, dict):
+        return None, ({'error': 'Request body must be a JSON object'}, 400)
+    return data.get('property_id'), None
+
+def release_response(outcome: Union[Escrow, EscrowError], timings: Dict[str, dict]) -> Tuple[dict, int]:
+    if isinstance(outcome, EscrowError):
+        return {'error': outcome.message, 'checks': timings}, outcome.status
+    return released(outcome, timings), 200
+
+def record_release_timings(timings: Dict[str, dict]):
+    for check, timing in timings.items():
+        if timing['ms'] is not None:
+            release_check_latency.observe(timing['ms'] / 1000, check, timing['result'])
+
+def released(escrow: Escrow, timings: Dict[str, dict]) -> dict:
+    bank_client.invalidate(escrow.buyer)
     # In a real implementation, this would trigger actual fund transfer
-    
-    return jsonify({
+
+    return {
         'status': 'success',
         'event': 'ReleaseFunds',
         'seller': escrow.seller,
         'amount': escrow.amount,
-        'property_id': property_id
-    })
+        'property_id': escrow.property_id,
+        'checks': timings
+    }
 
 @app.route('/refund_funds', methods=['POST'])
 def refund_funds():
@@ -168,20 +232,11 @@ def refund_funds():
     if not agent_key or agent_key != ESCROW_AGENT:
         return jsonify({'error': 'Unauthorized access'}), 401
 
-    if property_id not in escrows:
-        return jsonify({'error': 'Escrow not found'}), 404
-
-    escrow = escrows[property_id]
-
-    if not escrow.funds_deposited:
-        return jsonify({'error': 'Funds not yet deposited'}), 400
-
-    if escrow.completed:
-        return jsonify({'error': 'Transaction already completed'}), 400
-
-    # Process refund
-    balances[escrow.buyer] -= escrow.amount
-    escrow.completed = True
+    try:
+        escrow = engine.refund(property_id)
+    except EscrowError as e:
+        return jsonify({'error': e.message}), e.status
+    bank_client.invalidate(escrow.buyer)
     # In a real implementation, this would trigger actual fund transfer
 
     return jsonify({
@@ -192,20 +247,113 @@ def refund_funds():
         'property_id': property_id
     })
 
-@app.route('/escrow_status/<int:property_id>', methods=['GET'])
-def escrow_status(property_id):
-    if property_id not in escrows:
-        return jsonify({'error': 'Escrow not found'}), 404
+@app.route('/invalidate_loan_cache', methods=['POST'])
+def invalidate_loan_cache():
+    # Called when a buyer's loan approval changes on the bank side
+    data = request.json or {}
+    agent_key = request.headers.get('X-Agent-Key')
+    buyer = data.get('buyer')
+
+    if not agent_key or agent_key != ESCROW_AGENT:
+        return jsonify({'error': 'Unauthorized access'}), 401
+
+    bank_client.invalidate(buyer)
 
-    escrow = escrows[property_id]
     return jsonify({
+        'status': 'success',
+        'message': 'Loan approval cache invalidated',
+        'buyer': buyer
+    })
+
+def escrow_status_payload(escrow: Escrow) -> dict:
+    return {
         'buyer': escrow.buyer,
         'seller': escrow.seller,
         'property_id': escrow.property_id,
         'amount': escrow.amount,
         'funds_deposited': escrow.funds_deposited,
         'completed': escrow.completed
+    }
+
+@app.route('/escrow_status/<int:property_id>', methods=['GET'])
+def escrow_status(property_id):
+    escrow, version = engine.get_versioned(property_id)
+    if escrow is None:
+        return jsonify({'error': 'Escrow not found'}), 404
+
+    return status_cache.respond(property_id, version, lambda: escrow_status_payload(escrow))
+
+MAX_BULK_LOOKUPS = 1000
+
+@app.route('/escrow_statuses', methods=['POST'])
+def escrow_statuses():
+    # Bulk /escrow_status: found escrows keyed by property id, plus the ids with no escrow
+    data = request.json
+    property_ids = data.get('property_ids') if isinstance(data, dict) else None
+
+    if not isinstance(property_ids, list) or not property_ids:
+        return jsonify({'error': 'Missing required parameters'}), 400
+
+    if not all(isinstance(property_id, int) and not isinstance(property_id, bool) for property_id in property_ids):
+        return jsonify({'error': 'Invalid property id'}), 400
+
+    property_ids = list(dict.fromkeys(property_ids))  # Drop repeats, keep order
+    if len(property_ids) > MAX_BULK_LOOKUPS:
+        return jsonify({'error': f'Lookup exceeds {MAX_BULK_LOOKUPS} properties'}), 400
+
+    found = {}
+    missing = []
+    for property_id in property_ids:
+        escrow = engine.get(property_id)
+        if escrow is None:
+            missing.append(property_id)
+        else:
+            found[str(property_id)] = escrow_status_payload(escrow)
+
+    return jsonify({'escrows': found, 'missing': missing})
+
+MAX_QUERY_LIMIT = 1000
+
+@app.route('/escrows', methods=['GET'])
+def query_escrows():
+    # e.g. /escrows?seller=0x..&state=open or /escrows?state=awaiting_deposit; page on with after=<next_after>
+    buyer = request.args.get('buyer')
+    seller = request.args.get('seller')
+    state = request.args.get('state')
+    after = request.args.get('after', 0, type=int)
+    limit = request.args.get('limit', 100, type=int)
+
+    if state is not None and state not in STATES:
+        return jsonify({'error': f"state must be one of {', '.join(STATES)}"}), 400
+
+    if not 1 <= limit <= MAX_QUERY_LIMIT:
+        return jsonify({'error': f'limit must be between 1 and {MAX_QUERY_LIMIT}'}), 400
+
+    found = engine.find(buyer, seller, state, after, limit)
+    return jsonify({
+        'escrows': [escrow_status_payload(escrow) for escrow in found],
+        'next_after': found[-1].property_id if len(found) == limit else None
     })
 
+@app.route('/events', methods=['GET'])
+def poll_events():
+    # Long-poll: waits up to `timeout` seconds for events after `cursor`
+    cursor, timeout, limit = poll_params(request.args)
+
+    new_events, cursor, truncated = events.wait(cursor, timeout, limit)
+    return jsonify({'events': new_events, 'cursor': cursor, 'truncated': truncated})
+
+@app.route('/status_cache_stats', methods=['GET'])
+def status_cache_stats():
+    return jsonify(status_cache.report())
+
+@app.route('/metrics', methods=['GET'])
+def scrape_metrics():
+    return app.response_class(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
 if __name__ == '__main__':
+    if bank_events is not None:
+        bank_events.start()
+    if EVENT_STREAM_PORT:
+        EventStreamServer(events, port=EVENT_STREAM_PORT).start()
     app.run(port=5001)  # Run on port 5001 to avoid conflict with loan processing service
\ No newline at end of file
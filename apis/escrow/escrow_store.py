@@ -0,0 +1,234 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager, nullcontext
+from dataclasses import replace
+from typing import Dict, Iterator, List, Optional
+
+from escrow_engine import Escrow
+
+# Filters accepted by find(); 'open' is anything not yet completed
+STATES = ('open', 'awaiting_deposit', 'funded', 'completed')
+
+
+def escrow_state(escrow: Escrow) -> str:
+    if escrow.completed:
+        return 'completed'
+    return 'funded' if escrow.funds_deposited else 'awaiting_deposit'
+
+
+class MemoryEscrowStore:
+    """Escrows and balances in plain dicts, keyed by property id and address.
+
+    Only property ids are indexed, so find() scans every escrow. get()
+    returns the stored object itself; the engine mutates it under the
+    property's lock and then calls put().
+    """
+
+    def __init__(self, escrows: Dict[int, Escrow], balances: Dict[str, float]):
+        self.escrows = escrows
+        self.balances = balances
+
+    def transaction(self):
+        return nullcontext()
+
+    def get(self, property_id: int) -> Optional[Escrow]:
+        return self.escrows.get(property_id)
+
+    def put(self, escrow: Escrow):
+        self.escrows[escrow.property_id] = escrow
+
+    def add_balance(self, address: str, delta: float) -> float:
+        # The engine serializes calls per address
+        balance = self.balances.get(address, 0) + delta
+        self.balances[address] = balance
+        return balance
+
+    def balance(self, address: str) -> float:
+        return self.balances.get(address, 0)
+
+    def find(self, buyer: Optional[str] = None, seller: Optional[str] = None, state: Optional[str] = None,
+             after: int = 0, limit: int = 100) -> List[Escrow]:
+        matches = [escrow for escrow in list(self.escrows.values())
+                   if escrow.property_id > after
+                   and (buyer is None or escrow.buyer == buyer)
+                   and (seller is None or escrow.seller == seller)
+                   and (state is None or state == escrow_state(escrow)
+                        or (state == 'open' and not escrow.completed))]
+        matches.sort(key=lambda escrow: escrow.property_id)
+        return [replace(escrow) for escrow in matches[:limit]]
+
+    def state_counts(self) -> Dict[str, int]:
+        counts = {'awaiting_deposit': 0, 'funded': 0, 'completed': 0}
+        for escrow in list(self.escrows.values()):
+            counts[escrow_state(escrow)] += 1
+        return counts
+
+    def __len__(self) -> int:
+        return len(self.escrows)
+
+    def clear(self):
+        """Delete every escrow and balance (for tests and benchmarks)"""
+        self.escrows.clear()
+        self.balances.clear()
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS escrows (
+    property_id INTEGER PRIMARY KEY,
+    buyer TEXT NOT NULL,
+    seller TEXT NOT NULL,
+    amount NUMERIC NOT NULL,
+    funds_deposited INTEGER NOT NULL,
+    completed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS escrows_by_buyer ON escrows (buyer, completed);
+CREATE INDEX IF NOT EXISTS escrows_by_seller ON escrows (seller, completed);
+CREATE INDEX IF NOT EXISTS escrows_by_state ON escrows (completed, funds_deposited);
+CREATE TABLE IF NOT EXISTS balances (
+    address TEXT PRIMARY KEY,
+    balance NUMERIC NOT NULL
+) WITHOUT ROWID;
+'''
+
+# state -> SQL condition; each is a prefix of escrows_by_state (or, with a buyer or seller, of their index)
+STATE_CONDITIONS = {
+    'open': 'completed = 0',
+    'awaiting_deposit': 'completed = 0 AND funds_deposited = 0',
+    'funded': 'completed = 0 AND funds_deposited = 1',
+    'completed': 'completed = 1',
+}
+
+COLUMNS = 'buyer, seller, property_id, amount, funds_deposited, completed'
+
+
+def _escrow(row) -> Escrow:
+    buyer, seller, property_id, amount, funds_deposited, completed = row
+    return Escrow(buyer, seller, property_id, amount, bool(funds_deposited), bool(completed))
+
+
+class SQLiteEscrowStore:
+    """Escrows and balances in an embedded SQLite database in WAL mode.
+
+    Secondary indexes on buyer, seller and completion state let find()
+    answer "open escrows for this seller" or "escrows awaiting deposit"
+    without a scan. Connections are pooled and handed to one thread at a
+    time; a transition's writes share one transaction through
+    transaction(). WAL lets readers proceed while a write commits, and
+    synchronous=NORMAL syncs at checkpoints rather than on every commit.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._pool: 'queue.SimpleQueue[sqlite3.Connection]' = queue.SimpleQueue()
+        self._local = threading.local()  # connection of the transaction open on this thread
+        with self._connection() as connection:
+            connection.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit; transaction() issues BEGIN/COMMIT itself
+        connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        current = getattr(self._local, 'connection', None)
+        if current is not None:
+            yield current
+            return
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        try:
+            yield connection
+        finally:
+            self._pool.put(connection)
+
+    @contextmanager
+    def transaction(self):
+        if getattr(self._local, 'connection', None) is not None:
+            yield  # Already inside one
+            return
+        with self._connection() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            self._local.connection = connection
+            try:
+                yield
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            else:
+                connection.execute('COMMIT')
+            finally:
+                self._local.connection = None
+
+    def get(self, property_id: int) -> Optional[Escrow]:
+        with self._connection() as connection:
+            row = connection.execute(f'SELECT {COLUMNS} FROM escrows WHERE property_id = ?', (property_id,)).fetchone()
+        return _escrow(row) if row is not None else None
+
+    def put(self, escrow: Escrow):
+        with self._connection() as connection:
+            connection.execute(f'INSERT OR REPLACE INTO escrows ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)', (
+                escrow.buyer, escrow.seller, escrow.property_id, escrow.amount,
+                int(escrow.funds_deposited), int(escrow.completed)))
+
+    def add_balance(self, address: str, delta: float) -> float:
+        with self._connection() as connection:
+            return connection.execute(
+                'INSERT INTO balances (address, balance) VALUES (?, ?) '
+                'ON CONFLICT (address) DO UPDATE SET balance = balance + excluded.balance RETURNING balance',
+                (address, delta)).fetchall()[0][0]  # Stepped to the end, so the write completes
+
+    def balance(self, address: str) -> float:
+        with self._connection() as connection:
+            row = connection.execute('SELECT balance FROM balances WHERE address = ?', (address,)).fetchone()
+        return row[0] if row is not None else 0
+
+    def find(self, buyer: Optional[str] = None, seller: Optional[str] = None, state: Optional[str] = None,
+             after: int = 0, limit: int = 100) -> List[Escrow]:
+        conditions = ['property_id > ?']
+        params: list = [after]
+        if buyer is not None:
+            conditions.append('buyer = ?')
+            params.append(buyer)
+        if seller is not None:
+            conditions.append('seller = ?')
+            params.append(seller)
+        if state is not None:
+            conditions.append(STATE_CONDITIONS[state])
+        params.append(limit)
+        with self._connection() as connection:
+            rows = connection.execute(f'SELECT {COLUMNS} FROM escrows WHERE {" AND ".join(conditions)} '
+                                      'ORDER BY property_id LIMIT ?', params).fetchall()
+        return [_escrow(row) for row in rows]
+
+    def state_counts(self) -> Dict[str, int]:
+        counts = {'awaiting_deposit': 0, 'funded': 0, 'completed': 0}
+        with self._connection() as connection:
+            # Answered from escrows_by_state alone
+            for completed, funds_deposited, count in connection.execute(
+                    'SELECT completed, funds_deposited, COUNT(*) FROM escrows GROUP BY completed, funds_deposited'):
+                state = 'completed' if completed else ('funded' if funds_deposited else 'awaiting_deposit')
+                counts[state] += count
+        return counts
+
+    def __len__(self) -> int:
+        with self._connection() as connection:
+            return connection.execute('SELECT COUNT(*) FROM escrows').fetchone()[0]
+
+    def clear(self):
+        """Delete every escrow and balance (for tests and benchmarks)"""
+        with self.transaction(), self._connection() as connection:
+            connection.execute('DELETE FROM escrows')
+            connection.execute('DELETE FROM balances')
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
@@ -0,0 +1,116 @@
+import asyncio
+import concurrent.futures
+import inspect
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from escrow_engine import EscrowError
+
+# Verification settings, overridable from the environment
+RELEASE_CHECK_DEADLINE = float(os.getenv('RELEASE_CHECK_DEADLINE', '3.0'))  # seconds for all checks together
+RELEASE_CHECK_WORKERS = int(os.getenv('RELEASE_CHECK_WORKERS', '32'))
+
+# (name, check, message when the check returns False)
+Check = Tuple[str, Callable[[], bool], str]
+Future = Union[concurrent.futures.Future, asyncio.Future]
+
+
+def _outcome(result) -> str:
+    return 'passed' if result else 'rejected'
+
+
+def _timed(check: Callable[[], bool]) -> Tuple[str, float]:
+    start = time.perf_counter()
+    try:
+        result = _outcome(check())
+    except Exception:
+        result = 'error'
+    return result, 1000 * (time.perf_counter() - start)
+
+
+async def _timed_async(check: Callable) -> Tuple[str, float]:
+    start = time.perf_counter()
+    try:
+        result = check()
+        if inspect.isawaitable(result):
+            result = await result
+        result = _outcome(result)
+    except Exception:
+        result = 'error'
+    return result, 1000 * (time.perf_counter() - start)
+
+
+def _record(done, futures: Dict[Future, Tuple[str, str]], timings: Dict[str, dict]) -> Optional[EscrowError]:
+    # Times every finished check and returns the first failure among them, if any
+    failure = None
+    for future in done:
+        name, rejection = futures[future]
+        result, ms = future.result()
+        timings[name] = {'result': result, 'ms': round(ms, 2)}
+        if result == 'rejected' and failure is None:
+            failure = EscrowError(rejection)
+        elif result == 'error' and failure is None:
+            failure = EscrowError(f'Could not complete {name} check', 502)
+    return failure
+
+
+class ReleaseVerifier:
+    """Runs independent release checks in parallel under one overall deadline.
+
+    The first rejection fails the release at once; checks that have not
+    started yet are cancelled, and ones already waiting on a remote call are
+    left to finish in the background with their result discarded. Each
+    check's outcome and duration in milliseconds is written to ``timings``.
+    """
+
+    def __init__(self, workers: int = RELEASE_CHECK_WORKERS, deadline: float = RELEASE_CHECK_DEADLINE):
+        self.deadline = deadline
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='release-check')
+
+    def verify(self, checks: List[Check], timings: Dict[str, dict]):
+        deadline_at = time.perf_counter() + self.deadline
+        futures = {self.executor.submit(_timed, check): (name, rejection) for name, check, rejection in checks}
+        pending = set(futures)
+        outcome = 'cancelled'
+        try:
+            while pending:
+                remaining = deadline_at - time.perf_counter()
+                if remaining <= 0:
+                    outcome = 'timed_out'
+                    raise EscrowError('Release verification timed out', 504)
+                done, pending = concurrent.futures.wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                failure = _record(done, futures, timings)
+                if failure is not None:
+                    raise failure
+        finally:
+            for future in pending:
+                future.cancel()
+                timings[futures[future][0]] = {'result': outcome, 'ms': None}
+
+    async def verify_async(self, checks: List[Check], timings: Dict[str, dict]):
+        """Like verify, on the running event loop: a check may return an awaitable, and
+        checks still pending after a rejection or the deadline are cancelled outright.
+        Checks that return a plain bool run inline, so they must not block."""
+        deadline_at = time.perf_counter() + self.deadline
+        futures = {asyncio.ensure_future(_timed_async(check)): (name, rejection) for name, check, rejection in checks}
+        pending = set(futures)
+        outcome = 'cancelled'
+        try:
+            while pending:
+                remaining = deadline_at - time.perf_counter()
+                if remaining <= 0:
+                    outcome = 'timed_out'
+                    raise EscrowError('Release verification timed out', 504)
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                failure = _record(done, futures, timings)
+                if failure is not None:
+                    raise failure
+        finally:
+            for future in pending:
+                future.cancel()
+                timings[futures[future][0]] = {'result': outcome, 'ms': None}
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,204 @@
+"""Concurrency stress test for the escrow server.
+
+Hammers the Flask app in-process from many threads: racing deposits and
+releases on the same property must succeed exactly once, independent
+properties must all complete with every buyer balance back at zero, and
+release checks must overlap, fail fast and respect their deadline. The bank
+call is replaced by a short sleep so no loan service needs to be running.
+
+    python stress_escrow.py --threads 16 --properties 200
+"""
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import escrow_server
+from escrow_server import ESCROW_AGENT, app, engine, store
+
+BANK_LATENCY = 0.002  # seconds, stands in for the loan_status round trip
+
+
+_in_flight = 0
+_peak_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+def approve_after_delay(buyer: str) -> bool:
+    global _in_flight, _peak_in_flight
+    with _in_flight_lock:
+        _in_flight += 1
+        _peak_in_flight = max(_peak_in_flight, _in_flight)
+    time.sleep(BANK_LATENCY)
+    with _in_flight_lock:
+        _in_flight -= 1
+    return True
+
+
+_clients = threading.local()
+
+
+def client():
+    if not hasattr(_clients, 'client'):
+        _clients.client = app.test_client()
+    return _clients.client
+
+
+def create(property_id: int, buyer: str, amount: int) -> int:
+    return client().post('/create_escrow', headers={'X-Agent-Key': ESCROW_AGENT}, json={
+        'buyer': buyer, 'seller': f'seller-{property_id}', 'property_id': property_id, 'amount': amount
+    }).status_code
+
+
+def deposit(property_id: int, buyer: str, amount: int) -> int:
+    return client().post('/deposit_funds', headers={'X-Buyer-Address': buyer},
+                         json={'property_id': property_id, 'amount': amount}).status_code
+
+
+def release(property_id: int) -> int:
+    return client().post('/release_funds', headers={'X-Agent-Key': ESCROW_AGENT},
+                         json={'property_id': property_id}).status_code
+
+
+def reset():
+    store.clear()
+    engine.versions.clear()
+
+
+def check(name: str, ok: bool, detail: str = '') -> bool:
+    print(f"{'PASS' if ok else 'FAIL'}  {name}{'  ' + detail if detail else ''}")
+    return ok
+
+
+def racing_transitions(pool: ThreadPoolExecutor, properties: int, racers: int) -> bool:
+    reset()
+    property_ids = [2 * (i + 1) for i in range(properties)]  # even ids pass the ownership mock
+    for property_id in property_ids:
+        assert create(property_id, f'buyer-{property_id}', 1000) == 200
+
+    deposits = list(pool.map(lambda p: deposit(p, f'buyer-{p}', 1000),
+                             [p for p in property_ids for _ in range(racers)]))
+    releases = list(pool.map(release, [p for p in property_ids for _ in range(racers)]))
+
+    ok = check('racing deposits succeed once per property', deposits.count(200) == properties,
+               f'{deposits.count(200)} successes for {properties} properties')
+    ok &= check('racing releases succeed once per property', releases.count(200) == properties,
+                f'{releases.count(200)} successes for {properties} properties')
+    nonzero = sum(1 for property_id in property_ids if store.balance(f'buyer-{property_id}') != 0)
+    ok &= check('buyer balances return to zero', nonzero == 0, f'{nonzero} non-zero')
+    return ok
+
+
+def shared_buyer(pool: ThreadPoolExecutor, properties: int) -> bool:
+    # One buyer across many properties exercises the per-address balance lock
+    reset()
+    property_ids = [2 * (i + 1) for i in range(properties)]
+    for property_id in property_ids:
+        assert create(property_id, 'buyer-shared', 10) == 200
+    deposits = list(pool.map(lambda p: deposit(p, 'buyer-shared', 10), property_ids))
+    after_deposits = store.balance('buyer-shared')
+    releases = list(pool.map(release, property_ids))
+
+    ok = check('shared buyer deposits are all counted', after_deposits == 10 * properties and deposits.count(200) == properties,
+               f'balance {after_deposits}, expected {10 * properties}')
+    ok &= check('shared buyer releases are all counted', store.balance('buyer-shared') == 0 and releases.count(200) == properties,
+                f"balance {store.balance('buyer-shared')}")
+    return ok
+
+
+def independent_lifecycles(pool: ThreadPoolExecutor, properties: int, threads: int) -> bool:
+    global _peak_in_flight
+    reset()
+    _peak_in_flight = 0
+
+    def lifecycle(property_id: int) -> bool:
+        buyer = f'buyer-{property_id}'
+        return (create(property_id, buyer, 500) == 200 and
+                deposit(property_id, buyer, 500) == 200 and
+                release(property_id) == 200)
+
+    property_ids = [2 * (i + 1) for i in range(properties)]
+    start = time.perf_counter()
+    results = list(pool.map(lifecycle, property_ids))
+    elapsed = time.perf_counter() - start
+
+    ok = check('independent lifecycles all complete', all(results) and store.state_counts()['completed'] == properties,
+               f'{results.count(True)}/{properties} in {elapsed:.3f}s')
+    ok &= check('independent properties release in parallel', threads == 1 or _peak_in_flight > 1,
+                f'peak of {_peak_in_flight} concurrent bank checks')
+    return ok
+
+
+def sleep_then(seconds: float, result: bool):
+    def check(*args) -> bool:
+        time.sleep(seconds)
+        return result
+    return check
+
+
+def timed_release(property_id: int):
+    start = time.perf_counter()
+    response = client().post('/release_funds', headers={'X-Agent-Key': ESCROW_AGENT}, json={'property_id': property_id})
+    return response.status_code, response.get_json(), time.perf_counter() - start
+
+
+def verification_fan_out() -> bool:
+    # Slow checks must overlap, a rejection must not wait for the others, and the deadline must hold
+    reset()
+    patched = ('verify_ownership', 'check_loan_approval', 'check_title_clearance')
+    saved = {name: getattr(escrow_server, name) for name in patched}
+    saved_deadline = escrow_server.release_verifier.deadline
+    latency = 0.1
+
+    def prepare(property_id: int, ownership, loan, title):
+        escrow_server.verify_ownership, escrow_server.check_loan_approval, escrow_server.check_title_clearance = \
+            ownership, loan, title
+        assert create(property_id, f'buyer-{property_id}', 100) == 200
+        assert deposit(property_id, f'buyer-{property_id}', 100) == 200
+
+    try:
+        prepare(2, sleep_then(latency, True), sleep_then(latency, True), sleep_then(latency, True))
+        status, body, elapsed = timed_release(2)
+        ok = check('slow checks run concurrently', status == 200 and elapsed < 2 * latency,
+                   f'{elapsed * 1000:.0f} ms for three {latency * 1000:.0f} ms checks, {body["checks"]}')
+
+        prepare(4, sleep_then(5 * latency, True), sleep_then(0.01, False), sleep_then(5 * latency, True))
+        status, body, elapsed = timed_release(4)
+        ok &= check('first rejection fails fast', status == 400 and elapsed < 2 * latency
+                    and body['checks']['ownership']['result'] == 'cancelled',
+                    f'{status} in {elapsed * 1000:.0f} ms, {body["checks"]}')
+
+        escrow_server.release_verifier.deadline = latency
+        prepare(6, sleep_then(10 * latency, True), sleep_then(0, True), sleep_then(0, True))
+        status, body, elapsed = timed_release(6)
+        ok &= check('verification deadline holds', status == 504 and elapsed < 3 * latency
+                    and not store.get(6).completed,
+                    f'{status} in {elapsed * 1000:.0f} ms, {body["checks"]}')
+    finally:
+        for name, check_fn in saved.items():
+            setattr(escrow_server, name, check_fn)
+        escrow_server.release_verifier.deadline = saved_deadline
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--properties', type=int, default=200)
+    parser.add_argument('--racers', type=int, default=8, help='concurrent attempts per property')
+    args = parser.parse_args()
+
+    escrow_server.check_loan_approval = approve_after_delay
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        ok = racing_transitions(pool, args.properties, args.racers)
+        ok &= shared_buyer(pool, args.properties)
+        ok &= independent_lifecycles(pool, args.properties, args.threads)
+    ok &= verification_fan_out()
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
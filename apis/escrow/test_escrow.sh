@@ -150,5 +150,51 @@ test_endpoint "Release funds with wrong agent key" "curl -s -X POST http://local
     \"property_id\": 2
 }'" 401
 
+print_header "TESTING LOAN APPROVAL CACHE"
+
+# Test 9: Invalidate cached loan approval for a buyer
+test_endpoint "Invalidate loan approval cache" "curl -s -X POST http://localhost:5001/invalidate_loan_cache \
+-H 'Content-Type: application/json' \
+-H 'X-Agent-Key: $ESCROW_AGENT' \
+-d '{
+    \"buyer\": \"$BUYER_ADDRESS\"
+}'" 200
+
+# Test 10: Invalidate cache without agent key (should fail)
+test_endpoint "Invalidate loan approval cache without agent key" "curl -s -X POST http://localhost:5001/invalidate_loan_cache \
+-H 'Content-Type: application/json' \
+-d '{
+    \"buyer\": \"$BUYER_ADDRESS\"
+}'" 401
+
+print_header "TESTING CONDITIONAL STATUS POLLING"
+
+# Test 11: Poll escrow status with the ETag from the previous poll (should be 304 Not Modified)
+ETAG=$(curl -s -o /dev/null -D - http://localhost:5001/escrow_status/2 | tr -d '\r' | awk 'tolower($1) == "etag:" {print $2}')
+test_endpoint "Poll unchanged escrow status" "curl -s http://localhost:5001/escrow_status/2 \
+-H 'If-None-Match: $ETAG'" 304
+
+print_header "TESTING EVENT LOG"
+
+# Test 12: Read escrow lifecycle events from the start of the log without waiting
+test_endpoint "Poll escrow events" "curl -s 'http://localhost:5001/events?cursor=0&timeout=0'" 200
+
+print_header "TESTING BULK STATUS LOOKUP"
+
+# Test 13: Look up several escrows in one request; unknown properties are listed as missing
+test_endpoint "Look up escrows in bulk" "curl -s -X POST http://localhost:5001/escrow_statuses \
+-H 'Content-Type: application/json' \
+-d '{\"property_ids\": [2, 3]}'" 200
+
+print_header "TESTING METRICS"
+
+# Test 14: Scrape request, escrow state and cache metrics in Prometheus text format
+test_endpoint "Scrape metrics" "curl -s http://localhost:5001/metrics" 200
+
+print_header "TESTING ESCROW QUERIES"
+
+# Test 15: List funded escrows, oldest property first
+test_endpoint "List funded escrows" "curl -s 'http://localhost:5001/escrows?state=funded&limit=10'" 200
+
 print_header "TEST SUMMARY"
 echo "Completed all escrow service tests!"
\ No newline at end of file
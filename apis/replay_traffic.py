@@ -0,0 +1,178 @@
+"""Replay captured traffic against a running bank or escrow service.
+
+Reads a capture written with TRAFFIC_CAPTURE_DIR set (see
+common/traffic_capture.py), including its rotated predecessors, and sends
+every request again in the order it originally arrived. Each response is
+compared with the original (status code, and body length plus CRC-32),
+and latencies are reported per route next to the originally captured
+ones. Replay against a freshly started instance so it begins from the same
+state the capture did.
+
+    python replay_traffic.py captures/escrow-capture.jsonl --target http://localhost:5001
+    python replay_traffic.py captures/bank-capture.jsonl --target http://localhost:5000 --speed 4
+    python replay_traffic.py captures/bank-capture.jsonl --target http://localhost:5000 --speed 0 --concurrency 1
+
+--speed 1 keeps the original timing, --speed 4 compresses it four times,
+and --speed 0 sends as fast as --concurrency allows. With --speed 0
+--concurrency 1 requests go one at a time in capture order, so the replay
+is deterministic. The bank admin and escrow agent keys are captured as
+fingerprints; those matching a --secret (or the default test keys) are
+sent with that value, and any other key is sent as its fingerprint, so
+it is rejected just as the original was.
+
+Captured latencies are measured inside the server; replayed ones are
+round trips from this client, so they also include the network and HTTP
+overhead. Polls that sent If-None-Match get a 200 instead of the captured
+304, since ETags are only valid in the process that issued them.
+"""
+import argparse
+import base64
+import json
+import threading
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import requests
+
+from bench_lifecycle import ADMIN_KEY, ESCROW_AGENT
+from common.traffic_capture import capture_files, read_capture, redact
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return float('nan')
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class Replay:
+    def __init__(self, target: str, secrets: List[str], timeout: float):
+        self.target = target.rstrip('/')
+        self.secrets = {redact(value): value for value in secrets}  # fingerprint -> value
+        self.timeout = timeout
+        self.results: List[dict] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def send(self, entry: dict, due: float):
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        # A fingerprint nothing matches stands in for the wrong key that was sent
+        headers = {name: self.secrets.get(value, value) for name, value in entry['headers'].items()}
+        body = base64.b64decode(entry['body_b64']) if 'body_b64' in entry else entry.get('body', '').encode('utf-8')
+
+        start = time.perf_counter()
+        try:
+            response = self._local.session.request(entry['method'], self.target + entry['path'], headers=headers,
+                                                   data=body or None, timeout=self.timeout)
+            status, content = response.status_code, response.content
+        except requests.RequestException as e:
+            status, content = None, str(e).encode()
+        seconds = time.perf_counter() - start
+
+        result = {
+            'route': f"{entry['method']} {entry['route']}",
+            'path': entry['path'],
+            'lag_ms': max(0.0, (start - due) * 1000),
+            'original_ms': entry['ms'],
+            'replay_ms': seconds * 1000,
+            'original_status': entry['status'],
+            'status': status,
+            'status_match': status == entry['status'],
+            'body_match': len(content) == entry['response_length'] and zlib.crc32(content) == entry['response_crc'],
+        }
+        with self._lock:
+            self.results.append(result)
+
+    def run(self, entries: List[dict], speed: float, concurrency: int) -> float:
+        first = entries[0]['ts']
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            if speed == 0 and concurrency == 1:
+                for entry in entries:
+                    self.send(entry, time.perf_counter())
+            else:
+                for entry in entries:
+                    due = start + (entry['ts'] - first) / speed if speed else time.perf_counter()
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    pool.submit(self.send, entry, due)
+        return time.perf_counter() - start
+
+
+def report(results: List[dict], seconds: float, captured_seconds: float, show: int) -> dict:
+    routes = defaultdict(list)
+    for result in results:
+        routes[result['route']].append(result)
+
+    summary = {
+        'requests': len(results),
+        'seconds': seconds,
+        'captured_seconds': captured_seconds,
+        'status_mismatches': sum(not r['status_match'] for r in results),
+        'body_mismatches': sum(r['status_match'] and not r['body_match'] for r in results),
+        'lag_p99_ms': percentile([r['lag_ms'] for r in results], 0.99),
+        'routes': {},
+    }
+    print(f"{len(results)} requests in {seconds:.2f}s (captured over {captured_seconds:.2f}s); "
+          f"{summary['status_mismatches']} status and {summary['body_mismatches']} body mismatches; "
+          f"send lag p99 {summary['lag_p99_ms']:.1f} ms")
+    print(f"{'route':<38} {'count':>6} {'status !=':>9} {'body !=':>8} "
+          f"{'server p50':>10} {'server p99':>10} {'replay p50':>10} {'replay p99':>10}  (ms)")
+    for route, items in sorted(routes.items()):
+        original = [r['original_ms'] for r in items]
+        replayed = [r['replay_ms'] for r in items]
+        stats = {
+            'count': len(items),
+            'status_mismatches': sum(not r['status_match'] for r in items),
+            'body_mismatches': sum(r['status_match'] and not r['body_match'] for r in items),
+            'original_p50_ms': percentile(original, 0.5), 'original_p99_ms': percentile(original, 0.99),
+            'replay_p50_ms': percentile(replayed, 0.5), 'replay_p99_ms': percentile(replayed, 0.99),
+        }
+        summary['routes'][route] = stats
+        print(f"{route:<38} {stats['count']:>6} {stats['status_mismatches']:>9} {stats['body_mismatches']:>8} "
+              f"{stats['original_p50_ms']:>10.2f} {stats['original_p99_ms']:>10.2f} "
+              f"{stats['replay_p50_ms']:>10.2f} {stats['replay_p99_ms']:>10.2f}")
+
+    mismatches = [r for r in results if not r['status_match']][:show]
+    if mismatches:
+        print('\nFirst status mismatches:')
+        for r in mismatches:
+            print(f"  {r['route']} {r['path']}: captured {r['original_status']}, replayed {r['status']}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('capture', help='capture file, e.g. captures/escrow-capture.jsonl')
+    parser.add_argument('--target', required=True, help='base URL of the service to replay against')
+    parser.add_argument('--speed', type=float, default=1.0, help='timing scale; 0 sends as fast as possible')
+    parser.add_argument('--concurrency', type=int, default=64, help='most requests in flight at once')
+    parser.add_argument('--secret', action='append', default=[ADMIN_KEY, ESCROW_AGENT],
+                        help='admin or agent key to send wherever its fingerprint was captured')
+    parser.add_argument('--limit', type=int, help='replay only the first N requests')
+    parser.add_argument('--timeout', type=float, default=60.0, help='per-request timeout in seconds')
+    parser.add_argument('--show-mismatches', type=int, default=10)
+    parser.add_argument('--json', help='write the per-route summary to this file')
+    args = parser.parse_args()
+    if args.speed < 0:
+        parser.error('--speed must not be negative')
+
+    entries = sorted(read_capture(capture_files(args.capture)), key=lambda entry: entry['ts'])[:args.limit]
+    if not entries:
+        parser.error(f'No captured requests in {args.capture}')
+
+    replay = Replay(args.target, args.secret, args.timeout)
+    seconds = replay.run(entries, args.speed, args.concurrency)
+    summary = report(replay.results, seconds, entries[-1]['ts'] - entries[0]['ts'], args.show_mismatches)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Benchmark: image_ingest.py against uploading photos one at a time, offline.
+
+Writes N synthetic listing photos (full-size JPEGs, a share of them copies
+under another name) into per-property folders. It starts storage_standin.py
+with --latency per request and runs:
+
+- a one-at-a-time loop: hash, full-resolution decode and resize, then one
+  upload after another, as a photo is uploaded by hand
+- image_ingest.py's pipeline: resizing in a process pool and concurrent uploads
+- the pipeline again over the same folder, which should skip every photo
+- an ingest against a stand-in failing --fail-rate of uploads with no retries,
+  then a rerun with retries, which should upload only what the first run missed
+
+Each stand-in must end up holding every distinct photo and its thumbnails,
+with the originals byte for byte.
+
+    python bench_image_ingest.py --photos 200 --latency 0.05 --concurrency 8
+"""
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+
+from PIL import Image, ImageFilter
+from supabase import create_client
+
+import storage_standin
+from image_ingest import BUCKET, HASH_DIGITS, ImageIngest, Manifest, file_hash, find_images, supabase_store
+
+
+def photo(rng: random.Random, width: int, height: int) -> bytes:
+    """A JPEG with smooth areas and fine detail, which compresses roughly like a photo"""
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    noise = Image.effect_noise((width, height), 40).convert('RGB')
+    image = Image.blend(image, noise, 0.3).filter(ImageFilter.GaussianBlur(1))
+    tint = Image.new('RGB', (width, height), tuple(rng.randrange(256) for _ in range(3)))
+    buffer = io.BytesIO()
+    Image.blend(image, tint, 0.3).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def write_photos(directory: str, photos: int, properties: int, duplicates: float, rng: random.Random) -> int:
+    """Returns how many distinct (property, photo) pairs were written"""
+    written = []
+    for i in range(photos):
+        folder = os.path.join(directory, str(1 + i % properties))
+        os.makedirs(folder, exist_ok=True)
+        same = [data for folder_written, data in written if folder_written == folder]
+        data = rng.choice(same) if same and rng.random() < duplicates else photo(rng, 2400, 1600)
+        with open(os.path.join(folder, f'IMG_{i:05d}.jpg'), 'wb') as f:
+            f.write(data)
+        written.append((folder, data))
+    return len({(folder, data) for folder, data in written})
+
+
+def one_at_a_time(directory: str, store, widths) -> float:
+    start = time.perf_counter()
+    for property_id, path in find_images(directory):
+        name = f'{property_id}/{file_hash(path)[:HASH_DIGITS]}'
+        with open(path, 'rb') as f:
+            store(f'{name}.jpg', f.read(), 'image/jpeg')
+        with Image.open(path) as image:
+            image = image.convert('RGB')
+        for width in widths:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((width, image.height), Image.LANCZOS)
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, 'JPEG', quality=82)
+            store(f'{name}_{width}.jpg', buffer.getvalue(), 'image/jpeg')
+    return time.perf_counter() - start
+
+
+def client_for(server):
+    """A supabase-py client of a fresh stand-in, with the bucket created"""
+    client = create_client(f'http://127.0.0.1:{server.server_address[1]}', 'local')
+    client.storage.create_bucket(BUCKET, options={'public': True})
+    return client
+
+
+def verify(server, directory: str, distinct: int, widths) -> list:
+    objects = server.objects(BUCKET)
+    problems = []
+    if len(objects) != distinct * (1 + len(widths)):
+        problems.append(f'{len(objects)} objects stored, expected {distinct * (1 + len(widths))}')
+    for property_id, path in find_images(directory):
+        with open(path, 'rb') as f:
+            data = f.read()
+        stored = objects.get(f'{property_id}/{file_hash(path)[:HASH_DIGITS]}.jpg')
+        if stored is None or stored[0] != data:
+            problems.append(f'{path} not stored intact')
+    return problems
+
+
+def ingest(server, directory: str, manifest_path: str, args, retries: int) -> dict:
+    manifest = Manifest(manifest_path)
+    try:
+        client = create_client(f'http://127.0.0.1:{server.server_address[1]}', 'local')
+        pipeline = ImageIngest(supabase_store(client), manifest, args.widths, workers=args.workers,
+                               concurrency=args.concurrency, retries=retries, backoff=0.01)
+        return pipeline.run(find_images(directory))
+    finally:
+        manifest.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--photos', type=int, default=200)
+    parser.add_argument('--properties', type=int, default=20)
+    parser.add_argument('--duplicates', type=float, default=0.05, help='share of photos that copy another')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds the stand-in takes per upload')
+    parser.add_argument('--fail-rate', type=float, default=0.2, help='share of uploads failed in the resume run')
+    parser.add_argument('--widths', type=lambda text: [int(w) for w in text.split(',')], default=[320, 960])
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        photos = os.path.join(directory, 'photos')
+        distinct = write_photos(photos, args.photos, args.properties, args.duplicates, rng)
+        megabytes = sum(os.path.getsize(path) for _, path in find_images(photos)) / 2**20
+        print(f"{args.photos} photos ({distinct} distinct, {megabytes:.0f} MiB) in {args.properties} property folders, "
+              f"{args.latency * 1000:.0f} ms per upload, thumbnails at {args.widths}")
+        problems = []
+
+        baseline_server = storage_standin.start(latency=args.latency)
+        serial_seconds = one_at_a_time(photos, supabase_store(client_for(baseline_server)), args.widths)
+
+        server = storage_standin.start(latency=args.latency)
+        client_for(server)
+        manifest_path = os.path.join(directory, 'photos.manifest.jsonl')
+        stats = ingest(server, photos, manifest_path, args, retries=5)
+        problems += verify(server, photos, distinct, args.widths)
+        rerun = ingest(server, photos, manifest_path, args, retries=5)
+        if rerun['skipped'] + rerun['duplicates'] != args.photos or rerun['objects']:
+            problems.append(f'rerun uploaded {rerun["objects"]} objects')
+
+        flaky = storage_standin.start(latency=args.latency, fail_rate=args.fail_rate)
+        client_for(flaky)
+        flaky_manifest = os.path.join(directory, 'flaky.manifest.jsonl')
+        first = ingest(flaky, photos, flaky_manifest, args, retries=0)
+        flaky.fail_rate = 0.0
+        resumed = ingest(flaky, photos, flaky_manifest, args, retries=5)
+        problems += verify(flaky, photos, distinct, args.widths)
+        if first['uploaded'] + resumed['uploaded'] != distinct:
+            problems.append(f"resume uploaded {resumed['uploaded']} photos after {first['uploaded']}")
+
+    print(f"{'run':<34} {'seconds':>8} {'photos/s':>9}")
+    print(f"{'one at a time':<34} {serial_seconds:>8.2f} {distinct / serial_seconds:>9.1f}")
+    print(f"{'image_ingest.py':<34} {stats['seconds']:>8.2f} {stats['images_per_sec']:>9.1f}   "
+          f"{serial_seconds / stats['seconds']:.1f}x; peak {server.stats['peak_in_flight']} uploads in flight")
+    print(f"{'rerun, all already uploaded':<34} {rerun['seconds']:>8.2f}")
+    print(f"{f'{args.fail_rate:.0%} failing, no retries':<34} {first['seconds']:>8.2f}   "
+          f"{first['uploaded']} photos done, {first['failed']} failed")
+    print(f"{'resumed with retries':<34} {resumed['seconds']:>8.2f}   "
+          f"{resumed['uploaded']} more, {resumed['skipped']} skipped, {resumed['retries']} retries")
+    if problems:
+        raise SystemExit('; '.join(problems[:5]))
+    print("every stand-in holds each distinct photo intact, with its thumbnails")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
+import argparse
 import os
 from supabase import create_client, Client
+from property_loader import ChunkedLoader, Checkpoint, stream_delta_csv, stream_scraper_csv
 
 # Load environment variables (optional, but recommended)
 from dotenv import load_dotenv
@@ -385,6 +387,62 @@ def insert_properties():
     except Exception as e:
         print(f"An error occurred: {e}")
 
+def load_chunks(path, write, rows, chunk_size, concurrency, retries, checkpoint_path, key=None):
+    """Write the rows in concurrent, resumable chunks, checkpointed against path"""
+    checkpoint = Checkpoint(checkpoint_path, path, chunk_size)
+    if checkpoint.completed:
+        print(f"Resuming: {len(checkpoint.completed)} chunks already loaded")
+
+    loader = ChunkedLoader(write, chunk_size=chunk_size, concurrency=concurrency,
+                           retries=retries, checkpoint=checkpoint, key=key)
+    stats = loader.load(rows)
+
+    print(f"Loaded {stats['rows']} rows ({stats['duplicates']} duplicates dropped) in {stats['chunks']} chunks "
+          f"({stats['skipped_chunks']} skipped, {stats['retries']} retries, {stats['failed_chunks']} failed) "
+          f"in {stats['seconds']:.2f}s, {stats['rows_per_sec']:.0f} rows/s")
+    if stats['failed_chunks'] == 0:
+        checkpoint.clear()
+    return stats
+
+def load_scraper_csv(path, chunk_size=500, concurrency=4, retries=5, on_conflict='url', checkpoint_path=None,
+                     rows=None):
+    """Stream the scraper's CSV into the properties table in concurrent, resumable chunks.
+    rows, if given, is called for the rows to load instead of reading path as a scraper CSV."""
+    def upsert(chunk):
+        supabase.table('properties').upsert(chunk, on_conflict=on_conflict).execute()
+
+    return load_chunks(path, upsert, rows or (lambda: stream_scraper_csv(path)), chunk_size, concurrency, retries,
+                       checkpoint_path or path + '.checkpoint', key=on_conflict.split(','))
+
+def load_scraper_delta(path, chunk_size=500, concurrency=4, retries=5, on_conflict='url', checkpoint_path=None):
+    """Apply the scraper's zillow_delta.csv: upsert new and changed properties, then mark delisted ones unavailable"""
+    checkpoint_path = checkpoint_path or path + '.checkpoint'
+    listed = load_scraper_csv(path, chunk_size, concurrency, retries, on_conflict, checkpoint_path,
+                              rows=lambda: stream_delta_csv(path))
+
+    # Delisted listings only change the rows already there; an upsert would insert any that are missing
+    def mark_unavailable(chunk):
+        supabase.table('properties').update({'available': False}).in_('url', [row['url'] for row in chunk]).execute()
+
+    delisted = load_chunks(path, mark_unavailable, lambda: stream_delta_csv(path, delisted=True), chunk_size,
+                           concurrency, retries, checkpoint_path + '.delisted')
+    return listed, delisted
+
 # Run the insertion
 if __name__ == '__main__':
-    insert_properties()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Seed the properties and reviews tables")
+    parser.add_argument('--csv', help="load this scraper CSV (e.g. ../../scraper/zillow.csv) instead of the sample properties")
+    parser.add_argument('--delta', help="apply this scraper delta (e.g. ../../scraper/zillow_delta.csv) instead")
+    parser.add_argument('--chunk-size', type=int, default=500, help="rows per upsert request")
+    parser.add_argument('--concurrency', type=int, default=4, help="upsert requests in flight")
+    parser.add_argument('--retries', type=int, default=5, help="retries per failed chunk")
+    parser.add_argument('--on-conflict', default='url', help="unique column(s) identifying a property")
+    parser.add_argument('--checkpoint', help="progress file (defaults to <csv>.checkpoint)")
+    args = parser.parse_args()
+
+    if args.delta:
+        load_scraper_delta(args.delta, args.chunk_size, args.concurrency, args.retries, args.on_conflict, args.checkpoint)
+    elif args.csv:
+        load_scraper_csv(args.csv, args.chunk_size, args.concurrency, args.retries, args.on_conflict, args.checkpoint)
+    else:
+        insert_properties()
\ No newline at end of file
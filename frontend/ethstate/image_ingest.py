@@ -0,0 +1,284 @@
+"""Bulk ingestion of listing photos into the property-images bucket.
+
+    python image_ingest.py photos/ --widths 320,960 --workers 4 --concurrency 8
+    python image_ingest.py photos.csv        # property_id,path rows; paths relative to the CSV
+
+A directory holds one folder per property id, and the bucket is laid out the
+same way the frontend uploads: <property id>/<file>. Each photo is stored
+under the first 16 hex digits of its SHA-256, so an object's name identifies
+its content:
+- the original as <property id>/<hash>.<ext>
+- JPEG thumbnails as <property id>/<hash>_<width>.jpg, resized in a process pool
+
+Uploads run on a bounded pool of threads, with retries and backoff. Each
+finished photo is appended to a manifest (<source>.manifest.jsonl), so later
+runs skip photos already uploaded, including copies under another file name.
+An interrupted run picks up where it stopped, and a file whose size and
+modification time are unchanged is not even read again.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+BUCKET = 'property-images'
+CONTENT_TYPES = {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png', '.webp': 'image/webp',
+                 '.gif': 'image/gif'}
+HASH_DIGITS = 16
+ORIENTATION = 0x0112  # EXIF tag; values 5-8 turn the photo a quarter turn
+CACHE_CONTROL = '31536000'  # Object names change with their content, so they can be cached for good
+
+
+def find_images(source: str) -> Iterator[Tuple[str, str]]:
+    """(property id, file path) for each photo in a directory of per-property folders or a CSV manifest"""
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            folder = os.path.relpath(root, source)
+            if folder == '.':
+                continue  # Loose files belong to no property
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in CONTENT_TYPES:
+                    yield folder.split(os.sep)[0], os.path.join(root, name)
+    else:
+        with open(source, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                yield row['property_id'], os.path.join(os.path.dirname(source), row['path'])
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def resize(path: str, widths: Sequence[int], quality: int = 82) -> List[Tuple[int, bytes]]:
+    """A JPEG of the photo per width, largest first and never upscaled; runs in a worker process"""
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as image:
+        # JPEGs decode straight to 1/2, 1/4 or 1/8 scale: ask for no less than the largest width needs,
+        # measured along the side that becomes the width once the EXIF orientation is applied
+        largest = max(widths)
+        if image.getexif().get(ORIENTATION, 1) in (5, 6, 7, 8):
+            image.draft('RGB', (-(-largest * image.width // image.height), largest))
+        else:
+            image.draft('RGB', (largest, -(-largest * image.height // image.width)))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    variants = []
+    for width in sorted(widths, reverse=True):
+        if image.width > width:
+            image.thumbnail((width, image.height), Image.LANCZOS)  # Each size shrinks the last one
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+        variants.append((width, buffer.getvalue()))
+    return variants
+
+
+def supabase_store(client, bucket: str = BUCKET) -> Callable[[str, bytes, str], object]:
+    """Upload function for a supabase-py client; re-uploading an object overwrites it with the same bytes"""
+    files = client.storage.from_(bucket)
+
+    def store(name: str, data: bytes, content_type: str):
+        files.upload(name, data, {'content-type': content_type, 'cache-control': CACHE_CONTROL, 'upsert': 'true'})
+    return store
+
+
+class Manifest:
+    """Photos already uploaded, one JSON line each, appended as every photo finishes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.uploaded = set()  # (property id, sha256)
+        self.hashes: Dict[str, Tuple[int, int, str]] = {}  # absolute file path -> (size, mtime_ns, sha256)
+        ends_cleanly = True
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    ends_cleanly = line.endswith('\n')
+                    try:
+                        self._remember(json.loads(line))
+                    except ValueError:
+                        pass  # A line cut short by a crash; that photo is uploaded again
+        except FileNotFoundError:
+            pass
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+        if not ends_cleanly:
+            self._file.write('\n')
+
+    def _remember(self, record: dict):
+        self.uploaded.add((record['property_id'], record['sha256']))
+        self.hashes[record['file']] = (record['size'], record['mtime_ns'], record['sha256'])
+
+    def cached_hash(self, path: str, stat: os.stat_result) -> Optional[str]:
+        known = self.hashes.get(path)
+        return known[2] if known and known[:2] == (stat.st_size, stat.st_mtime_ns) else None
+
+    def done(self, record: dict):
+        with self._lock:
+            self._remember(record)
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ImageIngest:
+    """Hashes, resizes and uploads photos, keeping at most ``concurrency * 2`` of them in memory at once.
+
+    Hashing happens on the calling thread, resizing in ``workers`` processes,
+    and uploads on ``concurrency`` threads. Failed uploads are retried with
+    exponential backoff. A photo that still fails is left out of the manifest,
+    so the next run tries it again.
+    """
+
+    def __init__(self, store: Callable[[str, bytes, str], object], manifest: Manifest,
+                 widths: Sequence[int] = (320, 960), quality: int = 82, workers: Optional[int] = None,
+                 concurrency: int = 8, retries: int = 5, backoff: float = 0.5):
+        self.store = store
+        self.manifest = manifest
+        self.widths = tuple(widths)
+        self.quality = quality
+        self.workers = workers
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = {'images': 0, 'skipped': 0, 'duplicates': 0, 'uploaded': 0, 'objects': 0, 'bytes': 0,
+                      'retries': 0, 'failed': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _store(self, name: str, data: bytes, content_type: str) -> bool:
+        for attempt in range(self.retries + 1):
+            try:
+                self.store(name, data, content_type)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    print(f"Upload of {name} failed after {self.retries} retries: {e}")
+                    return False
+                self._count('retries')
+                time.sleep(self.backoff * (2 ** attempt) + random.uniform(0, self.backoff))
+        self._count('objects')
+        self._count('bytes', len(data))
+        return True
+
+    def _upload(self, property_id: str, path: str, stat: os.stat_result, sha: str, variants: Optional[Future]):
+        extension = os.path.splitext(path)[1].lower()
+        name = f'{property_id}/{sha[:HASH_DIGITS]}'
+        with open(path, 'rb') as f:
+            uploads = [('original', f'{name}{extension}', f.read(), CONTENT_TYPES[extension])]
+        if variants is not None:
+            uploads += [(str(width), f'{name}_{width}.jpg', data, 'image/jpeg') for width, data in variants.result()]
+        for _, object_name, data, content_type in uploads:
+            if not self._store(object_name, data, content_type):
+                self._count('failed')
+                return
+        self.manifest.done({'file': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                            'sha256': sha, 'property_id': property_id,
+                            'objects': {variant: object_name for variant, object_name, _, _ in uploads}})
+        self._count('uploaded')
+
+    def run(self, images: Iterator[Tuple[str, str]]) -> Dict[str, float]:
+        start = time.perf_counter()
+        in_flight = threading.BoundedSemaphore(self.concurrency * 2)
+        queued = set()
+
+        def upload(*args):
+            try:
+                self._upload(*args)
+            except Exception as e:
+                print(f"{args[1]}: {e}")
+                self._count('failed')
+            finally:
+                in_flight.release()
+
+        # The process pool is shut down first, so every resize has handed its photo to the upload pool
+        with ThreadPoolExecutor(max_workers=self.concurrency) as threads, \
+                ProcessPoolExecutor(max_workers=self.workers) as processes:
+            for property_id, path in images:
+                self._count('images')
+                try:
+                    stat = os.stat(path)
+                    sha = self.manifest.cached_hash(os.path.abspath(path), stat) or file_hash(path)
+                except OSError as e:
+                    print(f"{path}: {e}")
+                    self._count('failed')
+                    continue
+                key = (property_id, sha)
+                if key in self.manifest.uploaded:
+                    self._count('skipped')
+                    continue
+                if key in queued:
+                    self._count('duplicates')
+                    continue
+                queued.add(key)
+
+                in_flight.acquire()  # Back-pressure: stop reading while the pools are saturated
+                args = (property_id, path, stat, sha)
+                if not self.widths:
+                    threads.submit(upload, *args, None)
+                    continue
+                variants = processes.submit(resize, path, self.widths, self.quality)
+                variants.add_done_callback(lambda done, args=args: threads.submit(upload, *args, done))
+
+        self.stats['seconds'] = time.perf_counter() - start
+        self.stats['images_per_sec'] = self.stats['uploaded'] / self.stats['seconds'] if self.stats['seconds'] else 0
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help="directory of <property id>/ folders, or a CSV with property_id,path columns")
+    parser.add_argument('--bucket', default=BUCKET)
+    parser.add_argument('--widths', default='320,960', help="thumbnail widths, comma-separated; '' for none")
+    parser.add_argument('--quality', type=int, default=82, help="JPEG quality of the thumbnails")
+    parser.add_argument('--workers', type=int, help="resizing processes (defaults to the CPU count)")
+    parser.add_argument('--concurrency', type=int, default=8, help="uploads in flight")
+    parser.add_argument('--retries', type=int, default=5, help="retries per failed upload")
+    parser.add_argument('--manifest', help="progress file (defaults to <source>.manifest.jsonl)")
+    args = parser.parse_args()
+
+    widths = [int(width) for width in args.widths.split(',') if width.strip()]
+    if widths:
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            parser.error("thumbnails need Pillow (pip install Pillow); pass --widths '' to upload originals only")
+
+    from dotenv import load_dotenv
+    from supabase import create_client
+    load_dotenv()
+    client = create_client(os.getenv('NEXT_PUBLIC_SUPABASE_URL'), os.getenv('SUPABASE_SERVICE_ROLE_KEY'))
+
+    manifest = Manifest(args.manifest or args.source.rstrip('/\\') + '.manifest.jsonl')
+    if manifest.uploaded:
+        print(f"Resuming: {len(manifest.uploaded)} photos already uploaded")
+    ingest = ImageIngest(supabase_store(client, args.bucket), manifest, widths, args.quality, args.workers,
+                         args.concurrency, args.retries)
+    try:
+        stats = ingest.run(find_images(args.source))
+    finally:
+        manifest.close()
+    print(f"Uploaded {stats['uploaded']} of {stats['images']} photos as {stats['objects']} objects "
+          f"({stats['bytes'] / 2**20:.1f} MiB; {stats['skipped']} already uploaded, {stats['duplicates']} duplicates, "
+          f"{stats['retries']} retries, {stats['failed']} failed) in {stats['seconds']:.2f}s, "
+          f"{stats['images_per_sec']:.1f} photos/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""Local PostgREST-compatible stand-in for the Supabase tables db_setup.py writes.
+
+    python postgrest_standin.py --port 54321 --latency 0.05 --fail-rate 0.1
+    NEXT_PUBLIC_SUPABASE_URL=http://localhost:54321 SUPABASE_SERVICE_ROLE_KEY=local \\
+        python db_setup.py --csv ../../scraper/zillow.csv
+
+Understands the requests supabase-py's table().upsert()/update().in_()/select()
+send: POST /rest/v1/<table>?on_conflict=<cols> with a JSON row or list of rows,
+PATCH /rest/v1/<table>?<col>=in.(<values>) with a JSON object of new values,
+and GET /rest/v1/<table>. Rows are kept in memory. --fail-rate answers that share
+of writes with a 503, and --max-rows answers larger upserts with a 504, the way
+a single huge upsert times out against the real service. Like Postgres, an
+upsert that names the same on_conflict key twice is rejected as a whole.
+"""
+import argparse
+import csv
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DUPLICATE_KEY_MESSAGE = 'ON CONFLICT DO UPDATE command cannot affect row a second time'
+
+
+class PostgrestStandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, latency: float = 0.0, fail_rate: float = 0.0, max_rows: int = 0):
+        super().__init__(('127.0.0.1', port), PostgrestHandler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.max_rows = max_rows
+        self.tables = {}  # table -> {key: row}
+        self.next_id = 1
+        self.stats = {'requests': 0, 'rows': 0, 'failures': 0}
+        self.lock = threading.Lock()
+
+    def upsert(self, table: str, rows, on_conflict):
+        with self.lock:
+            stored = self.tables.setdefault(table, {})
+            result = []
+            for row in rows:
+                row = dict(row)
+                key = tuple(row.get(column) for column in on_conflict) if on_conflict else None
+                if key is None or key not in stored:
+                    row.setdefault('id', self.next_id)
+                    self.next_id += 1
+                    key = key if key is not None else ('id', row['id'])
+                    stored[key] = row
+                else:
+                    stored[key].update(row)  # resolution=merge-duplicates
+                result.append(stored[key])
+            self.stats['rows'] += len(rows)
+            return result
+
+    def update(self, table: str, values: dict, column: str, matching) -> list:
+        with self.lock:
+            result = []
+            for row in self.tables.get(table, {}).values():
+                if str(row.get(column)) in matching:
+                    row.update(values)
+                    result.append(row)
+            self.stats['rows'] += len(result)
+            return result
+
+
+class PostgrestHandler(BaseHTTPRequestHandler):
+    server: PostgrestStandIn
+    protocol_version = 'HTTP/1.1'
+
+    def _table(self):
+        parts = urlsplit(self.path)
+        prefix = '/rest/v1/'
+        if not parts.path.startswith(prefix):
+            return None, {}
+        return parts.path[len(prefix):].strip('/'), parse_qs(parts.query)
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _accept_write(self, table, rows: int) -> bool:
+        """Counts a write request and answers it with the configured failures; False if it was answered"""
+        server = self.server
+        with server.lock:
+            server.stats['requests'] += 1
+
+        if not table:
+            self._send_json(404, {'message': 'Not found'})
+            return False
+        time.sleep(server.latency)
+        if server.max_rows and rows > server.max_rows:
+            with server.lock:
+                server.stats['failures'] += 1
+            self._send_json(504, {'message': 'canceling statement due to statement timeout'})
+            return False
+        if random.random() < server.fail_rate:
+            with server.lock:
+                server.stats['failures'] += 1
+            self._send_json(503, {'message': 'Service unavailable'})
+            return False
+        return True
+
+    def _send_result(self, status: int, result):
+        if 'return=minimal' in self.headers.get('Prefer', ''):
+            self.send_response(status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        else:
+            self._send_json(status, result)
+
+    def do_POST(self):
+        server = self.server
+        table, query = self._table()
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'[]')
+        rows = payload if isinstance(payload, list) else [payload]
+        if not self._accept_write(table, len(rows)):
+            return
+
+        on_conflict = [c for c in query.get('on_conflict', [''])[0].split(',') if c]
+        keys = [tuple(row.get(column) for column in on_conflict) for row in rows]
+        if on_conflict and len(set(keys)) < len(keys):
+            # What Postgres answers (and PostgREST passes on) when one upsert names a row twice
+            with server.lock:
+                server.stats['failures'] += 1
+            self._send_json(500, {'code': '21000', 'details': None, 'message': DUPLICATE_KEY_MESSAGE,
+                                  'hint': 'Ensure that no rows proposed for insertion within the same command '
+                                          'have duplicate constrained values.'})
+            return
+        self._send_result(201, server.upsert(table, rows, on_conflict))
+
+    def do_PATCH(self):
+        table, query = self._table()
+        length = int(self.headers.get('Content-Length', 0))
+        values = json.loads(self.rfile.read(length) or b'{}')
+        # Only the in. filter update().in_() sends: col=in.(a,"b,with,reserved chars")
+        filters = [(column, value[0][len('in.('):-1]) for column, value in query.items()
+                   if value[0].startswith('in.(') and value[0].endswith(')')]
+        if len(filters) != 1 or not isinstance(values, dict):
+            with self.server.lock:
+                self.server.stats['requests'] += 1
+            self._send_json(400, {'message': 'Expected a JSON object and one in. filter'})
+            return
+        column, listed = filters[0]
+        matching = set(next(csv.reader([listed]), []))
+        if not self._accept_write(table, len(matching)):
+            return
+        self._send_result(200, self.server.update(table, values, column, matching))
+
+    def do_GET(self):
+        table, _ = self._table()
+        if not table:
+            self._send_json(404, {'message': 'Not found'})
+            return
+        with self.server.lock:
+            rows = list(self.server.tables.get(table, {}).values())
+        self._send_json(200, rows)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port: int = 0, **options) -> PostgrestStandIn:
+    """Serve from a background thread; port 0 picks a free port"""
+    server = PostgrestStandIn(port, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds to wait before answering a write')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='share of writes answered with a 503')
+    parser.add_argument('--max-rows', type=int, default=0, help='reject upserts with more rows than this (504)')
+    args = parser.parse_args()
+
+    server = PostgrestStandIn(args.port, args.latency, args.fail_rate, args.max_rows)
+    print(f'PostgREST stand-in on http://127.0.0.1:{args.port}/rest/v1/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    rows = sum(len(table) for table in server.tables.values())
+    print(f"{server.stats['requests']} requests, {server.stats['rows']} rows written, "
+          f"{server.stats['failures']} failures, {rows} rows stored")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+import csv
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+# SQLSTATE classes worth sending again: connection exceptions, serialization failures and deadlocks,
+# insufficient resources, and operator intervention (e.g. a statement timeout)
+RETRYABLE_SQLSTATE_CLASSES = ('08', '40', '53', '57')
+# PostgREST's own codes for failing to reach the database
+RETRYABLE_PGRST_CODES = ('PGRST000', 'PGRST001', 'PGRST002', 'PGRST003')
+
+
+def property_row(row: dict) -> dict:
+    """A scraper CSV row in the shape db_setup.py inserts"""
+    return {
+        "address": row["Address"],
+        "broker": row["Broker"],
+        "price": row["Price"].lstrip("$"),
+        "beds": row["Beds"].split(" ")[0],
+        "baths": row["Bathrooms"].split(" ")[0],
+        "sqft": row["Square Footage"].split(" ")[0],
+        "url": row["URL"],
+        "available": True
+    }
+
+
+def stream_scraper_csv(path: str) -> Iterator[dict]:
+    """Yield property rows from the scraper's zillow.csv, in the shape db_setup.py inserts"""
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            yield property_row(row)
+
+
+def stream_delta_csv(path: str, delisted: bool = False) -> Iterator[dict]:
+    """Yield the new and changed properties from the scraper's zillow_delta.csv, or with
+    ``delisted`` the delisted ones as {url} (to mark the existing rows unavailable)"""
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if (row["Change"] == "delisted") != delisted:
+                continue
+            yield {"url": row["URL"]} if delisted else property_row(row)
+
+
+def last_positions(rows: Iterable[dict], columns: Sequence[str]) -> Set[int]:
+    """Positions of the last occurrence of each key, holding the keys but not the rows.
+
+    Postgres rejects an upsert that touches the same row twice ("ON CONFLICT
+    DO UPDATE command cannot affect row a second time"), and copies in
+    different chunks would race over which one lands.
+    """
+    last = {}
+    for position, row in enumerate(rows):
+        last[tuple(row.get(column) for column in columns)] = position
+    return set(last.values())
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed upsert may succeed when sent again.
+
+    supabase-py raises APIError with the Postgres SQLSTATE or PostgREST code,
+    or with the HTTP status when the response had no error body. Errors in
+    the request itself (bad values, constraint or cardinality violations,
+    other 4xx responses) fail the same way every time. Anything without a
+    code, such as a network error, is retried.
+    """
+    code = getattr(error, 'code', None)
+    if code is None:
+        return True
+    if isinstance(code, int):
+        return code == 429 or code >= 500
+    code = str(code)
+    if code.startswith('PGRST'):
+        return code in RETRYABLE_PGRST_CODES
+    return code[:2] in RETRYABLE_SQLSTATE_CLASSES
+
+
+def chunked(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Checkpoint:
+    """Completed chunk numbers for one (source file, chunk size), persisted after every chunk"""
+
+    def __init__(self, path: str, source: str, chunk_size: int):
+        self.path = path
+        stat = os.stat(source)
+        self.fingerprint = {'source': os.path.abspath(source), 'size': stat.st_size,
+                            'mtime': int(stat.st_mtime), 'chunk_size': chunk_size}
+        self.completed = set()
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding='utf-8') as f:
+                saved = json.load(f)
+            # A different file or chunking makes the saved chunk numbers meaningless
+            if saved.get('fingerprint') == self.fingerprint:
+                self.completed = set(saved.get('completed', []))
+        except (OSError, ValueError):
+            pass
+
+    def done(self, chunk_number: int):
+        with self._lock:
+            self.completed.add(chunk_number)
+            data = json.dumps({'fingerprint': self.fingerprint, 'completed': sorted(self.completed)})
+            tmp = f'{self.path}.{threading.get_ident()}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class ChunkedLoader:
+    """Upserts a stream of rows in fixed-size chunks over a bounded pool of concurrent requests.
+
+    Rows are read lazily: at most ``concurrency * 2`` chunks are held in
+    memory. With ``key`` (the upsert's conflict columns), rows repeating a key
+    are dropped, keeping the last: a first pass over the rows finds where each
+    key last occurs, and the second pass loads only those rows.
+    Failed chunks are retried with exponential backoff unless the error says
+    the request itself is wrong; chunks that still fail are left out of the
+    checkpoint so the next run retries them.
+    """
+
+    def __init__(self, upsert: Callable[[List[dict]], object], chunk_size: int = 500, concurrency: int = 4,
+                 retries: int = 5, backoff: float = 0.5, checkpoint: Optional[Checkpoint] = None,
+                 key: Optional[Sequence[str]] = None):
+        self.upsert = upsert
+        self.key = key
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.checkpoint = checkpoint
+        self.stats = {'rows': 0, 'duplicates': 0, 'chunks': 0, 'skipped_chunks': 0, 'retries': 0, 'failed_chunks': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _keep(self, rows: Iterable[dict], keep: Set[int]) -> Iterator[dict]:
+        for position, row in enumerate(rows):
+            if position in keep:
+                yield row
+            else:
+                self._count('duplicates')
+
+    def _load_chunk(self, chunk_number: int, chunk: List[dict]):
+        for attempt in range(self.retries + 1):
+            try:
+                self.upsert(chunk)
+                break
+            except Exception as e:
+                if not is_retryable(e):
+                    print(f"Chunk {chunk_number} failed, not retrying: {e}")
+                    self._count('failed_chunks')
+                    return
+                if attempt == self.retries:
+                    print(f"Chunk {chunk_number} failed after {self.retries} retries: {e}")
+                    self._count('failed_chunks')
+                    return
+                self._count('retries')
+                time.sleep(self.backoff * (2 ** attempt) + random.uniform(0, self.backoff))
+
+        if self.checkpoint:
+            self.checkpoint.done(chunk_number)
+        self._count('chunks')
+        self._count('rows', len(chunk))
+
+    def load(self, source: Callable[[], Iterable[dict]]) -> Dict[str, float]:
+        """Load the rows source() yields; it is called once more with ``key``, and must yield the same rows"""
+        start = time.perf_counter()
+        in_flight = threading.BoundedSemaphore(self.concurrency * 2)
+        completed = self.checkpoint.completed if self.checkpoint else set()
+        rows = source()
+        if self.key:
+            keep = last_positions(rows, self.key)
+            rows = self._keep(source(), keep)
+
+        def run(chunk_number, chunk):
+            try:
+                self._load_chunk(chunk_number, chunk)
+            finally:
+                in_flight.release()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for chunk_number, chunk in enumerate(chunked(rows, self.chunk_size)):
+                if chunk_number in completed:
+                    self._count('skipped_chunks')
+                    continue
+                in_flight.acquire()  # Back-pressure: stop reading while the pool is saturated
+                executor.submit(run, chunk_number, chunk)
+
+        self.stats['seconds'] = time.perf_counter() - start
+        self.stats['rows_per_sec'] = self.stats['rows'] / self.stats['seconds'] if self.stats['seconds'] else 0
+        return self.stats
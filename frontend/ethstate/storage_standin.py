@@ -0,0 +1,203 @@
+"""Local stand-in for the Supabase Storage API that bucket_setup.py and image_ingest.py use.
+
+    python storage_standin.py --port 54322 --latency 0.05 --fail-rate 0.1
+    NEXT_PUBLIC_SUPABASE_URL=http://localhost:54322 SUPABASE_SERVICE_ROLE_KEY=local \\
+        python image_ingest.py photos/
+
+Understands the requests supabase-py's storage client sends:
+POST /storage/v1/bucket creates a bucket, POST /storage/v1/object/<bucket>/<path>
+uploads a file (multipart, as the client sends it, or a raw body; x-upsert
+allows overwriting), HEAD checks an object exists, and GET
+/storage/v1/object[/public]/<bucket>/<path> downloads it. Objects are kept in
+memory. --latency delays every write and --fail-rate answers that share of
+writes with a 503.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+BOUNDARY = re.compile(r'boundary="?([^";]+)"?')
+
+
+def file_part(body: bytes, content_type: str):
+    """(data, content type) of the upload in a request body, multipart or raw"""
+    boundary = BOUNDARY.search(content_type) if content_type.startswith('multipart/form-data') else None
+    if boundary is None:
+        return body, content_type or 'application/octet-stream'
+    for part in body.split(b'--' + boundary.group(1).encode()):
+        head, _, data = part.partition(b'\r\n\r\n')
+        if b'name="file"' in head:
+            part_type = re.search(rb'content-type: *([^\r\n]+)', head, re.IGNORECASE)
+            return data[:-2], part_type.group(1).decode() if part_type else 'application/octet-stream'
+    return None, None
+
+
+class StorageStandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, latency: float = 0.0, fail_rate: float = 0.0):
+        super().__init__(('127.0.0.1', port), StorageHandler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.buckets = {}  # bucket -> {path: (data, content type)}
+        self.stats = {'requests': 0, 'uploads': 0, 'bytes': 0, 'failures': 0, 'peak_in_flight': 0}
+        self.in_flight = 0
+        self.lock = threading.Lock()
+
+    def objects(self, bucket: str) -> dict:
+        with self.lock:
+            return dict(self.buckets.get(bucket, {}))
+
+
+class StorageHandler(BaseHTTPRequestHandler):
+    server: StorageStandIn
+    protocol_version = 'HTTP/1.1'
+
+    def _route(self):
+        path = urlsplit(self.path).path
+        prefix = '/storage/v1/'
+        if not path.startswith(prefix):
+            return None
+        return [unquote(part) for part in path[len(prefix):].strip('/').split('/')]
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, error: str, message: str):
+        # The shape storage3 parses into a StorageApiError
+        self._send_json(status, {'statusCode': str(status), 'error': error, 'message': message})
+
+    def _object(self, parts):
+        """(bucket, path) from object/<bucket>/<path> or object/public/<bucket>/<path>"""
+        if len(parts) >= 4 and parts[:2] == ['object', 'public']:
+            return parts[2], '/'.join(parts[3:])
+        if len(parts) >= 3 and parts[0] == 'object':
+            return parts[1], '/'.join(parts[2:])
+        return None, None
+
+    def do_POST(self):
+        server = self.server
+        parts = self._route()
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with server.lock:
+            server.stats['requests'] += 1
+            server.in_flight += 1
+            server.stats['peak_in_flight'] = max(server.stats['peak_in_flight'], server.in_flight)
+        try:
+            time.sleep(server.latency)
+            if random.random() < server.fail_rate:
+                with server.lock:
+                    server.stats['failures'] += 1
+                self._send_error(503, 'Service unavailable', 'Service unavailable')
+                return
+            if parts == ['bucket']:
+                self._create_bucket(json.loads(body or b'{}'))
+                return
+            bucket, path = self._object(parts or [])
+            if bucket is None:
+                self._send_error(404, 'not_found', 'Not found')
+                return
+            self._upload(bucket, path, body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _create_bucket(self, options: dict):
+        server = self.server
+        name = options.get('id') or options.get('name')
+        with server.lock:
+            if name in server.buckets:
+                self._send_error(400, 'Duplicate', 'The resource already exists')
+                return
+            server.buckets[name] = {}
+        self._send_json(200, {'name': name})
+
+    def _upload(self, bucket: str, path: str, body: bytes):
+        server = self.server
+        data, content_type = file_part(body, self.headers.get('Content-Type', ''))
+        if data is None:
+            self._send_error(400, 'invalid_request', 'No file in the request')
+            return
+        upsert = self.headers.get('x-upsert', '').lower() == 'true'
+        with server.lock:
+            objects = server.buckets.get(bucket)
+            if objects is None:
+                self._send_error(404, 'Bucket not found', 'Bucket not found')
+                return
+            if path in objects and not upsert:
+                self._send_error(400, 'Duplicate', 'The resource already exists')
+                return
+            objects[path] = (data, content_type)
+            server.stats['uploads'] += 1
+            server.stats['bytes'] += len(data)
+        self._send_json(200, {'Key': f'{bucket}/{path}', 'Id': path})
+
+    def _find(self):
+        bucket, path = self._object(self._route() or [])
+        with self.server.lock:
+            self.server.stats['requests'] += 1
+            return self.server.buckets.get(bucket, {}).get(path)
+
+    def do_HEAD(self):
+        found = self._find()
+        self.send_response(200 if found else 404)
+        self.send_header('Content-Length', str(len(found[0])) if found else '0')
+        if found:
+            self.send_header('Content-Type', found[1])
+        self.end_headers()
+
+    def do_GET(self):
+        found = self._find()
+        if found is None:
+            self._send_error(404, 'not_found', 'Object not found')
+            return
+        data, content_type = found
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port: int = 0, **options) -> StorageStandIn:
+    """Serve from a background thread; port 0 picks a free port"""
+    server = StorageStandIn(port, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=54322)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds to wait before answering a write')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='share of writes answered with a 503')
+    parser.add_argument('--bucket', action='append', default=['property-images'], help='bucket to create up front')
+    args = parser.parse_args()
+
+    server = StorageStandIn(args.port, args.latency, args.fail_rate)
+    server.buckets.update({name: {} for name in args.bucket})
+    print(f'Storage stand-in on http://127.0.0.1:{args.port}/storage/v1/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    objects = sum(len(bucket) for bucket in server.buckets.values())
+    print(f"{server.stats['requests']} requests, {server.stats['uploads']} uploads "
+          f"({server.stats['bytes'] / 2**20:.1f} MiB), {server.stats['failures']} failures, {objects} objects stored")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""db_setup.py's scraper CSV load against postgrest_standin.py, with listings repeated across searches.
+
+    python -m pytest test_property_loader.py
+"""
+import csv
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import postgrest_standin  # noqa: E402
+from property_loader import ChunkedLoader, is_retryable, stream_scraper_csv  # noqa: E402
+
+SCRAPER_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scraper', 'zillow.csv')
+
+
+@pytest.fixture(scope='module')
+def standin():
+    server = postgrest_standin.start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def db_setup(standin, monkeypatch):
+    """db_setup.py with its client pointed at the stand-in, which starts out empty"""
+    monkeypatch.setenv('NEXT_PUBLIC_SUPABASE_URL', f'http://127.0.0.1:{standin.server_address[1]}')
+    monkeypatch.setenv('SUPABASE_SERVICE_ROLE_KEY', 'local')
+    standin.tables.clear()
+    import db_setup
+    return importlib.reload(db_setup)
+
+
+def test_csv_with_duplicate_urls_loads_last_copy_once(db_setup, standin, tmp_path):
+    with open(SCRAPER_CSV, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    urls = [row['URL'] for row in rows]
+    assert len(set(urls)) < len(urls)  # the scraper's own output repeats listings
+    rows.append(dict(rows[0], Price='$1,000'))  # a later copy with a different price wins
+    path = tmp_path / 'zillow.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    stats = db_setup.load_scraper_csv(str(path), chunk_size=5, concurrency=2, retries=1)
+
+    stored = {row['url']: row for row in standin.tables['properties'].values()}
+    assert stats['failed_chunks'] == 0
+    assert stats['rows'] == len(set(urls)) == len(stored)
+    assert stats['duplicates'] == len(rows) - len(set(urls))
+    assert stored[urls[0]]['price'] == '1,000'
+    assert not os.path.exists(str(path) + '.checkpoint')
+
+
+def test_delta_marks_delisted_rows_unavailable_without_inserting_them(db_setup, standin, tmp_path):
+    with open(SCRAPER_CSV, newline='', encoding='utf-8') as f:
+        rows = list({row['URL']: row for row in csv.DictReader(f)}.values())[:3]
+    loaded = tmp_path / 'zillow.csv'
+    with open(loaded, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows[:2])
+    db_setup.load_scraper_csv(str(loaded))
+
+    gone = 'https://www.zillow.com/homedetails/never-loaded/1_zpid/'
+    delta = tmp_path / 'zillow_delta.csv'
+    with open(delta, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['Change', 'ZPID'] + list(rows[0]), restval='')
+        writer.writeheader()
+        writer.writerow({'Change': 'new', **rows[2]})
+        writer.writerow({'Change': 'delisted', 'URL': rows[0]['URL']})
+        writer.writerow({'Change': 'delisted', 'URL': gone})
+    listed, delisted = db_setup.load_scraper_delta(str(delta), chunk_size=2)
+
+    stored = {row['url']: row for row in standin.tables['properties'].values()}
+    assert listed['failed_chunks'] == delisted['failed_chunks'] == 0
+    assert set(stored) == {row['URL'] for row in rows}
+    assert stored[rows[0]['URL']]['available'] is False
+    assert stored[rows[0]['URL']]['address'] == rows[0]['Address']
+    assert stored[rows[1]['URL']]['available'] is True
+
+
+def test_duplicate_keys_in_one_upsert_fail_without_retries(db_setup, standin):
+    def upsert(chunk):
+        db_setup.supabase.table('properties').upsert(chunk, on_conflict='url').execute()
+
+    loader = ChunkedLoader(upsert, chunk_size=100, retries=3, backoff=0)
+    stats = loader.load(lambda: stream_scraper_csv(SCRAPER_CSV))
+
+    assert stats['failed_chunks'] == 1
+    assert stats['retries'] == 0
+    assert not standin.tables.get('properties')
+
+
+class Error(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+@pytest.mark.parametrize('error, retryable', [
+    (ConnectionError('reset'), True),
+    (Error(None), True),
+    (Error(503), True),
+    (Error(429), True),
+    (Error(400), False),
+    (Error('21000'), False),  # ON CONFLICT DO UPDATE command cannot affect row a second time
+    (Error('23505'), False),  # unique violation
+    (Error('57014'), True),  # statement timeout
+    (Error('40P01'), True),  # deadlock
+    (Error('PGRST001'), True),
+    (Error('PGRST204'), False),
+])
+def test_is_retryable(error, retryable):
+    assert is_retryable(error) is retryable
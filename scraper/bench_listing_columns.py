@@ -0,0 +1,168 @@
+"""Benchmark: typed columnar listings against the scraper's CSV.
+
+Synthesizes N listings with the display strings the cards use (including
+"$1.2M" prices, studios, half baths, lots in acres, "--" placeholders and
+numbers too large for their column), then times:
+
+- normalizing them, per row in Python vs vectorized with normalize()
+- one query ("3+ bed homes in 92037 up to $2M": count and mean price) from
+  the CSV parsed row by row, the CSV read and normalized by Arrow, Parquet
+  with the filter pushed into the scan, and memory-mapped Arrow IPC
+
+Every path must give the same answer, and the per-row normalization must
+match the vectorized one exactly.
+
+    python bench_listing_columns.py --listings 1000000
+"""
+import argparse
+import csv
+import os
+import random
+import re
+import tempfile
+import time
+
+import pyarrow.compute as pc
+
+from listing_columns import CSV_COLUMNS, normalize, raw_table, read_columnar, read_listing_csv, write_columnar
+
+CITIES = [("La Jolla", "92037"), ("San Diego", "92122"), ("San Diego", "92117"), ("Del Mar", "92014"),
+          ("Boston", "02116")]
+
+NUMBER = re.compile(r'(\d[\d,]*(?:\.\d+)?)\s*([KkMm]?)')
+AREA = re.compile(r'(\d[\d,]*(?:\.\d+)?)\s*(sq\.? ?ft|acres?)', re.IGNORECASE)
+ADDRESS_END = re.compile(r', ([A-Z]{2}) (\d{5})(?:-\d{4})?$')
+SCALE = {'M': 1e6, 'K': 1e3}
+
+
+def listing(i: int, rng: random.Random) -> dict:
+    city, zip_code = rng.choice(CITIES)
+    price = rng.randrange(300, 20000) * 1000
+    beds = rng.randrange(0, 8)
+    return {
+        "Address": f"{rng.randrange(1, 9999)} Example St{' UNIT 4' if i % 7 == 0 else ''}, {city}, CA {zip_code}",
+        "Broker": rng.choice(["COMPASS", "PACASO INC.", "EXP REALTY OF CALIFORNIA, INC."]),
+        "Price": f"${price / 1e6:.1f}M" if i % 50 == 0 else f"${price:,}" if i % 997 else "$99,999,999,999,999,999,999",
+        "Beds": "Studio" if beds == 0 else ("1 bd" if beds == 1 else f"{beds} bds" if i % 991 else "99999 bds"),
+        "Bathrooms": f"{rng.randrange(1, 12) / 2:g} ba",
+        "Square Footage": ("-- sqft" if i % 40 == 0 else f"{rng.randrange(1, 500) / 100:g} acres lot" if i % 45 == 0
+                           else f"{rng.randrange(400, 15000):,} sqft"),
+        "URL": f"https://www.zillow.com/homedetails/{i}-Example-St/{10000000 + i}_zpid/",
+    }
+
+
+def number(text: str, scaled: bool = False):
+    match = NUMBER.search(text)
+    if match is None:
+        return None
+    value = float(match.group(1).replace(',', ''))
+    return value * SCALE.get(match.group(2).upper(), 1.0) if scaled else value
+
+
+def area(text: str):
+    match = AREA.search(text)
+    if match is None:
+        return None
+    value = float(match.group(1).replace(',', ''))
+    return value * 43560 if match.group(2).lower().startswith('ac') else value
+
+
+def integer(value, bits: int):
+    """Rounded, or None when a signed integer of ``bits`` can't hold it"""
+    if value is None:
+        return None
+    value = round(value)
+    return value if -2 ** (bits - 1) <= value < 2 ** (bits - 1) else None
+
+
+def normalize_row(row: dict) -> dict:
+    """What each consumer of the CSV does today: parse the display strings one row at a time"""
+    end = ADDRESS_END.search(row["Address"])
+    well_formed = end is not None and row["Address"].count(", ") >= 2
+    beds = 0 if "studio" in row["Beds"].lower() else number(row["Beds"])
+    return {
+        "city": row["Address"].rsplit(", ", 2)[1] if well_formed else None,
+        "zip": end.group(2) if well_formed else None,
+        "price": integer(number(row["Price"], scaled=True), 64),
+        "beds": integer(beds, 16),
+        "baths": number(row["Bathrooms"]),
+        "sqft": integer(area(row["Square Footage"]), 32),
+    }
+
+
+def matches(price, beds, zip_code) -> bool:
+    return price is not None and price <= 2000000 and beds is not None and beds >= 3 and zip_code == "92037"
+
+
+QUERY = (pc.field("price") <= 2000000) & (pc.field("beds") >= 3) & (pc.field("zip") == "92037")
+
+
+def answer(table) -> tuple:
+    return table.num_rows, round(pc.mean(table.column("price")).as_py() or 0, 2)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def query_csv_rows(path: str) -> tuple:
+    prices = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            typed = normalize_row(row)
+            if matches(typed["price"], typed["beds"], typed["zip"]):
+                prices.append(typed["price"])
+    return len(prices), round(sum(prices) / len(prices), 2) if prices else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--listings', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    rows = [listing(i, rng) for i in range(args.listings)]
+
+    reference, row_seconds = timed(lambda: [normalize_row(row) for row in rows])
+    raw, convert_seconds = timed(lambda: raw_table(rows))
+    table, vector_seconds = timed(lambda: normalize(raw))
+    for name in ("city", "zip", "price", "beds", "baths", "sqft"):
+        if table.column(name).to_pylist() != [typed[name] for typed in reference]:
+            raise SystemExit(f'Vectorized {name} differs from the per-row parse')
+    print(f"normalize {args.listings} listings: per row {row_seconds:.2f}s, vectorized {vector_seconds:.2f}s "
+          f"({row_seconds / vector_seconds:.1f}x; building the Arrow table from the rows took {convert_seconds:.2f}s)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {fmt: os.path.join(directory, f'listings.{fmt}') for fmt in ('csv', 'parquet', 'arrow')}
+        with open(paths['csv'], 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        write_columnar(table, paths['parquet'])
+        write_columnar(table, paths['arrow'])
+
+        runs = {
+            'csv, parsed per row': lambda: query_csv_rows(paths['csv']),
+            'csv, arrow + normalize': lambda: answer(normalize(read_listing_csv(paths['csv'])).filter(QUERY)),
+            'parquet, filter pushed down': lambda: answer(read_columnar(paths['parquet'], ['price'], QUERY)),
+            'arrow ipc, memory-mapped': lambda: answer(read_columnar(paths['arrow'], ['price'], QUERY)),
+        }
+        results = {name: timed(run) for name, run in runs.items()}
+        sizes = {fmt: os.path.getsize(path) for fmt, path in paths.items()}
+
+    answers = {result for result, _ in results.values()}
+    if len(answers) != 1:
+        raise SystemExit(f'Query answers differ: {results}')
+    count, mean_price = answers.pop()
+    print(f"query matched {count} listings, mean price {mean_price:,.0f}")
+    print(f"{'source':<30} {'seconds':>8} {'speedup':>8}")
+    baseline = results['csv, parsed per row'][1]
+    for name, (_, seconds) in results.items():
+        print(f"{name:<30} {seconds:>8.3f} {baseline / seconds:>7.0f}x")
+    print("file sizes: " + ", ".join(f"{fmt} {size / 2**20:.1f} MiB" for fmt, size in sizes.items()))
+
+
+if __name__ == '__main__':
+    main()
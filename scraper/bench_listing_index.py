@@ -0,0 +1,193 @@
+"""Benchmark: listing_index.py queries and delta updates at large listing counts.
+
+Synthesizes N typed listings over many cities, zips and brokers, then times
+a mix of multi-predicate searches against a vectorized scan of the whole
+table (the scan's answer is the reference). Next it applies a run of scrape
+deltas, each with --churn of the listings changed and as many new and
+delisted, which is enough to force at least one merge into the base index.
+After every delta the searches are checked again. Any mismatch fails the run.
+
+    python bench_listing_index.py --listings 500000 --queries 2000
+"""
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from listing_columns import CSV_COLUMNS, normalize, raw_table
+from listing_index import ListingIndex
+
+BROKERS = ["COMPASS", "PACASO INC.", "EXP REALTY OF CALIFORNIA, INC.", "COLDWELL BANKER REALTY",
+           "BERKSHIRE HATHAWAY HOMESERVICES", "REDFIN", "KELLER WILLIAMS REALTY", "SOTHEBY'S INTERNATIONAL REALTY"]
+BROKERS += [f"INDEPENDENT REALTY {i}" for i in range(40)]
+CITIES = ["La Jolla", "San Diego", "Del Mar", "Carlsbad", "Encinitas", "Coronado", "Oceanside", "Escondido"]
+CITIES += [f"Town {i}" for i in range(192)]
+ZIPS = {city: [f"{92000 + 5 * i + j:05d}" for j in range(1 + i % 5)] for i, city in enumerate(CITIES)}
+
+
+def listing(zpid: int, rng: random.Random) -> dict:
+    city = CITIES[min(int(rng.expovariate(0.05)), len(CITIES) - 1)]  # a few large cities, a long tail
+    price = rng.randrange(300, 20000) * 1000
+    beds = rng.randrange(0, 8)
+    return {
+        "Address": f"{zpid % 9999} Example St, {city}, CA {rng.choice(ZIPS[city])}",
+        "Broker": BROKERS[min(int(rng.expovariate(0.15)), len(BROKERS) - 1)],
+        "Price": f"${price:,}",
+        "Beds": "Studio" if beds == 0 else f"{beds} bds",
+        "Bathrooms": f"{rng.randrange(1, 12) / 2:g} ba",
+        "Square Footage": "-- sqft" if zpid % 40 == 0 else f"{rng.randrange(400, 15000):,} sqft",
+        "URL": f"https://www.zillow.com/homedetails/{zpid}-Example-St/{zpid}_zpid/",
+    }
+
+
+def query(rng: random.Random) -> dict:
+    """Filters a search page sends: usually a place, plus some of price, beds, baths, sqft and broker"""
+    filters = {}
+    if rng.random() < 0.8:
+        filters["city"] = CITIES[min(int(rng.expovariate(0.05)), len(CITIES) - 1)]
+    elif rng.random() < 0.5:
+        filters["zip"] = rng.choice(ZIPS[rng.choice(CITIES[:20])])
+    if rng.random() < 0.7:
+        low = rng.randrange(300, 10000) * 1000
+        filters["price"] = (low, low + rng.randrange(500, 5000) * 1000)
+    if rng.random() < 0.6:
+        filters["beds"] = (rng.randrange(1, 5), None)
+    if rng.random() < 0.3:
+        filters["baths"] = (rng.randrange(1, 4), None)
+    if rng.random() < 0.4:
+        filters["sqft"] = (None, rng.randrange(1000, 6000))
+    if rng.random() < 0.3:
+        filters["broker"] = rng.choice(BROKERS[:6])
+    return filters
+
+
+def scan(table: pa.Table, filters: dict, limit: int) -> tuple:
+    """Reference answer: filter every row, then sort all matches by price"""
+    mask = pa.scalar(True)
+    for name, value in filters.items():
+        if isinstance(value, tuple):
+            low, high = value
+            if low is not None:
+                mask = pc.and_(mask, pc.greater_equal(table.column(name), low))
+            if high is not None:
+                mask = pc.and_(mask, pc.less_equal(table.column(name), high))
+        else:
+            mask = pc.and_(mask, pc.equal(pc.utf8_lower(table.column(name)), value.lower()))
+    matches = table.filter(pc.fill_null(mask, False)) if filters else table
+    prices = matches.column("price").to_numpy(zero_copy_only=False)
+    return matches.num_rows, sorted(prices.tolist())[:limit], set(matches.column("zpid").to_pylist())
+
+
+def check(index: ListingIndex, table: pa.Table, queries: list, limit: int) -> int:
+    """Queries whose count, returned prices or returned listings differ from the scan"""
+    wrong = 0
+    for filters in queries:
+        count, listings = index.search("price", limit, **filters)
+        expected_count, expected_prices, expected_zpids = scan(table, filters, limit)
+        if (count != expected_count or [listing["price"] for listing in listings] != expected_prices
+                or any(listing["zpid"] not in expected_zpids for listing in listings)):
+            wrong += 1
+    return wrong
+
+
+def percentiles(seconds: list) -> str:
+    p50, p99 = np.percentile(np.array(seconds) * 1000, [50, 99])
+    return f"p50 {p50:.3f} ms, p99 {p99:.3f} ms"
+
+
+def write_delta(path: str, changes: list):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["Change", "ZPID"] + CSV_COLUMNS, restval="")
+        writer.writeheader()
+        for change, zpid, row in changes:
+            writer.writerow({"Change": change, "ZPID": zpid, **row})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--listings', type=int, default=500000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--checked', type=int, default=200, help='queries compared with the scan after each delta')
+    parser.add_argument('--deltas', type=int, default=4)
+    parser.add_argument('--churn', type=float, default=0.01, help='fraction of listings changed per delta')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    first = 10000000
+    table = normalize(raw_table([listing(first + i, rng) for i in range(args.listings)]))
+    start = time.perf_counter()
+    index = ListingIndex(table)
+    build_seconds = time.perf_counter() - start
+    print(f"indexed {args.listings} listings in {build_seconds:.2f}s, "
+          f"{index.stats()['bytes'] / args.listings:.0f} B/listing including the listings themselves")
+
+    queries = [query(rng) for _ in range(args.queries)]
+    index_seconds, scan_seconds, matched = [], [], []
+    for filters in queries:
+        start = time.perf_counter()
+        count, _ = index.search("price", args.limit, **filters)
+        index_seconds.append(time.perf_counter() - start)
+        matched.append(count)
+    for filters in queries[:args.checked]:
+        start = time.perf_counter()
+        scan(table, filters, args.limit)
+        scan_seconds.append(time.perf_counter() - start)
+    print(f"{args.queries} searches, median {int(np.median(matched))} matches: index {percentiles(index_seconds)}; "
+          f"full scan {percentiles(scan_seconds)}")
+    example = {"city": "La Jolla", "beds": (3, None), "price": (1000000, 3000000), "sqft": (None, 2500),
+               "broker": "COMPASS"}
+    example_seconds = []
+    for _ in range(100):
+        start = time.perf_counter()
+        count, _ = index.search("price", args.limit, **example)
+        example_seconds.append(time.perf_counter() - start)
+    print(f"La Jolla, 3+ beds, $1M-$3M, under 2,500 sqft, COMPASS: {count} matches, {percentiles(example_seconds)}")
+    broad = [seconds for seconds, count in zip(index_seconds, matched) if count > args.listings // 10]
+    if broad:
+        print(f"{len(broad)} searches matching over a tenth of the listings: {percentiles(broad)}")
+    wrong = check(index, table, queries[:args.checked], args.limit)
+
+    next_zpid = first + args.listings
+    churn = int(args.listings * args.churn)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "zillow_delta.csv")
+        for delta in range(args.deltas):
+            zpids = table.column("zpid").to_pylist()
+            picked = rng.sample(zpids, 2 * churn)
+            changes = [("changed", zpid, listing(zpid, rng)) for zpid in picked[:churn]]
+            changes += [("new", next_zpid + i, listing(next_zpid + i, rng)) for i in range(churn)]
+            changes += [("delisted", zpid, {"URL": listing(zpid, rng)["URL"]}) for zpid in picked[churn:]]
+            next_zpid += churn
+            write_delta(path, changes)
+
+            merges = index.merges
+            start = time.perf_counter()
+            index.apply_delta(path)
+            apply_seconds = time.perf_counter() - start
+            upserted = normalize(raw_table([row for change, _, row in changes if change != "delisted"]))
+            kept = pc.invert(pc.is_in(table.column("zpid"), pa.array(picked, pa.int64())))
+            table = pa.concat_tables([table.filter(kept), upserted])
+            wrong += check(index, table, queries[:args.checked], args.limit)
+            print(f"delta {delta + 1}: {len(changes)} rows applied in {apply_seconds:.2f}s"
+                  f"{' (merged into the base)' if index.merges > merges else ''}; "
+                  f"segments {index.stats()['segments']}, {len(index)} live listings")
+
+    start = time.perf_counter()
+    for filters in queries:
+        index.search("price", args.limit, **filters)
+    print(f"searches after the deltas: {(time.perf_counter() - start) / len(queries) * 1000:.3f} ms mean")
+    if wrong or len(index) != table.num_rows:
+        raise SystemExit(f"{wrong} searches differ from the full scan; {len(index)} vs {table.num_rows} listings")
+    print(f"all searches match the full scan ({args.checked} queries after each of {args.deltas + 1} states)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Parse benchmark for the listing parser backends over the saved fixtures.
+
+Every backend must produce exactly the same records and next-page URL as the
+BeautifulSoup reference for every page; any mismatch is reported and fails
+the run. Besides the saved pages, a large result page is synthesized by
+repeating the fixture cards, since real search pages can carry hundreds.
+
+    python bench_parsers.py --repeat 20 --large-cards 500 --json parse_bench.json
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from listing_parsers import PARSERS
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+LIST_OPEN = 'photo-cards">'
+LIST_CLOSE = '</ul></div>'
+
+
+def load_pages(fixtures_dir: str, large_cards: int):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, '**', '*.html'), recursive=True)):
+        with open(path, 'rb') as f:
+            content = f.read()
+        search = os.path.basename(os.path.dirname(path))
+        pages.append((os.path.relpath(path, fixtures_dir), content, f'https://www.zillow.com/{search}/'))
+
+    if large_cards and pages:
+        # Repeat the card list of the first fixture until the page holds large_cards cards
+        text = pages[0][1].decode('utf-8')
+        start = text.index(LIST_OPEN) + len(LIST_OPEN)
+        end = text.index(LIST_CLOSE, start)
+        items = text[start:end]
+        per_copy = max(items.count('data-test="property-card-addr"'), 1)
+        copies = -(-large_cards // per_copy)
+        large = text[:start] + items * copies + text[end:]
+        pages.append((f'synthetic-{copies * per_copy}-cards.html', large.encode('utf-8'), pages[0][2]))
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--repeat', type=int, default=20, help='passes over the pages per backend')
+    parser.add_argument('--large-cards', type=int, default=500, help='cards on the synthetic large page (0 to skip)')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    pages = load_pages(args.fixtures, args.large_cards)
+    if not pages:
+        sys.exit(f'No fixtures found in {args.fixtures}')
+
+    # Identity check against the reference backend
+    reference = {name: PARSERS['bs4'](content, url) for name, content, url in pages}
+    mismatches = []
+    for backend, parse in PARSERS.items():
+        for name, content, url in pages:
+            if parse(content, url) != reference[name]:
+                mismatches.append((backend, name))
+
+    results = []
+    print(f"{'backend':<8} {'pages':>7} {'cards':>8} {'seconds':>9} {'cards/s':>11} {'speedup':>8}")
+    baseline = None
+    for backend, parse in PARSERS.items():
+        cards = 0
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for name, content, url in pages:
+                cards += len(parse(content, url)[0])
+        elapsed = time.perf_counter() - start
+        rate = cards / elapsed
+        baseline = baseline or rate
+        results.append({'backend': backend, 'pages': len(pages) * args.repeat, 'cards': cards,
+                        'seconds': elapsed, 'cards_per_sec': rate, 'speedup': rate / baseline})
+        print(f"{backend:<8} {len(pages) * args.repeat:>7} {cards:>8} {elapsed:>9.3f} {rate:>11,.0f} {rate / baseline:>7.1f}x")
+
+    if mismatches:
+        for backend, name in mismatches:
+            print(f'MISMATCH  {backend} differs from bs4 on {name}')
+    else:
+        print(f'All {len(PARSERS)} backends produced identical records on {len(pages)} pages')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'results': results, 'mismatches': mismatches}, f, indent=2)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark: incremental scrape diffing at large listing counts.
+
+Synthesizes N listings, records them as the previous run, then diffs a run
+in which a fraction of them changed price, a few were delisted and as many
+new ones appeared. Reports diff and state save/load time, the state file's
+size, and how many rows the delta holds compared to the full CSV.
+
+    python bench_scrape_state.py --listings 1000000 --churn 0.01
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from scrape_state import ScrapeState
+from zillow_scrape import csv_header
+
+
+def listing(zpid: int, price: int) -> dict:
+    return {
+        "Address": f"{zpid % 10000} Example St, La Jolla, CA 92037",
+        "Broker": "COMPASS",
+        "Price": f"${price:,}",
+        "Beds": "3 bds",
+        "Bathrooms": "2 ba",
+        "Square Footage": "1,800 sqft",
+        "URL": f"https://www.zillow.com/homedetails/{zpid % 10000}-Example-St-La-Jolla-CA-92037/{zpid}_zpid/",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--listings', type=int, default=1000000)
+    parser.add_argument('--churn', type=float, default=0.01, help='fraction of listings changed, and again added')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    first = 10000000
+    previous = [listing(first + i, 1000000 + i) for i in range(args.listings)]
+    churn = int(args.listings * args.churn)
+    current = list(previous)
+    changed = set(rng.sample(range(args.listings), churn))
+    for i in changed:
+        current[i] = listing(first + i, 2000000 + i)  # price change
+    delisted = set(rng.sample(range(args.listings), churn // 10))
+    current = [row for i, row in enumerate(current) if i not in delisted]
+    current += [listing(first + args.listings + i, 500000) for i in range(churn)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'state.tsv')
+        state = ScrapeState(path)
+        state.diff(previous, csv_header)
+        state.save()
+
+        start = time.perf_counter()
+        state = ScrapeState(path)
+        load_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        changes, counts = state.diff(current, csv_header)
+        diff_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        state.save()
+        save_seconds = time.perf_counter() - start
+        state_bytes = os.path.getsize(path)
+
+    expected = {'new': churn, 'changed': len(changed - delisted), 'delisted': len(delisted)}
+    if any(counts[change] != n for change, n in expected.items()):
+        raise SystemExit(f'Unexpected delta counts {counts}')
+    print(f"{len(current)} listings, {args.churn:.1%} churn: delta of {len(changes)} rows "
+          f"({counts['new']} new, {counts['changed']} changed, {counts['delisted']} delisted), "
+          f"{len(changes) / len(current):.2%} of the full CSV")
+    print(f"state file {state_bytes / 2**20:.1f} MiB ({state_bytes / args.listings:.0f} B/listing); "
+          f"load {load_seconds:.2f}s, diff {diff_seconds:.2f}s, save {save_seconds:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from response_cache import ResponseCache
+
+# Responses worth retrying; anything else non-200 is final
+TRANSIENT_STATUS = {429, 500, 502, 503, 504}
+
+# parse_page(content, url) -> (records, next page url or None)
+PageParser = Callable[[bytes, str], Tuple[List[dict], Optional[str]]]
+
+
+class HostLimiter:
+    """Caps in-flight requests to one host and spaces out their start times"""
+
+    def __init__(self, max_in_flight: int, requests_per_second: float):
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._interval = 1 / requests_per_second if requests_per_second > 0 else 0
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def __enter__(self):
+        self._slots.acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self._interval
+        if start > now:
+            time.sleep(start - now)
+        return self
+
+    def __exit__(self, *exc):
+        self._slots.release()
+
+
+class FetchPipeline:
+    """Concurrent, polite crawler for paginated search result pages.
+
+    Each page is parsed on the worker thread that fetched it, and the next
+    page it links to is queued right away, so parsing overlaps with the
+    network wait of other pages.
+    """
+
+    def __init__(self, parse_page: PageParser, headers: Optional[dict] = None,
+                 concurrency: int = 8, per_host: int = 2, requests_per_second: float = 1.0,
+                 retries: int = 3, backoff: float = 0.5, timeout: Tuple[float, float] = (5, 20),
+                 max_pages: int = 20, cache: Optional[ResponseCache] = None):
+        self.parse_page = parse_page
+        self.parser_name = getattr(parse_page, '__name__', 'parser')
+        self.cache = cache
+        self.headers = headers or {}
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.requests_per_second = requests_per_second
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.max_pages = max_pages
+
+        self._limiters: Dict[str, HostLimiter] = {}
+        self._limiters_lock = threading.Lock()
+        self._sessions = threading.local()
+        self.stats = {'pages': 0, 'retries': 0, 'failures': 0, 'truncated': 0}  # truncated: next pages past max_pages
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _limiter(self, url: str) -> HostLimiter:
+        host = urlsplit(url).netloc
+        with self._limiters_lock:
+            if host not in self._limiters:
+                self._limiters[host] = HostLimiter(self.per_host, self.requests_per_second)
+            return self._limiters[host]
+
+    def _session(self) -> requests.Session:
+        # One keep-alive session per worker thread
+        if not hasattr(self._sessions, 'session'):
+            self._sessions.session = requests.Session()
+            self._sessions.session.headers.update(self.headers)
+        return self._sessions.session
+
+    def _retry_delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * (2 ** attempt) + random.uniform(0, self.backoff)
+
+    def fetch(self, url: str, headers: Optional[dict] = None) -> Optional[requests.Response]:
+        """GET with per-host limits and exponential backoff on transient failures"""
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                with self._limiter(url):
+                    response = self._session().get(url, headers=headers, timeout=self.timeout)
+                if response.status_code in (200, 304):
+                    return response
+                if response.status_code not in TRANSIENT_STATUS:
+                    print(f"Error processing {url}: HTTP {response.status_code}")
+                    break
+                error = f"HTTP {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
+
+            if attempt < self.retries:
+                self._count('retries')
+                time.sleep(self._retry_delay(attempt, response))
+            else:
+                print(f"Error processing {url}: {error} after {self.retries} retries")
+
+        self._count('failures')
+        return None
+
+    def _parse(self, content: bytes, url: str) -> Optional[Tuple[List[dict], Optional[str]]]:
+        """Records and next page url, or None when the page is not a usable result page"""
+        try:
+            records, next_url = self.parse_page(content, url)
+        except Exception as e:
+            print(f"Error processing {url}: {str(e)}")
+            return None
+        if not records and next_url:
+            # Only the last result page can run out of listings
+            print(f"Error processing {url}: no listings on a page that links to another")
+            return None
+        return records, next_url
+
+    def _from_cache(self, entry: dict, url: str) -> Optional[Tuple[List[dict], Optional[str]]]:
+        parsed = self.cache.parsed(entry, self.parser_name)
+        if parsed is not None:
+            return parsed
+        body = self.cache.body(entry)
+        if body is None:
+            return None
+        result = self._parse(body, url)
+        if result is not None:
+            self.cache.store_parsed(entry, self.parser_name, *result)
+        return result  # None fetches the page again rather than remembering a failed parse
+
+    def _process(self, url: str) -> Tuple[List[dict], Optional[str]]:
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry is not None and entry['fresh']:
+            result = self._from_cache(entry, url)
+            if result is not None:
+                self.cache.hit()
+                self._count('pages')
+                return result
+
+        headers = self.cache.conditional_headers(entry) if self.cache else None
+        response = self.fetch(url, headers)
+        if response is not None and response.status_code == 304:
+            self.cache.revalidated(url)
+            result = self._from_cache(entry, url)
+            if result is not None:
+                self._count('pages')
+                return result
+            response = self.fetch(url)  # Cached body went missing; fetch it in full
+        if response is None:
+            return [], None
+
+        self._count('pages')
+        result = self._parse(response.content, url)
+        if result is None:
+            # Parse errors, block pages and empty pages mid-run mean listings went unseen
+            self._count('failures')
+            return [], None
+        records, next_url = result
+        if self.cache:
+            entry = self.cache.store(url, response.content, response.headers)
+            self.cache.store_parsed(entry, self.parser_name, records, next_url)
+        return records, next_url
+
+    def crawl(self, start_urls: Iterable[str]) -> Iterator[Tuple[int, int, str, List[dict]]]:
+        """Yield (start url index, page number, url, records) as each page is parsed"""
+        seen = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = {}
+            for index, url in enumerate(start_urls):
+                if url not in seen:
+                    seen.add(url)
+                    pending[executor.submit(self._process, url)] = (index, 1, url)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, page, url = pending.pop(future)
+                    records, next_url = future.result()
+                    if next_url and next_url not in seen:
+                        if page < self.max_pages:
+                            seen.add(next_url)
+                            pending[executor.submit(self._process, next_url)] = (index, page + 1, next_url)
+                        else:
+                            self._count('truncated')
+                    yield index, page, url, records
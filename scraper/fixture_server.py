@@ -0,0 +1,131 @@
+"""Local stand-in for zillow.com serving the saved result pages in fixtures/.
+
+    python fixture_server.py --port 8000 --latency 0.2 --fail-every 5
+    python zillow_scrape.py --base-url http://localhost:8000 --output fixture.csv
+
+/<search>/ serves fixtures/<search>/page-1.html and /<search>/<n>_p/ serves
+page-<n>.html. --fail-every answers every n-th request with a 503 to exercise
+retries, and --latency delays every response to simulate network wait.
+Pages carry ETag / Last-Modified headers and conditional requests get a 304.
+"""
+import argparse
+import email.utils
+import hashlib
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+PAGE_PATH = re.compile(r'^/(?P<search>[\w-]+)/(?:(?P<page>\d+)_p/)?$')
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, fixtures_dir: str = FIXTURES_DIR, latency: float = 0.0, fail_every: int = 0):
+        super().__init__(('127.0.0.1', port), FixtureHandler)
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+        self.fail_every = fail_every
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    def fixture_path(self, path: str):
+        match = PAGE_PATH.match(path.split('?', 1)[0])
+        if not match:
+            return None
+        page = match.group('page') or '1'
+        return os.path.join(self.fixtures_dir, match.group('search'), f'page-{page}.html')
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    server: FixtureServer
+
+    def do_GET(self):
+        server = self.server
+        with server._lock:
+            server.requests += 1
+            count = server.requests
+            server.in_flight += 1
+            server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+        try:
+            time.sleep(server.latency)
+            if server.fail_every and count % server.fail_every == 0:
+                self.send_response(503)
+                self.send_header('Retry-After', '0')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            path = server.fixture_path(self.path)
+            if path is None or not os.path.isfile(path):
+                self.send_error(404)
+                return
+            with open(path, 'rb') as f:
+                body = f.read()
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()
+            last_modified = email.utils.formatdate(int(os.path.getmtime(path)), usegmt=True)
+
+            if self._not_modified(etag, os.path.getmtime(path)):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server._lock:
+                server.in_flight -= 1
+
+    def _not_modified(self, etag: str, mtime: float) -> bool:
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return int(mtime) <= email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(port: int = 0, **options) -> FixtureServer:
+    """Serve fixtures from a background thread; port 0 picks a free port"""
+    server = FixtureServer(port, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds to wait before each response')
+    parser.add_argument('--fail-every', type=int, default=0, help='answer every n-th request with a 503')
+    args = parser.parse_args()
+
+    server = FixtureServer(args.port, args.fixtures, args.latency, args.fail_every)
+    print(f'Serving {args.fixtures} on http://127.0.0.1:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f'{server.requests} requests, peak of {server.peak_in_flight} in flight')
+
+
+if __name__ == '__main__':
+    main()
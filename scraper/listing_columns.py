@@ -0,0 +1,162 @@
+"""Typed, columnar listings: the scraper's display strings normalized in one vectorized pass.
+
+The CSV keeps what the cards show ("$108,000,000", "10 bds", "2.5 ba",
+"12,981 sqft", "1900 Spindrift Dr, La Jolla, CA 92037"). normalize() turns
+a table of those strings into numeric columns and splits the address, each
+field with a few Arrow compute kernels over the whole column rather than
+Python per row. Fields that can't be read (e.g. "--" sqft) become nulls,
+as do areas in units other than square feet or acres (which are converted)
+and numbers too large for their column.
+The result is written as Parquet (.parquet) or Arrow IPC (.arrow), so
+readers get typed columns and can push numeric filters down into the scan.
+
+    python listing_columns.py zillow.csv                  # writes zillow.parquet
+    python listing_columns.py la_jolla.csv --output la_jolla.arrow
+"""
+import argparse
+import os
+from typing import Dict, List
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+# The columns zillow_scrape.py writes
+CSV_COLUMNS = ["Address", "Broker", "Price", "Beds", "Bathrooms", "Square Footage", "URL"]
+
+SCHEMA = pa.schema([
+    ("zpid", pa.int64()),
+    ("street", pa.string()),
+    ("city", pa.string()),
+    ("state", pa.string()),
+    ("zip", pa.string()),  # Kept as text: ZIP codes can start with 0
+    ("broker", pa.string()),
+    ("price", pa.int64()),  # US dollars
+    ("beds", pa.int16()),  # 0 for a studio
+    ("baths", pa.float32()),  # Half baths count as .5
+    ("sqft", pa.int32()),
+    ("url", pa.string()),
+])
+
+# The first number in a field, with thousands separators, and for prices an optional K/M suffix ("$1.2M")
+NUMBER = r'(?P<number>\d[\d,]*(?:\.\d+)?)'
+SCALED_NUMBER = NUMBER + r'\s*(?P<suffix>[KkMm]?)'
+# An area with its unit: "12,981 sqft", or "0.26 acres lot" for land
+AREA = NUMBER + r'\s*(?P<unit>(?i)sq\.? ?ft|acres?)'
+SQFT_PER_ACRE = 43560
+# "<street>, <city>, <state> <zip>"; the last two parts of the address split from the right
+ADDRESS_END = r', [A-Z]{2} \d{5}(?:-\d{4})?$'
+ZPID = r'/(?P<zpid>\d{1,18})_zpid'  # Longer ids would overflow int64
+
+
+def parse_numbers(values: pa.ChunkedArray, scaled: bool = False) -> pa.ChunkedArray:
+    """First number in each string as float64, null where there is none; ``scaled`` applies K/M suffixes"""
+    parts = pc.extract_regex(values, SCALED_NUMBER if scaled else NUMBER)
+    numbers = pc.cast(pc.replace_substring(pc.struct_field(parts, 'number'), ',', ''), pa.float64())
+    if not scaled:
+        return numbers
+    suffix = pc.utf8_upper(pc.struct_field(parts, 'suffix'))
+    scale = pc.if_else(pc.equal(suffix, 'M'), 1e6, pc.if_else(pc.equal(suffix, 'K'), 1e3, 1.0))
+    return pc.multiply(numbers, scale)
+
+
+def parse_areas(values: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Each string's area in square feet as float64, null without a number in square feet or acres"""
+    parts = pc.extract_regex(values, AREA)
+    numbers = pc.cast(pc.replace_substring(pc.struct_field(parts, 'number'), ',', ''), pa.float64())
+    acres = pc.starts_with(pc.struct_field(parts, 'unit'), 'ac', ignore_case=True)
+    return pc.if_else(acres, pc.multiply(numbers, float(SQFT_PER_ACRE)), numbers)
+
+
+def to_integers(values: pa.ChunkedArray, type: pa.DataType) -> pa.ChunkedArray:
+    """Values rounded for an integer column of ``type``, null where it can't hold them"""
+    values = pc.round(values)
+    limit = 2.0 ** (type.bit_width - 1)
+    in_range = pc.and_(pc.greater_equal(values, -limit), pc.less(values, limit))
+    return pc.if_else(in_range, values, pa.scalar(None, pa.float64()))
+
+
+def split_addresses(addresses: pa.ChunkedArray) -> dict:
+    """street, city, state and zip columns; an address in another shape is kept whole as the street"""
+    # Splitting is far cheaper than extracting with one regex, which needs backtracking for the street
+    well_formed = pc.and_(pc.match_substring_regex(addresses, ADDRESS_END),
+                          pc.greater_equal(pc.count_substring(addresses, ", "), 2))
+    parts = pc.split_pattern(pc.if_else(well_formed, addresses, ", , XX 00000"), ", ", max_splits=2, reverse=True)
+    state_zip = pc.list_element(parts, 2)
+    return {
+        "street": pc.if_else(well_formed, pc.list_element(parts, 0), addresses),
+        "city": pc.if_else(well_formed, pc.list_element(parts, 1), None),
+        "state": pc.if_else(well_formed, pc.utf8_slice_codeunits(state_zip, 0, 2), None),
+        "zip": pc.if_else(well_formed, pc.utf8_slice_codeunits(state_zip, 3, 8), None),
+    }
+
+
+def normalize(raw: pa.Table) -> pa.Table:
+    """Typed listing columns (SCHEMA) from a table of the scraper's CSV columns, all strings"""
+    beds = parse_numbers(raw.column("Beds"))
+    # "Studio" has no number but means no bedrooms
+    beds = pc.if_else(pc.match_substring(raw.column("Beds"), "studio", ignore_case=True), 0.0, beds)
+    columns = {
+        "zpid": pc.cast(pc.struct_field(pc.extract_regex(raw.column("URL"), ZPID), 'zpid'), pa.int64()),
+        **split_addresses(raw.column("Address")),
+        "broker": raw.column("Broker"),
+        "price": to_integers(parse_numbers(raw.column("Price"), scaled=True), pa.int64()),
+        "beds": to_integers(beds, pa.int16()),
+        "baths": parse_numbers(raw.column("Bathrooms")),
+        "sqft": to_integers(parse_areas(raw.column("Square Footage")), pa.int32()),
+        "url": raw.column("URL"),
+    }
+    return pa.table({field.name: pc.cast(columns[field.name], field.type) for field in SCHEMA}, schema=SCHEMA)
+
+
+def raw_table(rows: List[Dict[str, str]]) -> pa.Table:
+    """The scraper's CSV rows (as written by zillow_scrape.py) as a table of strings"""
+    return pa.table({name: pa.array([row[name] for row in rows], pa.string()) for name in CSV_COLUMNS})
+
+
+def read_listing_csv(path: str) -> pa.Table:
+    """A scraper CSV as a table of strings, parsed by Arrow's multithreaded CSV reader"""
+    return pa_csv.read_csv(path, convert_options=pa_csv.ConvertOptions(
+        column_types={name: pa.string() for name in CSV_COLUMNS}, strings_can_be_null=False))
+
+
+def write_columnar(table: pa.Table, path: str):
+    """Parquet for .parquet paths, otherwise uncompressed Arrow IPC (which memory-maps on read)"""
+    if path.endswith(".parquet"):
+        pq.write_table(table, path, compression="zstd")
+    else:
+        feather.write_feather(table, path, compression="uncompressed")
+
+
+def read_columnar(path: str, columns=None, filter=None) -> pa.Table:
+    """Read a file from write_columnar, only ``columns`` and the rows matching the ``filter`` expression.
+
+    The filter is applied during the scan; Parquet also skips whole row
+    groups whose column statistics rule them out.
+    """
+    dataset = ds.dataset(path, format="parquet" if path.endswith(".parquet") else "ipc")
+    return dataset.to_table(columns=columns, filter=filter)
+
+
+def columnar_path(csv_path: str) -> str:
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv", help="scraper CSV, e.g. zillow.csv")
+    parser.add_argument("--output", help="defaults to the CSV path with a .parquet extension")
+    args = parser.parse_args()
+
+    output = args.output or columnar_path(args.csv)
+    table = normalize(read_listing_csv(args.csv))
+    write_columnar(table, output)
+    unread = {name: table.column(name).null_count for name in ("price", "beds", "baths", "sqft", "zip")}
+    print(f"Wrote {table.num_rows} listings to {output} (nulls: {unread})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""In-memory search indexes over the scraper's listings.
+
+Each numeric field (price, beds, baths, sqft) gets a sorted range index. It
+holds the non-null values in order and the rows they belong to, so a range
+comes down to two binary searches and a slice. Each text field (zip, city,
+broker) gets an inverted index from the lowercased value to the sorted rows
+that hold it. A query asks every index how many rows its predicate matches
+and starts from the smallest of those row lists. It then probes those rows'
+column values for the remaining predicates. Once the smallest list is in
+hand, this is never more work than merging it with a longer posting list.
+
+Listings are keyed by zpid, or by URL when the URL has no zpid, the same
+way scrape_state.py tracks them. Scrape deltas are applied incrementally in
+the manner of a log-structured index:
+- A replaced or delisted listing is marked dead in the segment that holds it.
+- New and changed rows go to a small "recent" segment, which is re-indexed
+  at the cost of its own size.
+- Once the recent segment outgrows ``merge_fraction`` of the base, both
+  segments are merged into one.
+Updates publish a new immutable view in one assignment, so searches never
+wait for them and never see a half-applied delta.
+
+    python listing_index.py zillow.parquet --city "La Jolla" --beds-min 3 --price-max 3000000
+"""
+import argparse
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+from listing_columns import CSV_COLUMNS, SCHEMA, normalize, read_columnar, read_listing_csv
+from scrape_state import DELISTED
+
+RANGE_FIELDS = ("price", "beds", "baths", "sqft")
+TERM_FIELDS = ("zip", "city", "broker")
+
+NO_ROWS = np.empty(0, np.int32)
+
+
+def listing_keys(table: pa.Table) -> list:
+    """zpid for each listing, or its URL where there is none"""
+    zpids = table.column("zpid").to_pylist()
+    if table.column("zpid").null_count == 0:
+        return zpids
+    return [zpid if zpid is not None else url for zpid, url in zip(zpids, table.column("url").to_pylist())]
+
+
+def load_listings(path: str) -> pa.Table:
+    """Typed listings from a scraper CSV, or a Parquet / Arrow IPC file written by listing_columns.py"""
+    if path.endswith(".csv"):
+        return normalize(read_listing_csv(path))
+    return read_columnar(path).select(SCHEMA.names).cast(SCHEMA)
+
+
+def read_delta(source) -> Tuple[pa.Table, list]:
+    """The new and changed listings (typed) and the keys of the delisted ones in a zillow_delta.csv.
+
+    ``source`` is a path or a binary file object.
+    """
+    names = ["Change", "ZPID"] + CSV_COLUMNS
+    raw = pa_csv.read_csv(source, convert_options=pa_csv.ConvertOptions(
+        column_types={name: pa.string() for name in names}, strings_can_be_null=False))
+    delisted = pc.equal(raw.column("Change"), DELISTED)
+    gone = raw.filter(delisted)
+    keys = [int(zpid) if zpid else url
+            for zpid, url in zip(gone.column("ZPID").to_pylist(), gone.column("URL").to_pylist())]
+    return normalize(raw.filter(pc.invert(delisted)).select(CSV_COLUMNS)), keys
+
+
+def encode(column: pa.ChunkedArray, vocabulary: Dict[str, int]) -> np.ndarray:
+    """int32 code of each lowercased value in the shared ``vocabulary`` (new values are added), -1 for null"""
+    encoded = pc.dictionary_encode(pc.utf8_lower(column.combine_chunks()))
+    codes = [vocabulary.setdefault(value, len(vocabulary)) for value in encoded.dictionary.to_pylist()]
+    mapping = np.array(codes + [-1], np.int32)
+    return mapping[encoded.indices.fill_null(len(codes)).to_numpy()]
+
+
+def postings(codes: np.ndarray) -> Dict[int, np.ndarray]:
+    """code -> the sorted rows holding it; every list is a view into one sorted array"""
+    order = np.argsort(codes, kind="stable").astype(np.int32)
+    ordered = codes[order]
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]]) if len(ordered) else NO_ROWS
+    stops = np.r_[starts[1:], len(ordered)]
+    return {int(ordered[start]): order[start:stop] for start, stop in zip(starts, stops) if ordered[start] >= 0}
+
+
+class Segment:
+    """An immutable block of listings and its indexes. Which rows are still live is kept outside it."""
+
+    def __init__(self, table: pa.Table, vocabularies: Dict[str, Dict[str, int]]):
+        self.table = table.combine_chunks()
+        self.size = table.num_rows
+        self.locations = dict(zip(listing_keys(table), range(self.size)))  # key -> row; only the writer uses it
+        # A key repeated within the segment (e.g. a listing on two search pages) keeps its last row
+        self.unique = np.ones(self.size, bool)
+        if len(self.locations) < self.size:
+            self.unique[:] = False
+            self.unique[np.fromiter(self.locations.values(), np.int64, len(self.locations))] = True
+
+        self.values: Dict[str, np.ndarray] = {}  # field -> float64 per row, NaN where null
+        self.sorted: Dict[str, np.ndarray] = {}  # field -> non-null values in ascending order
+        self.order: Dict[str, np.ndarray] = {}  # field -> the row of each sorted value
+        for name in RANGE_FIELDS:
+            values = pc.fill_null(pc.cast(self.table.column(name), pa.float64()), np.nan).to_numpy()
+            order = np.argsort(values, kind="stable")[:self.size - int(np.isnan(values).sum())]  # NaNs sort last
+            self.values[name] = values
+            self.sorted[name] = values[order]
+            self.order[name] = order.astype(np.int32)
+
+        self.codes: Dict[str, np.ndarray] = {}
+        self.postings: Dict[str, Dict[int, np.ndarray]] = {}
+        for name in TERM_FIELDS:
+            self.codes[name] = encode(self.table.column(name), vocabularies[name])
+            self.postings[name] = postings(self.codes[name])
+
+    def match(self, ranges: dict, terms: dict, live: np.ndarray) -> np.ndarray:
+        """Live rows matching every range (field -> (low, high), inclusive, None for open) and term
+        (field -> array of codes, any of which matches)"""
+        plans = []
+        for name, (low, high) in ranges.items():
+            values = self.sorted[name]
+            start = 0 if low is None else int(np.searchsorted(values, low, "left"))
+            stop = len(values) if high is None else int(np.searchsorted(values, high, "right"))
+            plans.append((max(stop - start, 0), name, (start, stop)))
+        for name, codes in terms.items():
+            # A value repeated in the query would otherwise bring in its rows once per repeat
+            found = [self.postings[name].get(int(code), NO_ROWS) for code in np.unique(codes)]
+            plans.append((sum(map(len, found)), name, found))
+        if not plans:
+            return np.flatnonzero(live).astype(np.int32)
+
+        plans.sort(key=lambda plan: plan[0])
+        size, name, found = plans[0]
+        if size == 0:
+            return NO_ROWS
+        if name in ranges:
+            rows = self.order[name][found[0]:found[1]]
+        else:
+            rows = found[0] if len(found) == 1 else np.concatenate(found)
+        # Most selective first, and the candidates shrink after each predicate, so later probes gather less
+        for _, name, _ in plans[1:]:
+            if name in ranges:
+                low, high = ranges[name]
+                values = self.values[name][rows]
+                if low is None:
+                    keep = values <= high
+                elif high is None:
+                    keep = values >= low
+                else:
+                    keep = (values >= low) & (values <= high)
+            else:
+                codes = self.codes[name][rows]
+                keep = codes == terms[name][0] if len(terms[name]) == 1 else np.isin(codes, terms[name])
+            rows = rows[keep]
+        return rows[live[rows]]
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [*self.values.values(), *self.sorted.values(), *self.order.values(), *self.codes.values()]
+        # The posting lists are views into one sorted array per field, the size of its codes
+        return self.table.nbytes + sum(array.nbytes for array in arrays) + sum(
+            codes.nbytes for codes in self.codes.values())
+
+
+class ListingIndex:
+    """Searchable listings: a large base segment and a small recent one that deltas go into"""
+
+    def __init__(self, table: Optional[pa.Table] = None, merge_fraction: float = 0.05, merge_min: int = 10000):
+        self.merge_fraction = merge_fraction
+        self.merge_min = merge_min
+        self.vocabularies: Dict[str, Dict[str, int]] = {name: {} for name in TERM_FIELDS}
+        self.deltas = 0
+        self.merges = 0
+        self.lock = threading.Lock()  # Serializes updates; searches only read self.view
+        base = Segment(SCHEMA.empty_table() if table is None else table, self.vocabularies)
+        recent = Segment(SCHEMA.empty_table(), self.vocabularies)
+        self.view = ((base, base.unique), (recent, recent.unique))
+
+    @classmethod
+    def from_file(cls, path: str, **options) -> 'ListingIndex':
+        return cls(load_listings(path), **options)
+
+    def __len__(self) -> int:
+        return sum(int(live.sum()) for _, live in self.view)
+
+    def search(self, sort: Optional[str] = "price", limit: int = 20, **filters) -> Tuple[int, List[dict]]:
+        """Count the listings matching every filter and return the first ``limit`` of them.
+
+        Range filters are (low, high) tuples, inclusive, with None for an open
+        end: ``price=(1000000, 3000000), beds=(3, None)``. Term filters are a
+        value or a list of values, matched regardless of case:
+        ``city="La Jolla", broker=["COMPASS", "Pacaso Inc."]``. ``sort`` is a
+        range field, with a leading "-" for descending; listings missing it
+        come last. Without a sort, listings come in index order.
+        """
+        ranges, terms = {}, {}
+        for name, value in filters.items():
+            if name in RANGE_FIELDS:
+                low, high = value
+                ranges[name] = (low, high)
+            elif name in TERM_FIELDS:
+                values = [value] if isinstance(value, str) else value
+                vocabulary = self.vocabularies[name]
+                codes = [vocabulary[v.lower()] for v in values if v.lower() in vocabulary]
+                if not codes:
+                    return 0, []
+                terms[name] = np.array(codes, np.int32)
+            else:
+                raise ValueError(f"Unknown filter {name}")
+        descending = bool(sort) and sort.startswith("-")
+        sort_field = sort.lstrip("-") if sort else None
+        if sort_field is not None and sort_field not in RANGE_FIELDS:
+            raise ValueError(f"Cannot sort by {sort}")
+
+        view = self.view
+        matches = [segment.match(ranges, terms, live) for segment, live in view]
+        count = sum(len(rows) for rows in matches)
+        if limit <= 0 or count == 0:
+            return count, []
+
+        picks = np.concatenate(matches)
+        segments = np.repeat(np.arange(len(matches), dtype=np.int8), [len(rows) for rows in matches])
+        if sort_field is None:
+            top = np.arange(min(limit, count))
+        else:
+            keys = np.concatenate([segment.values[sort_field][rows] for (segment, _), rows in zip(view, matches)])
+            keys = -keys if descending else keys
+            top = np.argpartition(keys, limit - 1)[:limit] if count > limit else np.arange(count)
+            top = top[np.argsort(keys[top], kind="stable")]
+
+        listings: List[Optional[dict]] = [None] * len(top)
+        for number, (segment, _) in enumerate(view):
+            taken = np.flatnonzero(segments[top] == number)
+            if len(taken):
+                for position, listing in zip(taken, segment.table.take(picks[top[taken]]).to_pylist()):
+                    listings[position] = listing
+        return count, listings
+
+    def update(self, table: Optional[pa.Table] = None, delisted: Iterable = ()):
+        """Add or replace the typed listings in ``table`` and drop the ``delisted`` keys"""
+        table = SCHEMA.empty_table() if table is None else table
+        with self.lock:
+            (base, base_live), (recent, recent_live) = self.view
+            base_live, recent_live = base_live.copy(), recent_live.copy()
+            for key in [*delisted, *listing_keys(table)]:
+                row = base.locations.pop(key, None)
+                if row is not None:
+                    base_live[row] = False
+                row = recent.locations.pop(key, None)
+                if row is not None:
+                    recent_live[row] = False
+
+            pending = pa.concat_tables([recent.table.filter(pa.array(recent_live)), table])
+            if pending.num_rows > max(self.merge_min, self.merge_fraction * base.size):
+                base = Segment(pa.concat_tables([base.table.filter(pa.array(base_live)), pending]), self.vocabularies)
+                recent = Segment(SCHEMA.empty_table(), self.vocabularies)
+                base_live = base.unique
+                self.merges += 1
+            else:
+                recent = Segment(pending, self.vocabularies)
+            self.view = ((base, base_live), (recent, recent.unique))
+            self.deltas += 1
+
+    def apply_delta(self, source) -> dict:
+        """Apply a zillow_delta.csv (path or binary file object); returns how many rows it upserted and removed"""
+        listings, delisted = read_delta(source)
+        self.update(listings, delisted)
+        return {"upserted": listings.num_rows, "delisted": len(delisted)}
+
+    def stats(self) -> dict:
+        view = self.view
+        return {
+            "listings": sum(int(live.sum()) for _, live in view),
+            "segments": [segment.size for segment, _ in view],
+            "deltas": self.deltas,
+            "merges": self.merges,
+            "bytes": sum(segment.nbytes + live.nbytes for segment, live in view),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("listings", help="zillow.csv, or a .parquet / .arrow file from listing_columns.py")
+    parser.add_argument("--delta", action="append", default=[], help="zillow_delta.csv to apply; repeatable")
+    for name in RANGE_FIELDS:
+        parser.add_argument(f"--{name}-min", type=float)
+        parser.add_argument(f"--{name}-max", type=float)
+    for name in TERM_FIELDS:
+        parser.add_argument(f"--{name}", action="append")
+    parser.add_argument("--sort", default="price")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    index = ListingIndex.from_file(args.listings)
+    for path in args.delta:
+        index.apply_delta(path)
+    filters = {name: getattr(args, name) for name in TERM_FIELDS if getattr(args, name)}
+    for name in RANGE_FIELDS:
+        low, high = getattr(args, f"{name}_min"), getattr(args, f"{name}_max")
+        if low is not None or high is not None:
+            filters[name] = (low, high)
+    count, listings = index.search(args.sort, args.limit, **filters)
+    for listing in listings:
+        print(f"{listing['price'] or '--':>12} {listing['beds'] or 0:>3} bd {listing['baths'] or 0:>4} ba "
+              f"{listing['sqft'] or '--':>6} sqft  {listing['street']}, {listing['city']}  ({listing['broker']})")
+    print(f"{count} of {len(index)} listings match")
+
+
+if __name__ == "__main__":
+    main()
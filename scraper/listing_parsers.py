@@ -0,0 +1,125 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+# parse(content, url) -> (listing records, next page url or None)
+ListingParser = Callable[[bytes, str], Tuple[List[dict], Optional[str]]]
+
+
+class NotAResultsPage(ValueError):
+    """Raised by the parsers for a page without a search results grid, such as a CAPTCHA or block page"""
+
+
+# BeautifulSoup reference implementation
+
+def parse_listings(soup):
+    properties = []
+    search_results = soup.find(id="grid-search-results")
+    if search_results:
+        homecards = search_results.find_all("li")
+        for card in homecards:
+            if card.find("address", {"data-test": "property-card-addr"}):
+                more_info = card.find("div", class_="property-card-data")
+                info = more_info.find_all("li")
+                data = {
+                    "address": card.find("address", {"data-test": "property-card-addr"}).text.strip(),
+                    "broker": more_info.find("div").text.strip(),
+                    "price": card.find("span", {"data-test": "property-card-price"}).text.strip(),
+                    "beds": info[0].text.strip(),
+                    "bathrooms": info[1].text.strip(),
+                    "sqft": info[2].text.strip(),
+                    "url": card.find("a", {"data-test": "property-card-link"})["href"]
+                }
+                properties.append(data)
+    return properties
+
+
+def next_page_url(soup, page_url):
+    # The pagination "Next page" link is disabled (and has no href) on the last page
+    link = soup.find("a", {"rel": "next"}) or soup.find("a", {"title": "Next page"})
+    if link and link.get("href") and link.get("aria-disabled") != "true":
+        return urljoin(page_url, link["href"])
+    return None
+
+
+def parse_page_bs4(content, url):
+    soup = BeautifulSoup(content, "html.parser")
+    if soup.find(id="grid-search-results") is None:
+        raise NotAResultsPage("no search results on the page")
+    return parse_listings(soup), next_page_url(soup, url)
+
+
+# lxml implementation: same records, but every lookup is a compiled XPath run
+# in libxml2 and each card's fields are read exactly once
+
+_lxml = None
+
+
+def _compile_lxml():
+    global _lxml
+    if _lxml is None:
+        import lxml.html
+        from lxml import etree
+
+        def has_token(attribute, token):
+            # Whitespace-separated attribute match, like BeautifulSoup's class_/rel matching
+            return f"contains(concat(' ', normalize-space(@{attribute}), ' '), ' {token} ')"
+
+        _lxml = {
+            'fromstring': lxml.html.fromstring,
+            'grid': etree.XPath('(//*[@id="grid-search-results"])[1]'),
+            'cards': etree.XPath('(//*[@id="grid-search-results"])[1]'
+                                 '//li[.//address[@data-test="property-card-addr"]]'),
+            'address': etree.XPath('(.//address[@data-test="property-card-addr"])[1]'),
+            'more_info': etree.XPath(f'(.//div[{has_token("class", "property-card-data")}])[1]'),
+            'broker': etree.XPath('(.//div)[1]'),
+            'info': etree.XPath('.//li'),
+            'price': etree.XPath('(.//span[@data-test="property-card-price"])[1]'),
+            'link': etree.XPath('(.//a[@data-test="property-card-link"])[1]/@href'),
+            'next': etree.XPath(f'//a[{has_token("rel", "next")} or @title="Next page"]'),
+        }
+    return _lxml
+
+
+def parse_page_lxml(content, url):
+    x = _compile_lxml()
+    root = x['fromstring'](content)
+    if not x['grid'](root):
+        raise NotAResultsPage("no search results on the page")
+
+    properties = []
+    for card in x['cards'](root):
+        more_info = x['more_info'](card)[0]
+        info = x['info'](more_info)
+        properties.append({
+            "address": x['address'](card)[0].text_content().strip(),
+            "broker": x['broker'](more_info)[0].text_content().strip(),
+            "price": x['price'](card)[0].text_content().strip(),
+            "beds": info[0].text_content().strip(),
+            "bathrooms": info[1].text_content().strip(),
+            "sqft": info[2].text_content().strip(),
+            "url": x['link'](card)[0]
+        })
+
+    next_url = None
+    links = x['next'](root)
+    # Match the reference: prefer rel="next", then title="Next page"
+    links.sort(key=lambda a: 0 if 'next' in (a.get('rel') or '').split() else 1)
+    if links:
+        link = links[0]
+        if link.get("href") and link.get("aria-disabled") != "true":
+            next_url = urljoin(url, link.get("href"))
+    return properties, next_url
+
+
+PARSERS: Dict[str, ListingParser] = {
+    'bs4': parse_page_bs4,
+    'lxml': parse_page_lxml,
+}
+
+
+def get_parser(name: str) -> ListingParser:
+    if name not in PARSERS:
+        raise ValueError(f"Unknown parser {name!r}, choose from {sorted(PARSERS)}")
+    return PARSERS[name]
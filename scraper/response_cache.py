@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+INDEX_FILE = 'index.json'
+
+
+class ResponseCache:
+    """On-disk HTTP response cache keyed by URL, storing bodies by content hash.
+
+    Entries younger than ``ttl`` seconds are served without a request; older
+    ones are revalidated with If-None-Match / If-Modified-Since, so an
+    unchanged page costs a 304. Parsed records are cached per body hash and
+    parser, so a 304 or fresh hit also skips re-parsing. The total size of
+    stored bodies is kept under ``max_bytes`` by evicting the least recently
+    used URLs.
+    """
+
+    def __init__(self, directory: str, ttl: float = 3600, max_bytes: int = 200 * 2**20):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._objects = os.path.join(directory, 'objects')
+        self._parsed = os.path.join(directory, 'parsed')
+        os.makedirs(self._objects, exist_ok=True)
+        os.makedirs(self._parsed, exist_ok=True)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'changed': 0, 'evictions': 0, 'parse_skips': 0}
+
+        self._index: Dict[str, dict] = {}
+        try:
+            with open(os.path.join(directory, INDEX_FILE), encoding='utf-8') as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            pass
+        # Drop entries whose body went missing
+        self._index = {url: entry for url, entry in self._index.items()
+                       if os.path.exists(self._object_path(entry['sha256']))}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self._objects, digest)
+
+    def _parsed_path(self, entry: dict, parser: str) -> str:
+        # Relative next-page links resolve against the page URL, so parses are per URL as well as per body
+        url_key = hashlib.sha256(entry['url'].encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self._parsed, f"{entry['sha256']}-{url_key}-{parser}.json")
+
+    def _write_atomic(self, path: str, data: bytes):
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    # Lookups
+
+    def lookup(self, url: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is not None:
+                entry['accessed'] = time.time()
+                entry = dict(entry)
+        if entry is not None:
+            entry['fresh'] = time.time() - entry['validated'] < self.ttl
+        return entry
+
+    def conditional_headers(self, entry: Optional[dict]) -> dict:
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def body(self, entry: dict) -> Optional[bytes]:
+        try:
+            with open(self._object_path(entry['sha256']), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def parsed(self, entry: dict, parser: str) -> Optional[Tuple[List[dict], Optional[str]]]:
+        try:
+            with open(self._parsed_path(entry, parser), encoding='utf-8') as f:
+                records, next_url = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._count('parse_skips')
+        return records, next_url
+
+    # Updates
+
+    def hit(self):
+        self._count('hits')
+
+    def revalidated(self, url: str):
+        self._count('revalidated')
+        with self._lock:
+            if url in self._index:
+                self._index[url]['validated'] = time.time()
+
+    def store(self, url: str, body: bytes, headers) -> dict:
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            self._write_atomic(path, body)
+
+        now = time.time()
+        entry = {
+            'url': url,
+            'sha256': digest,
+            'size': len(body),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'validated': now,
+            'accessed': now,
+        }
+        with self._lock:
+            previous = self._index.get(url)
+            self.stats['changed' if previous is not None else 'misses'] += 1
+            self._index[url] = entry
+            self._evict()
+        return entry
+
+    def store_parsed(self, entry: dict, parser: str, records: List[dict], next_url: Optional[str]):
+        self._write_atomic(self._parsed_path(entry, parser), json.dumps([records, next_url]).encode('utf-8'))
+
+    def _evict(self):
+        # Called with the lock held; sizes count each distinct body once
+        sizes = {entry['sha256']: entry['size'] for entry in self._index.values()}
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+        for url, entry in sorted(self._index.items(), key=lambda item: item[1]['accessed']):
+            if total <= self.max_bytes:
+                break
+            del self._index[url]
+            self.stats['evictions'] += 1
+            if not any(other['sha256'] == entry['sha256'] for other in self._index.values()):
+                total -= entry['size']
+                self._remove_body(entry['sha256'])
+
+    def _remove_body(self, digest: str):
+        for path in [self._object_path(digest)] + [
+                os.path.join(self._parsed, name) for name in os.listdir(self._parsed) if name.startswith(digest)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def close(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        with self._lock:
+            data = json.dumps(self._index)
+        self._write_atomic(path, data.encode('utf-8'))
+
+    def report(self) -> str:
+        s = self.stats
+        return (f"cache: {s['hits']} fresh hits, {s['revalidated']} revalidated (304), {s['changed']} changed, "
+                f"{s['misses']} misses, {s['parse_skips']} parses skipped, {s['evictions']} evictions")
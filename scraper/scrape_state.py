@@ -0,0 +1,107 @@
+"""Incremental scrape state: what each listing looked like on the previous run.
+
+Listings are keyed by the Zillow property id (zpid) in their card URL, e.g.
+``.../homedetails/1900-Spindrift-Dr-La-Jolla-CA-92037/16839110_zpid/``. The
+state file keeps one tab-separated line per listing: zpid, a 64-bit hash of
+its CSV row, and its URL (downstream loaders key rows by URL, so a delisted
+property needs it). Comparing a run against the state gives the delta of
+new, changed and delisted listings.
+"""
+import hashlib
+import os
+import re
+from operator import itemgetter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+ZPID_PATTERN = re.compile(r'/(\d+)_zpid')
+STATE_HEADER = '# zpid\thash\turl\n'
+
+NEW = 'new'
+CHANGED = 'changed'
+DELISTED = 'delisted'
+
+
+def zpid_from_url(url: str) -> Optional[int]:
+    match = ZPID_PATTERN.search(url or '')
+    return int(match.group(1)) if match else None
+
+
+def row_hasher(fields: Iterable[str]) -> Callable[[dict], str]:
+    """Hash of a CSV row's (string) values in ``fields``; any change to a listing's fields changes it"""
+    values = itemgetter(*fields)
+    blake2b = hashlib.blake2b
+
+    def row_hash(row: dict) -> str:
+        return blake2b('\x1f'.join(values(row)).encode('utf-8'), digest_size=8).hexdigest()
+    return row_hash
+
+
+class ScrapeState:
+    """zpid -> (row hash, URL) for every listing seen on the last run"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.listings: Dict[int, Tuple[str, str]] = {}
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.startswith('#'):
+                        continue
+                    zpid, digest, url = line.rstrip('\n').split('\t', 2)
+                    self.listings[int(zpid)] = (digest, url)
+        except FileNotFoundError:
+            pass
+
+    def diff(self, rows: List[dict], fields: Iterable[str], complete: bool = True) -> Tuple[List[tuple], dict]:
+        """Compare this run's CSV rows with the state, and move the state to this run.
+
+        Returns (change, zpid, row) entries in row order with delistings last,
+        and counts per change. A delisted entry's row only has its URL. Rows
+        without a zpid can't be tracked and are always reported as new; a
+        zpid repeated across search pages counts once. If the crawl was not
+        ``complete`` (some pages failed), listings missing from it may still be
+        listed, so none are reported delisted and their state is kept.
+        """
+        row_hash = row_hasher(fields)
+        find_zpid = ZPID_PATTERN.search
+        changes = []
+        counts = {NEW: 0, CHANGED: 0, DELISTED: 0, 'unchanged': 0, 'untracked': 0}
+        seen: Dict[int, Tuple[str, str]] = {}
+        for row in rows:
+            match = find_zpid(row['URL'] or '')
+            if match is None:
+                counts['untracked'] += 1
+                changes.append((NEW, None, row))
+                continue
+            zpid = int(match.group(1))
+            if zpid in seen:
+                continue
+            digest = row_hash(row)
+            seen[zpid] = (digest, row['URL'])
+            previous = self.listings.get(zpid)
+            if previous is None:
+                counts[NEW] += 1
+                changes.append((NEW, zpid, row))
+            elif previous[0] != digest:
+                counts[CHANGED] += 1
+                changes.append((CHANGED, zpid, row))
+            else:
+                counts['unchanged'] += 1
+
+        for zpid, (digest, url) in self.listings.items():
+            if zpid not in seen:
+                if complete:
+                    counts[DELISTED] += 1
+                    changes.append((DELISTED, zpid, {'URL': url}))
+                else:
+                    seen[zpid] = (digest, url)
+        self.listings = seen
+        return changes, counts
+
+    def save(self):
+        """Replace the state file in one step, so an interrupted run leaves the previous state"""
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(STATE_HEADER)
+            f.writelines(f'{zpid}\t{digest}\t{url}\n' for zpid, (digest, url) in sorted(self.listings.items()))
+        os.replace(tmp, self.path)
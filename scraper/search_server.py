@@ -0,0 +1,158 @@
+"""Listing search service: the scraper's listings held in listing_index.py's in-memory indexes.
+
+    python search_server.py zillow.parquet --port 8100 --watch zillow_delta.csv
+    curl 'localhost:8100/search?city=La+Jolla&beds_min=3&price_min=1000000&price_max=3000000&sqft_max=2500&broker=COMPASS'
+
+GET /search filters on <field>_min and <field>_max (inclusive) for price,
+beds, baths and sqft, and on exact, case-insensitive zip, city and broker
+values. Repeat a text field for any of several values. sort=price (or
+-price, beds, baths, sqft) and limit=20 pick which matches are returned.
+POST /deltas applies a zillow_delta.csv sent as the body, and --watch
+applies the delta file each time a scrape rewrites it. GET /stats reports
+the index's size and the updates applied so far.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pyarrow as pa
+
+from listing_index import RANGE_FIELDS, TERM_FIELDS, ListingIndex
+
+MAX_LIMIT = 1000
+SEARCH_PARAMS = {f"{name}_{end}" for name in RANGE_FIELDS for end in ("min", "max")} | set(TERM_FIELDS) | {
+    "sort", "limit"}
+
+
+def search_params(query: dict) -> dict:
+    """ListingIndex.search() arguments from a parsed query string; ValueError for a bad parameter"""
+    unknown = sorted(set(query) - SEARCH_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown parameter {unknown[0]}")
+    params = {name: query[name] for name in TERM_FIELDS if name in query}
+    for name in RANGE_FIELDS:
+        bounds = []
+        for end in ("min", "max"):
+            value = query.get(f"{name}_{end}", [None])[0]
+            try:
+                bounds.append(None if value is None else float(value))
+            except ValueError:
+                raise ValueError(f"Invalid {name}_{end}") from None
+        if bounds != [None, None]:
+            params[name] = tuple(bounds)
+    params["sort"] = query.get("sort", ["price"])[0]
+    if params["sort"].lstrip("-") not in RANGE_FIELDS:
+        raise ValueError("Invalid sort")
+    try:
+        params["limit"] = int(query.get("limit", ["20"])[0])
+    except ValueError:
+        raise ValueError("Invalid limit") from None
+    if not 0 <= params["limit"] <= MAX_LIMIT:
+        raise ValueError(f"Limit must be between 0 and {MAX_LIMIT}")
+    return params
+
+
+class SearchServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, index: ListingIndex):
+        super().__init__(('127.0.0.1', port), SearchHandler)
+        self.index = index
+
+    def watch(self, path: str, interval: float = 1.0):
+        """Apply ``path`` whenever its modification time changes; the delta there at startup is not applied"""
+        def poll():
+            last = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+            while True:
+                time.sleep(interval)
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                    if mtime != last:
+                        last = mtime
+                        counts = self.index.apply_delta(path)
+                        print(f"Applied {path}: {counts['upserted']} upserted, {counts['delisted']} delisted")
+                except FileNotFoundError:
+                    pass
+                except pa.ArrowInvalid as e:
+                    print(f"Skipped {path}: {e}")
+        threading.Thread(target=poll, daemon=True).start()
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    server: SearchServer
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path == '/search':
+            try:
+                params = search_params(parse_qs(parts.query))
+            except ValueError as e:
+                return self._send_json(400, {'error': str(e)})
+            start = time.perf_counter()
+            count, listings = self.server.index.search(**params)
+            self._send_json(200, {'count': count, 'listings': listings,
+                                  'took_ms': round((time.perf_counter() - start) * 1000, 3)})
+        elif parts.path == '/stats':
+            self._send_json(200, self.server.index.stats())
+        else:
+            self._send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/deltas':
+            return self._send_json(404, {'error': 'Not found'})
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        try:
+            counts = self.server.index.apply_delta(pa.BufferReader(body))
+        except (pa.ArrowInvalid, KeyError):
+            return self._send_json(400, {'error': 'Invalid delta CSV'})
+        self._send_json(200, counts)
+
+    def _send_json(self, status: int, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(index: ListingIndex, port: int = 0) -> SearchServer:
+    """Serve ``index`` from a background thread; port 0 picks a free port"""
+    server = SearchServer(port, index)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('listings', help='zillow.csv, or a .parquet / .arrow file from listing_columns.py')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--watch', help='zillow_delta.csv to apply whenever a scrape rewrites it')
+    parser.add_argument('--poll', type=float, default=1.0, help='seconds between checks of --watch')
+    parser.add_argument('--merge-fraction', type=float, default=0.05,
+                        help='merge the updated listings into the base index once they reach this share of it')
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    index = ListingIndex.from_file(args.listings, merge_fraction=args.merge_fraction)
+    print(f'Indexed {len(index)} listings in {time.perf_counter() - start_time:.2f}s')
+    server = SearchServer(args.port, index)
+    if args.watch:
+        server.watch(args.watch, args.poll)
+    print(f'Serving search on http://127.0.0.1:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""listing_columns.normalize on card strings that don't fit the typed columns.
+
+    python -m pytest test_listing_columns.py
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from listing_columns import normalize, raw_table  # noqa: E402
+
+CARD = {"Address": "1900 Spindrift Dr, La Jolla, CA 92037", "Broker": "COMPASS", "Price": "$1,250,000",
+        "Beds": "3 bds", "Bathrooms": "2.5 ba", "Square Footage": "2,174 sqft",
+        "URL": "https://www.zillow.com/homedetails/1900-Spindrift-Dr/16849344_zpid/"}
+
+
+def normalized(**fields) -> dict:
+    return normalize(raw_table([dict(CARD, **fields)])).to_pylist()[0]
+
+
+@pytest.mark.parametrize('text, sqft', [
+    ("2,174 sqft", 2174),
+    ("0.26 acres lot", 11326),
+    ("1 acre lot", 43560),
+    ("-- sqft", None),
+    ("40 m²", None),
+    ("99,999,999,999 sqft", None),
+])
+def test_sqft_reads_square_feet_and_acres_only(text, sqft):
+    assert normalized(**{"Square Footage": text})["sqft"] == sqft
+
+
+def test_numbers_too_large_for_their_column_become_nulls():
+    row = normalized(Beds="99999 bds", Price="$99,999,999,999,999,999,999",
+                     URL="https://www.zillow.com/homedetails/x/123456789012345678901_zpid/")
+    assert (row["beds"], row["price"], row["zpid"]) == (None, None, None)
+    assert (row["baths"], row["sqft"]) == (2.5, 2174)
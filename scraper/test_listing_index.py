@@ -0,0 +1,35 @@
+"""listing_index.ListingIndex.search on term filters that name a value more than once.
+
+    python -m pytest test_listing_index.py
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from listing_index import ListingIndex  # noqa: E402
+
+SCRAPER_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zillow.csv')
+
+
+@pytest.fixture(scope='module')
+def index():
+    return ListingIndex.from_file(SCRAPER_CSV)
+
+
+def most_common_broker(index) -> str:
+    brokers = index.view[0][0].table.column('broker').to_pylist()
+    return max(set(brokers), key=brokers.count)
+
+
+@pytest.mark.parametrize('ranges', [{}, {'beds': (0, None)}])
+def test_repeated_term_values_match_each_listing_once(index, ranges):
+    broker = most_common_broker(index)
+    count, listings = index.search(broker=broker, **ranges)
+    assert count > 1
+
+    repeated, repeated_listings = index.search(broker=[broker, broker.upper(), broker], **ranges)
+    assert repeated == count
+    assert repeated_listings == listings
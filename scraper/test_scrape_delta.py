@@ -0,0 +1,95 @@
+"""zillow_scrape.py's delta against fixture_server.py, with result pages that fail in different ways.
+
+    python -m pytest test_scrape_delta.py
+"""
+import csv
+import os
+import re
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fixture_server  # noqa: E402
+import zillow_scrape  # noqa: E402
+from scrape_state import DELISTED  # noqa: E402
+
+BLOCK_PAGE = '<html><body><h1>Press &amp; Hold to confirm you are a human (and not a bot).</h1></body></html>'
+CARDS = re.compile(r'(photo-cards">).*?(</ul></div>)', re.DOTALL)
+ZPID = re.compile(r'/(\d+)_zpid')
+SEARCH = 'la-jolla-village-san-diego-ca'  # two result pages, the second listing homes no other page does
+
+
+@pytest.fixture
+def site(tmp_path):
+    """A copy of the saved pages that a test can break, and the port serving it"""
+    directory = tmp_path / 'fixtures'
+    shutil.copytree(fixture_server.FIXTURES_DIR, directory)
+    server = fixture_server.start(fixtures_dir=str(directory))
+    yield directory, server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def scrape(site, tmp_path, monkeypatch):
+    """Runs the scraper against the site and returns the zpids its delta reports delisted"""
+    _, port = site
+
+    def run(*options) -> set:
+        delta = tmp_path / 'delta.csv'
+        monkeypatch.setattr(sys, 'argv', [
+            'zillow_scrape.py', '--base-url', f'http://127.0.0.1:{port}', '--rate', '1000', '--retries', '0',
+            '--no-cache', '--no-columnar', '--output', str(tmp_path / 'zillow.csv'),
+            '--state', str(tmp_path / 'state.tsv'), '--delta', str(delta), *options])
+        zillow_scrape.main()
+        with open(delta, newline='', encoding='utf-8') as f:
+            return {row['ZPID'] for row in csv.DictReader(f) if row['Change'] == DELISTED}
+    return run
+
+
+def only_on(page) -> set:
+    """zpids that no other result page lists"""
+    elsewhere = set()
+    for other in page.parent.parent.glob('*/*.html'):
+        if other != page:
+            elsewhere |= set(ZPID.findall(other.read_text(encoding='utf-8')))
+    return set(ZPID.findall(page.read_text(encoding='utf-8'))) - elsewhere
+
+
+def empty_cards(page):
+    page.write_text(CARDS.sub(r'\1\2', page.read_text(encoding='utf-8')), encoding='utf-8')
+
+
+def test_block_page_delists_nothing(site, scrape):
+    page = site[0] / SEARCH / 'page-2.html'
+    assert only_on(page)
+    assert scrape() == set()
+
+    page.write_text(BLOCK_PAGE, encoding='utf-8')
+    assert scrape() == set()
+
+    # The state still holds the blocked page's listings, so the next full run finds nothing delisted
+    shutil.copy(os.path.join(fixture_server.FIXTURES_DIR, SEARCH, 'page-2.html'), page)
+    assert scrape() == set()
+
+
+def test_empty_page_before_the_last_delists_nothing(site, scrape):
+    scrape()
+    empty_cards(site[0] / SEARCH / 'page-1.html')
+    assert scrape() == set()
+
+
+def test_pages_past_max_pages_delist_nothing(scrape):
+    scrape()
+    assert scrape('--max-pages', '1') == set()
+
+
+def test_empty_last_page_delists_its_listings(site, scrape):
+    page = site[0] / SEARCH / 'page-2.html'
+    gone = only_on(page)
+    scrape()
+    empty_cards(page)
+    assert scrape() == gone
@@ -1,7 +1,12 @@
-import requests
-from bs4 import BeautifulSoup
-import random
+import argparse
 import csv
+from urllib.parse import urlsplit, urlunsplit
+
+from fetch_pipeline import FetchPipeline
+from listing_columns import columnar_path, normalize, raw_table, write_columnar
+from listing_parsers import PARSERS, get_parser
+from response_cache import ResponseCache
+from scrape_state import ScrapeState
 
 urls = [
     'https://www.zillow.com/la-jolla-san-diego-ca/',
@@ -15,49 +20,111 @@ header = {
     'referer':'https://www.zillow.com/homes/Missoula,-MT_rb/'
 }
 
-properties = []
-
-for url in urls:
-    try:
-        response = requests.get(url, headers=header)
-        
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.content, "html.parser")
-            search_results = soup.find(id="grid-search-results")
-            if search_results:  
-                homecards = search_results.find_all("li")
-                for card in homecards:
-                    if card.find("address", {"data-test": "property-card-addr"}):
-                        more_info = card.find("div", class_="property-card-data")
-                        info = more_info.find_all("li")
-                        data = {
-                            "address": card.find("address", {"data-test": "property-card-addr"}).text.strip(),
-                            "broker": more_info.find("div").text.strip(),
-                            "price": card.find("span", {"data-test": "property-card-price"}).text.strip(),
-                            "beds": info[0].text.strip(),
-                            "bathrooms": info[1].text.strip(),
-                            "sqft": info[2].text.strip(),
-                            "url": card.find("a", {"data-test": "property-card-link"})["href"]
-                        }
-                        properties.append(data)
-        
-        
-    except Exception as e:
-        print(f"Error processing {url}: {str(e)}")
-        continue
-
 csv_header = ["Address", "Broker", "Price", "Beds", "Bathrooms", "Square Footage", "URL"]
+delta_header = ["Change", "ZPID"] + csv_header
+
+
+def rebase(url, base_url):
+    """Point a zillow.com URL at another host, e.g. a local fixture server"""
+    base = urlsplit(base_url)
+    parts = urlsplit(url)
+    return urlunsplit((base.scheme, base.netloc, base.path.rstrip('/') + parts.path, parts.query, parts.fragment))
+
+
+def csv_row(property):
+    return {
+        "Address": property["address"],
+        "Broker": property["broker"],
+        "Price": property["price"],
+        "Beds": property["beds"],
+        "Bathrooms": property["bathrooms"],
+        "Square Footage": property["sqft"],
+        "URL": property["url"]
+    }
+
+
+def write_csv(rows, path):
+    with open(path, "w", newline='', encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=csv_header)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_delta(changes, path):
+    """The new, changed and delisted listings; delisted rows only carry their URL"""
+    with open(path, "w", newline='', encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=delta_header, restval="")
+        writer.writeheader()
+        for change, zpid, row in changes:
+            writer.writerow({"Change": change, "ZPID": "" if zpid is None else zpid, **row})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape Zillow search results into a CSV")
+    parser.add_argument("--output", default="zillow.csv")
+    parser.add_argument("--base-url", help="fetch from this host instead of zillow.com (e.g. http://localhost:8000)")
+    parser.add_argument("--concurrency", type=int, default=8, help="worker threads")
+    parser.add_argument("--per-host", type=int, default=2, help="max in-flight requests per host")
+    parser.add_argument("--rate", type=float, default=1.0, help="max requests per second per host")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--max-pages", type=int, default=20, help="result pages to follow per search URL")
+    parser.add_argument("--parser", default="lxml", choices=sorted(PARSERS),
+                        help="HTML parser backend (bs4 is the reference implementation)")
+    parser.add_argument("--cache-dir", default=".zillow_cache", help="on-disk response cache directory")
+    parser.add_argument("--cache-ttl", type=float, default=3600,
+                        help="seconds a cached page is used without revalidating it")
+    parser.add_argument("--cache-max-mb", type=float, default=200, help="cache size limit")
+    parser.add_argument("--no-cache", action="store_true", help="always download every page in full")
+    parser.add_argument("--columnar", help="typed copy of the output for analysis; .parquet or .arrow "
+                                           "(defaults to the output path with a .parquet extension)")
+    parser.add_argument("--no-columnar", action="store_true", help="only write the CSV")
+    parser.add_argument("--state", default=".zillow_state.tsv",
+                        help="per-listing hashes from the previous run, used to work out the delta")
+    parser.add_argument("--delta", default="zillow_delta.csv",
+                        help="write the new, changed and delisted listings here")
+    parser.add_argument("--no-delta", action="store_true", help="only write the full CSV; leave the state alone")
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else ResponseCache(args.cache_dir, args.cache_ttl, int(args.cache_max_mb * 2**20))
+
+    start_urls = [rebase(url, args.base_url) for url in urls] if args.base_url else urls
+    pipeline = FetchPipeline(get_parser(args.parser), headers=header, concurrency=args.concurrency, per_host=args.per_host,
+                             requests_per_second=args.rate, retries=args.retries, max_pages=args.max_pages,
+                             cache=cache)
+
+    # Pages finish in any order; keep the CSV in search URL then page order
+    pages = {}
+    for index, page, url, records in pipeline.crawl(start_urls):
+        pages[(index, page)] = records
+    properties = [record for key in sorted(pages) for record in pages[key]]
+    if cache:
+        cache.close()
+
+    rows = [csv_row(property) for property in properties]
+    write_csv(rows, args.output)
+    print(f"Wrote {len(properties)} properties from {pipeline.stats['pages']} pages to {args.output} "
+          f"({pipeline.stats['retries']} retries, {pipeline.stats['failures']} failed pages)")
+
+    if not args.no_columnar:
+        columnar = args.columnar or columnar_path(args.output)
+        write_columnar(normalize(raw_table(rows)), columnar)
+        print(f"Wrote typed columns to {columnar}")
+
+    if not args.no_delta:
+        state = ScrapeState(args.state)
+        # Failed pages (errors, block pages, empty pages mid-run) and pages past --max-pages hide listings
+        complete = not pipeline.stats['failures'] and not pipeline.stats['truncated']
+        changes, counts = state.diff(rows, csv_header, complete=complete)
+        # The delta is on disk before the state moves on, so a crash can't lose changes
+        write_delta(changes, args.delta)
+        state.save()
+        print(f"Wrote {len(changes)} changes to {args.delta}: {counts['new']} new, {counts['changed']} changed, "
+              f"{counts['delisted']} delisted ({counts['unchanged']} unchanged, {counts['untracked']} without a zpid)")
+        if not complete:
+            print("Some pages failed or were past --max-pages, so listings missing from this run were not marked delisted")
+    if cache:
+        print(cache.report())
+
 
-with open("zillow.csv", "w", newline='', encoding="utf-8") as f:
-    writer = csv.DictWriter(f, fieldnames=csv_header)
-    writer.writeheader()
-    for property in properties:
-        writer.writerow({
-            "Address": property["address"],
-            "Broker": property["broker"],
-            "Price": property["price"],
-            "Beds": property["beds"],
-            "Bathrooms": property["bathrooms"],
-            "Square Footage": property["sqft"],
-            "URL": property["url"]
-        })
\ No newline at end of file
+if __name__ == '__main__':
+    main()